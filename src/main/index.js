@@ -2,6 +2,10 @@ const { app, BrowserWindow, ipcMain, dialog } = require("electron");
 const path = require("path");
 const PythonBridge = require("./python-bridge");
 
+// Transport ops that stream frames until a job ends; they get their own
+// connection so they don't queue ahead of tiles on the shared one
+const STREAMING_OPS = new Set(["job_progress"]);
+
 let mainWindow;
 
 function createWindow() {
@@ -41,6 +45,46 @@ app.on("ready", () => {
     if (result.canceled) return [];
     return result.filePaths;
   });
+
+  // Lets the renderer hold its first API calls until the backend is listening
+  ipcMain.handle("backend-ready", async (event, state = "listening") => {
+    try {
+      return await PythonBridge.whenState(state);
+    } catch (e) {
+      return { ...PythonBridge.status(), error: e.message };
+    }
+  });
+
+  // Binary transport request; resolves to [{ header, payload }] with payloads as bytes
+  ipcMain.handle("transport-request", async (event, op, params) => {
+    if (STREAMING_OPS.has(op)) throw new Error(`Use transportStream for '${op}'`);
+    const client = await PythonBridge.transport();
+    if (!client) throw new Error("The backend has no binary transport");
+    return client.request(op, params);
+  });
+
+  // Streaming request on its own connection; each frame is forwarded to the
+  // renderer as a "transport-frame" event as soon as it arrives, and the
+  // invoke resolves once the stream has ended
+  const streams = new Map();
+  ipcMain.handle("transport-stream", async (event, streamId, op, params) => {
+    const client = await PythonBridge.openTransportStream();
+    if (!client) throw new Error("The backend has no binary transport");
+    streams.set(streamId, client);
+    try {
+      await client.request(op, params, (frame) => {
+        if (!event.sender.isDestroyed()) event.sender.send("transport-frame", streamId, frame);
+      });
+    } finally {
+      streams.delete(streamId);
+      PythonBridge.closeTransportStream(client);
+    }
+  });
+
+  ipcMain.handle("transport-stream-cancel", (event, streamId) => {
+    const client = streams.get(streamId);
+    if (client) PythonBridge.closeTransportStream(client);
+  });
 });
 
 app.on("window-all-closed", () => {
@@ -3,5 +3,33 @@ const { contextBridge, ipcRenderer } = require("electron");
 contextBridge.exposeInMainWorld("seekeraug", {
   selectFiles: async () => {
     return await ipcRenderer.invoke("select-files");
+  },
+  waitForBackend: async (state) => {
+    return await ipcRenderer.invoke("backend-ready", state);
+  },
+  // Tiles, thumbnails, decoded pixels and job progress over the binary transport
+  transport: async (op, params) => {
+    return await ipcRenderer.invoke("transport-request", op, params);
+  },
+  // Streaming ops (job_progress) on their own connection: onFrame receives each
+  // { header, payload } as it arrives. Returns { done, cancel }; done resolves
+  // when the stream ends (or is cancelled) and rejects on a final error frame.
+  transportStream: (op, params, onFrame) => {
+    const streamId = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    const listener = (event, id, frame) => {
+      if (id === streamId) onFrame(frame);
+    };
+    ipcRenderer.on("transport-frame", listener);
+    let cancelled = false;
+    const done = ipcRenderer.invoke("transport-stream", streamId, op, params)
+      .catch((e) => {
+        if (!cancelled) throw e;
+      })
+      .finally(() => ipcRenderer.removeListener("transport-frame", listener));
+    const cancel = () => {
+      cancelled = true;
+      return ipcRenderer.invoke("transport-stream-cancel", streamId);
+    };
+    return { done, cancel };
   }
 });
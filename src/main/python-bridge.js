@@ -1,26 +1,56 @@
 const { spawn } = require("child_process");
+const EventEmitter = require("events");
 const path = require("path");
+const TransportClient = require("./transport-client");
 
-class PythonBridge {
+// How long stop() waits for a graceful shutdown before killing the backend
+const SHUTDOWN_TIMEOUT_MS = 10000;
+// server.py reports "listening", "transport" and "ready" on stdout as `SEEKERAUG_EVENT {json}`
+const EVENT_PREFIX = "SEEKERAUG_EVENT ";
+
+class PythonBridge extends EventEmitter {
   constructor() {
+    super();
     this.pythonProcess = null;
     this.isRunning = false;
     this.port = 5000;
+    // "stopped" -> "starting" -> "listening" (serving requests) -> "ready" (warmed up)
+    this.state = "stopped";
+    this.startup = null;
+    this.transportInfo = null;
+    this.transportClient = null;
+    this.streamClients = new Set();
+    this._stdoutBuffer = "";
   }
 
   start() {
     if (this.isRunning) return;
+    this.state = "starting";
+    this.startup = { launchedAt: Date.now() };
+    this._stdoutBuffer = "";
 
     // Use system Python in development, bundled Python in production
     const pythonPath = "python";
-    const scriptPath = path.join(__dirname, "../python/api.py");
+    // server.py is the multi-threaded production server; api.py is the Flask dev server
+    const scriptPath = path.join(__dirname, "../python/server.py");
 
     this.pythonProcess = spawn(pythonPath, [scriptPath], {
-      env: { ...process.env, PORT: this.port.toString() }
+      env: { ...process.env, PORT: this.port.toString() },
+      // Own process group on POSIX so stop() can signal the whole tree
+      detached: process.platform !== "win32"
     });
 
     this.pythonProcess.stdout.on("data", (data) => {
-      console.log(`Python stdout: ${data}`);
+      this._stdoutBuffer += data;
+      const lines = this._stdoutBuffer.split("\n");
+      this._stdoutBuffer = lines.pop();
+      for (const line of lines) {
+        if (line.startsWith(EVENT_PREFIX)) {
+          this._handleEvent(line.slice(EVENT_PREFIX.length));
+        } else if (line) {
+          console.log(`Python stdout: ${line}`);
+        }
+      }
     });
 
     this.pythonProcess.stderr.on("data", (data) => {
@@ -30,26 +60,142 @@ class PythonBridge {
     this.pythonProcess.on("close", (code) => {
       console.log(`Python process exited with code ${code}`);
       this.isRunning = false;
+      this.state = "stopped";
+      this.emit("exit", code);
     });
 
     this.isRunning = true;
   }
 
+  _handleEvent(json) {
+    let event;
+    try {
+      event = JSON.parse(json);
+    } catch (e) {
+      console.error(`Python sent a malformed event: ${json}`);
+      return;
+    }
+    const elapsedMs = Date.now() - this.startup.launchedAt;
+    if (event.event === "listening") {
+      this.state = "listening";
+      this.startup.listeningMs = elapsedMs;
+    } else if (event.event === "transport") {
+      this.transportInfo = event;
+    } else if (event.event === "ready") {
+      this.state = "ready";
+      this.startup.readyMs = elapsedMs;
+      this.startup.phasesMs = event.phases_ms;
+    }
+    console.log(`Python backend ${event.event} after ${elapsedMs} ms`);
+    this.emit(event.event, event);
+  }
+
+  /**
+   * Resolves once the backend reaches state ("listening" accepts requests,
+   * "ready" has also finished warming up); rejects if it exits first.
+   */
+  whenState(state = "listening", timeoutMs = 30000) {
+    const order = ["starting", "listening", "ready"];
+    if (this.state !== "stopped" && order.indexOf(this.state) >= order.indexOf(state)) {
+      return Promise.resolve(this.status());
+    }
+    return new Promise((resolve, reject) => {
+      const cleanup = () => {
+        clearTimeout(timer);
+        this.off(state, onState);
+        this.off("exit", onExit);
+      };
+      const onState = () => {
+        cleanup();
+        resolve(this.status());
+      };
+      const onExit = (code) => {
+        cleanup();
+        reject(new Error(`Python backend exited with code ${code} before it was ${state}`));
+      };
+      const timer = setTimeout(() => {
+        cleanup();
+        reject(new Error(`Python backend was not ${state} after ${timeoutMs} ms`));
+      }, timeoutMs);
+      this.once(state, onState);
+      this.once("exit", onExit);
+    });
+  }
+
+  /**
+   * Connected client for the binary transport (tiles, thumbnails, pixels and
+   * job progress without HTTP/JSON), or null if the backend did not start one.
+   */
+  async transport() {
+    if (!this.transportInfo) return null;
+    if (!this.transportClient) {
+      this.transportClient = new TransportClient(this.transportInfo);
+    }
+    await this.transportClient.connect();
+    return this.transportClient;
+  }
+
+  /**
+   * A dedicated, connected transport client for one streaming request (job
+   * progress). Each connection answers its requests in order, so a stream on
+   * the shared client would hold up every tile and thumbnail behind it. Pass
+   * it to closeTransportStream() when the stream ends; stop() closes any
+   * left open.
+   */
+  async openTransportStream() {
+    if (!this.transportInfo) return null;
+    const client = new TransportClient(this.transportInfo);
+    this.streamClients.add(client);
+    try {
+      await client.connect();
+    } catch (e) {
+      this.closeTransportStream(client);
+      throw e;
+    }
+    return client;
+  }
+
+  closeTransportStream(client) {
+    this.streamClients.delete(client);
+    client.close();
+  }
+
+  status() {
+    return { state: this.state, port: this.port, startup: this.startup };
+  }
+
   stop() {
     if (!this.isRunning) return;
-    if (this.pythonProcess) {
+    const child = this.pythonProcess;
+    if (child) {
       if (process.platform === "win32") {
-        this.pythonProcess.kill();
+        child.kill();
       } else {
-        // Kill the entire process group on POSIX
-        try {
-          process.kill(-this.pythonProcess.pid, "SIGTERM");
-        } catch (e) {
-          this.pythonProcess.kill();
-        }
+        // SIGTERM lets the server finish requests and checkpoint running jobs
+        const signalGroup = (signal) => {
+          try {
+            process.kill(-child.pid, signal);
+          } catch (e) {
+            child.kill(signal);
+          }
+        };
+        signalGroup("SIGTERM");
+        const timer = setTimeout(() => {
+          if (child.exitCode === null) signalGroup("SIGKILL");
+        }, SHUTDOWN_TIMEOUT_MS);
+        timer.unref();
+        child.once("close", () => clearTimeout(timer));
       }
     }
+    if (this.transportClient) {
+      this.transportClient.close();
+      this.transportClient = null;
+    }
+    for (const client of this.streamClients) client.close();
+    this.streamClients.clear();
+    this.transportInfo = null;
     this.isRunning = false;
+    this.state = "stopped";
   }
 }
 
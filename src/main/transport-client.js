@@ -0,0 +1,104 @@
+const net = require("net");
+
+// Frame prefix: header length (uint32) and payload length (uint64), big-endian.
+// See src/python/dataset/transport.py for the protocol.
+const PREFIX_BYTES = 12;
+
+/**
+ * Client for the backend's binary transport (pixels, thumbnails, tiles and
+ * job progress). Requests are pipelined over one connection and answered in
+ * order; each resolves with its frames as [{ header, payload: Buffer }].
+ */
+class TransportClient {
+  constructor(info) {
+    this.info = info;
+    this.socket = null;
+    this.nextId = 0;
+    this.pending = []; // { id, frames, onFrame, resolve, reject }, oldest first
+    this.buffer = Buffer.alloc(0);
+  }
+
+  connect() {
+    if (this.socket) return this.connected;
+    this.socket = this.info.family === "unix"
+      ? net.createConnection({ path: this.info.path })
+      : net.createConnection({ host: this.info.host, port: this.info.port });
+    this.socket.on("data", (chunk) => this._onData(chunk));
+    this.socket.on("error", (error) => this._failAll(error));
+    this.socket.on("close", () => {
+      this._failAll(new Error("Transport connection closed"));
+      this.socket = null;
+    });
+    this.connected = new Promise((resolve, reject) => {
+      this.socket.once("connect", resolve);
+      this.socket.once("error", reject);
+    }).then(() => (this.info.token ? this.request("hello", { token: this.info.token }) : null));
+    return this.connected;
+  }
+
+  /**
+   * Send a request; onFrame(frame) is called for each frame as it arrives,
+   * which lets tile batches and progress streams be consumed incrementally.
+   */
+  request(op, params = {}, onFrame = null) {
+    const id = ++this.nextId;
+    const header = Buffer.from(JSON.stringify({ ...params, id, op }), "utf8");
+    const prefix = Buffer.alloc(PREFIX_BYTES);
+    prefix.writeUInt32BE(header.length, 0);
+    prefix.writeBigUInt64BE(0n, 4);
+    return new Promise((resolve, reject) => {
+      this.pending.push({ id, frames: [], onFrame, resolve, reject });
+      this.socket.write(Buffer.concat([prefix, header]));
+    });
+  }
+
+  close() {
+    if (this.socket) this.socket.end();
+  }
+
+  _onData(chunk) {
+    this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+    while (this.buffer.length >= PREFIX_BYTES) {
+      const headerLength = this.buffer.readUInt32BE(0);
+      const payloadLength = Number(this.buffer.readBigUInt64BE(4));
+      const frameLength = PREFIX_BYTES + headerLength + payloadLength;
+      if (this.buffer.length < frameLength) return;
+      const header = JSON.parse(
+        this.buffer.toString("utf8", PREFIX_BYTES, PREFIX_BYTES + headerLength)
+      );
+      // A view into the received data, not a copy
+      const payload = this.buffer.subarray(PREFIX_BYTES + headerLength, frameLength);
+      this.buffer = this.buffer.subarray(frameLength);
+      this._onFrame({ header, payload });
+    }
+  }
+
+  _onFrame(frame) {
+    const request = this.pending[0];
+    if (!request) return;
+    if (request.onFrame) {
+      request.onFrame(frame);
+    } else {
+      request.frames.push(frame);
+    }
+    if (!frame.header.more) {
+      this.pending.shift();
+      // Errors inside a stream (a missing tile) have "more"; a final error fails the request
+      if (frame.header.error) {
+        const error = new Error(frame.header.error);
+        error.status = frame.header.status;
+        request.reject(error);
+      } else {
+        request.resolve(request.frames);
+      }
+    }
+  }
+
+  _failAll(error) {
+    const pending = this.pending;
+    this.pending = [];
+    for (const request of pending) request.reject(error);
+  }
+}
+
+module.exports = TransportClient;
@@ -1,14 +1,179 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
+import functools
+import gzip
+import json
 import os
+import shutil
+import time
+from pathlib import Path
 
+from dataset.generations import CATALOG_KEY, GENERATIONS, project_key
+from dataset.jobs import JobManager, JobQueueFull
+from dataset.metrics import PROFILER, REGISTRY, begin_request, end_request, stage
 from dataset.project_manager import ProjectManager
+from dataset.startup import STARTUP
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Times response serialization as its own stage."""
+
+    def dumps(self, obj, **kwargs):
+        with stage("json.dumps"):
+            return super().dumps(obj, **kwargs)
+
 
 app = Flask(__name__)
-project_manager = ProjectManager()
+app.json = TimedJSONProvider(app)
+with STARTUP.phase("projects"):
+    project_manager = ProjectManager()
+with STARTUP.phase("jobs"):
+    job_manager = JobManager(project_manager.base_dir)
+if os.environ.get("SEEKERAUG_PROFILER", "").lower() in ("1", "true"):
+    PROFILER.start()
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    begin_request()
+
+@app.after_request
+def _record_request_timing(response):
+    started = g.pop("request_started", None)
+    stages = end_request()
+    if started is not None:
+        # Label by the route template, not the path, to keep the series count bounded
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        elapsed = time.perf_counter() - started
+        REGISTRY.observe_request(route, request.method, response.status_code, elapsed)
+        timings = [f"total;dur={elapsed * 1000:.2f}"]
+        timings += [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items()]
+        response.headers["Server-Timing"] = ", ".join(timings)
+    return response
+
+# JSON bodies smaller than this are sent as they are; gzip would barely help
+COMPRESS_MIN_BYTES = 4096
+COMPRESS_LEVEL = 5
+
+# Registered after _record_request_timing, so it runs first and is included in the timing
+@app.after_request
+def _compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or response.mimetype != "application/json"
+            or "Content-Encoding" in response.headers
+            or "gzip" not in request.accept_encodings):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    with stage("response.compress"):
+        response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+def etagged(key_for, extra=None):
+    """Give a list route an ETag from a change counter and answer If-None-Match with 304.
+
+    key_for(params) gets the JSON body (POST) or query arguments (GET) and
+    returns the GENERATIONS key the response depends on, or None to serve
+    the route unconditionally. extra(), if given, returns a cheap fingerprint
+    of state the counter does not track, which is mixed into the tag. The tag
+    is computed before the view runs, so a change that lands while it runs
+    can only cost the client a refetch, never leave it with stale data; a
+    304 is answered without touching the project folder or its database.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == "POST":
+                params = request.get_json(silent=True) or {}
+            else:
+                params = request.args.to_dict()
+            key = key_for(params)
+            if key is None:
+                return view(*args, **kwargs)
+            variant = json.dumps(params, sort_keys=True, default=str)
+            if extra is not None:
+                variant += extra()
+            etag = GENERATIONS.etag(key, variant)
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # Weak, because the same list may be sent gzip-compressed or not
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
+
+def _flag(value):
+    return value is True or str(value).lower() == "true"
+
+def _project_etag_key(params, bypass):
+    """The project's counter key, or None when the request asks for a fresh scan (bypass flag)."""
+    project_name = params.get("project_name")
+    if not project_name or _flag(params.get(bypass)):
+        return None
+    return project_key(project_manager.base_dir / project_name)
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Per-route and per-stage counters and latency histograms (Prometheus text, or ?format=json)."""
+    if request.args.get("format") == "json":
+        return jsonify(REGISTRY.snapshot())
+    return Response(REGISTRY.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/profiler", methods=["GET"])
+def get_profile():
+    """Profiler samples: ?format=collapsed for flame graph tools, otherwise top functions as JSON."""
+    limit = request.args.get("limit", 50, type=int)
+    if request.args.get("format") == "collapsed":
+        return Response(PROFILER.collapsed(limit) + "\n", mimetype="text/plain")
+    return jsonify({**PROFILER.status(), "top": PROFILER.top(limit)})
+
+@app.route("/metrics/profiler", methods=["POST"])
+def toggle_profiler():
+    """Start ({"enabled": true, "interval_ms": 10, "include_idle": false}) or stop the sampling profiler."""
+    data = request.json or {}
+    if data.get("enabled"):
+        interval_ms = data.get("interval_ms")
+        PROFILER.start(
+            interval=interval_ms / 1000 if interval_ms else None,
+            include_idle=bool(data.get("include_idle", False)),
+            reset=bool(data.get("reset", True))
+        )
+    else:
+        PROFILER.stop()
+    return jsonify({"status": "success", "profiler": PROFILER.status()})
 
 @app.route("/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "healthy"})
+    return jsonify({"status": "healthy", "ready": STARTUP.ready})
+
+@app.route("/ready", methods=["GET"])
+def readiness():
+    """Warm-up state and startup phase timings; 503 until warm-up has finished."""
+    status = STARTUP.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+def _preload_imaging():
+    import numpy  # noqa: F401
+    from PIL import Image
+    Image.init()  # Registers every format plugin up front
+
+def _preload_modules():
+    import dataset.augmentation  # noqa: F401
+
+# Run by the server once it is listening, so none of this delays the first request
+WARM_UP_STEPS = [
+    ("warmup.jobs", lambda: job_manager.resume_interrupted()),
+    ("warmup.imaging", _preload_imaging),
+    ("warmup.modules", _preload_modules),
+]
 
 @app.route("/project/create", methods=["POST"])
 def create_project():
@@ -29,17 +194,30 @@ from werkzeug.utils import secure_filename
 
 @app.route("/dataset/import", methods=["POST"])
 def import_dataset():
-    # Accept multipart/form-data: project_name (str), files[] (file list)
+    # Accept multipart/form-data: project_name (str), files[] (file list),
+    # mode (optional: "stream" writes uploads straight into raw/, "temp" stages them first),
+    # background (optional: "true" stages the uploads and imports them as a job)
     if 'project_name' not in request.form:
         return jsonify({"error": "Missing project_name"}), 400
     project_name = request.form['project_name']
+    mode = request.form.get('mode', 'stream')
     files = request.files.getlist('files[]')
     if not files:
         return jsonify({"error": "No files uploaded"}), 400
+    if mode not in ("stream", "temp"):
+        return jsonify({"error": f"Unknown import mode '{mode}'"}), 400
     try:
         project_path = project_manager.base_dir / project_name
         if not project_path.exists():
             return jsonify({"error": "Project does not exist"}), 404
+        if request.form.get('background', 'false').lower() == 'true':
+            return _submit_import_job(project_name, project_path, files)
+        importer = DatasetImporter(project_path)
+        if mode == "stream":
+            result = importer.import_streams(
+                (secure_filename(file.filename), file.stream) for file in files
+            )
+            return jsonify({"status": "success", **result})
         # Save uploaded files to temp paths
         temp_paths = []
         for file in files:
@@ -49,24 +227,55 @@ def import_dataset():
             file.save(str(temp_path))
             temp_paths.append(str(temp_path))
         # Import images using DatasetImporter
-        importer = DatasetImporter(project_path)
-        imported = importer.import_images(temp_paths)
+        result = importer.import_images(temp_paths, move=True)
         # Clean up temp files
         for p in temp_paths:
             try:
                 os.remove(p)
             except Exception:
                 pass
-        return jsonify({"status": "success", "imported": imported})
+        return jsonify({"status": "success", **result})
     except Exception as e:
         import traceback
         print("Error in /dataset/import:", e)
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def _submit_import_job(project_name, project_path, files):
+    # Each upload gets its own folder so equal names don't overwrite each other
+    staging_dir = project_path / "_import_temp_" / os.urandom(8).hex()
+    for index, file in enumerate(files):
+        dest = staging_dir / str(index) / secure_filename(file.filename)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        file.save(str(dest))
+    try:
+        job = job_manager.submit("import", project_name, {"staging_dir": str(staging_dir)})
+    except JobQueueFull as e:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"status": "success", "job": job}), 202
+
+def _run_import_job(job, params):
+    project_path = project_manager.base_dir / job.project_name
+    staging_dir = Path(params["staging_dir"])
+    try:
+        paths = sorted(
+            (str(path) for path in staging_dir.glob("*/*") if path.is_file()),
+            key=lambda path: int(Path(path).parent.name)
+        )
+        # Staged next to raw/, so each upload is moved into place rather than written twice
+        return DatasetImporter(project_path).import_images(
+            paths, progress=job.progress, should_stop=lambda: job.cancelled, move=True
+        )
+    finally:
+        # Keep the staged files when the backend stops so the job can resume
+        if not job.interrupted:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
 from dataset.listing import DatasetListing
 
 @app.route("/dataset/list", methods=["POST"])
+@etagged(lambda params: _project_etag_key(params, bypass="revalidate"))
 def list_images():
     data = request.json
     project_name = data.get("project_name")
@@ -77,17 +286,39 @@ def list_images():
         if not project_path.exists():
             return jsonify({"error": "Project does not exist"}), 404
         listing = DatasetListing(project_path)
-        images = listing.list_images()
+        if _wants_page(data):
+            page = listing.list_page(**_page_args(data))
+            return jsonify({"status": "success", **page})
+        images = listing.list_images(revalidate=_flag(data.get("revalidate", False)))
         return jsonify({"status": "success", "images": images})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _wants_page(data):
+    """List requests are paginated once the client sends a limit or cursor."""
+    return data.get("limit") is not None or data.get("cursor") is not None
+
+def _page_args(data):
+    return {
+        "cursor": data.get("cursor"),
+        "limit": data.get("limit"),
+        "sort_by": data.get("sort_by", "added"),
+        "sort_desc": _flag(data.get("sort_desc", False)),
+        "filters": data.get("filters"),
+    }
+
 from dataset.project_listing import ProjectListing
 from dataset.project_ops import ProjectOps # Moved import up
 
 project_ops = ProjectOps() # Instantiate ProjectOps
 
 @app.route("/projects/list", methods=["GET"])
+# The catalog rebuilds when the projects directory's mtime changes (folders
+# added or removed outside the app), so the tag includes that mtime too
+@etagged(lambda params: None if _flag(params.get("refresh")) else CATALOG_KEY,
+         extra=lambda: str(os.stat(project_manager.base_dir).st_mtime_ns))
 def list_projects():
     try:
         # Extract query parameters with defaults
@@ -105,12 +336,14 @@ def list_projects():
 
         # Convert sort_desc param to boolean
         sort_desc = sort_desc_param == 'true'
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
 
         projects = ProjectListing().list_projects(
             archived=archived,
             limit=limit,
             sort_by=sort_by,
-            sort_desc=sort_desc
+            sort_desc=sort_desc,
+            refresh=refresh
         )
         return jsonify({"status": "success", "projects": projects})
     except Exception as e:
@@ -234,7 +467,174 @@ def delete_image():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-from dataset.processor import DatasetProcessor
+def _batch_response(results):
+    failed = sum(1 for result in results if result["status"] != "success")
+    return jsonify({"status": "success", "results": results,
+                    "succeeded": len(results) - failed, "failed": failed})
+
+@app.route("/image/batch/rename", methods=["POST"])
+def rename_images_batch():
+    """Rename items [{"image_id", "new_filename"}, ...] in one transaction; per-item results."""
+    data = request.json
+    project_name = data.get("project_name")
+    items = data.get("items")
+    if not project_name or not isinstance(items, list):
+        return jsonify({"error": "Missing project_name or items"}), 400
+    if any(not isinstance(item, dict) or not item.get("image_id") for item in items):
+        return jsonify({"error": "Each item needs image_id and new_filename"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        results = ImageOps(project_path).rename_images(
+            (item["image_id"], item.get("new_filename")) for item in items
+        )
+        return _batch_response(results)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/image/batch/delete", methods=["POST"])
+def delete_images_batch():
+    """Delete image_ids in one transaction; per-item results."""
+    data = request.json
+    project_name = data.get("project_name")
+    image_ids = data.get("image_ids")
+    if not project_name or not isinstance(image_ids, list):
+        return jsonify({"error": "Missing project_name or image_ids"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        return _batch_response(ImageOps(project_path).delete_images(image_ids))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataset.thumbnails import get_thumbnail_cache, THUMBNAIL_TIERS
+
+# How long a thumbnail request waits for generation before answering 202
+THUMBNAIL_WAIT_SECONDS = 10
+
+@app.route("/image/thumbnail", methods=["GET"])
+def get_thumbnail():
+    project_name = request.args.get("project_name")
+    image_id = request.args.get("image_id")
+    size = request.args.get("size", THUMBNAIL_TIERS[0], type=int)
+    wait = request.args.get("wait", "true").lower() == "true"
+    if not project_name or not image_id:
+        return jsonify({"error": "Missing project_name or image_id"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        cache = get_thumbnail_cache(project_path)
+        if wait:
+            path = cache.get(image_id, size, timeout=THUMBNAIL_WAIT_SECONDS)
+        else:
+            future = cache.request(image_id, size)
+            if not future.done():
+                return jsonify({"status": "pending"}), 202
+            path = future.result()
+        return send_file(path, mimetype="image/jpeg", max_age=3600)
+    except FutureTimeoutError:
+        return jsonify({"status": "pending"}), 202
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/image/thumbnail/prefetch", methods=["POST"])
+def prefetch_thumbnails():
+    data = request.json
+    project_name = data.get("project_name")
+    image_ids = data.get("image_ids") or []
+    size = int(data.get("size", THUMBNAIL_TIERS[0]))
+    if not project_name:
+        return jsonify({"error": "Missing project_name"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        cache = get_thumbnail_cache(project_path)
+        for image_id in image_ids:
+            cache.request(image_id, size)
+        return jsonify({"status": "success", "queued": len(image_ids)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+import io
+from dataset.tiles import TilePyramid
+
+def _open_pyramid(args):
+    project_name = args.get("project_name")
+    image_id = args.get("image_id")
+    if not project_name or not image_id:
+        raise ValueError("Missing project_name or image_id")
+    project_path = project_manager.base_dir / project_name
+    if not project_path.exists():
+        raise FileNotFoundError("Project does not exist")
+    return TilePyramid(project_path, image_id)
+
+@app.route("/image/tiles", methods=["GET"])
+def get_tile_info():
+    """Pyramid layout of a tiled image: full size, tile size and per-level dimensions."""
+    try:
+        return jsonify(_open_pyramid(request.args).info)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/image/tile", methods=["GET"])
+def get_tile():
+    """One pyramid tile; level 0 is full resolution and each level halves it."""
+    try:
+        pyramid = _open_pyramid(request.args)
+        level = request.args.get("level", 0, type=int)
+        x = request.args.get("x", 0, type=int)
+        y = request.args.get("y", 0, type=int)
+        return send_file(pyramid.tile_path(level, x, y), mimetype="image/jpeg", max_age=3600)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/image/region", methods=["GET"])
+def get_region():
+    """A region of a tiled image at a zoom level, in that level's pixel coordinates."""
+    try:
+        pyramid = _open_pyramid(request.args)
+        region = pyramid.region(
+            request.args.get("level", 0, type=int),
+            request.args.get("left", 0, type=int),
+            request.args.get("top", 0, type=int),
+            request.args.get("width", pyramid.tile_size, type=int),
+            request.args.get("height", pyramid.tile_size, type=int),
+        )
+        buffer = io.BytesIO()
+        region.save(buffer, "JPEG", quality=90)
+        buffer.seek(0)
+        return send_file(buffer, mimetype="image/jpeg")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+from dataset.processor import DatasetProcessor, OUTPUT_PROFILES, DEFAULT_PROFILE, resolve_profile
+
+@app.route("/dataset/profiles", methods=["GET"])
+def list_output_profiles():
+    return jsonify({"profiles": OUTPUT_PROFILES, "default": DEFAULT_PROFILE})
 
 @app.route("/dataset/process", methods=["POST"])
 def process_dataset():
@@ -246,14 +646,393 @@ def process_dataset():
         project_path = project_manager.base_dir / project_name
         if not project_path.exists():
             return jsonify({"error": "Project does not exist"}), 404
+        workers = _positive_int(data, "workers")
+        chunksize = _positive_int(data, "chunksize")
+        if data.get("background"):
+            resolve_profile(data.get("profile"))  # Reject bad profiles before queueing
+            return _submit_process_job(project_name, {**data, "workers": workers, "chunksize": chunksize})
         processor = DatasetProcessor(project_path)
-        metadata = processor.process()
+        metadata = processor.process(
+            workers=workers,
+            chunksize=chunksize,
+            force=bool(data.get("force", False)),
+            profile=data.get("profile")
+        )
         return jsonify({"status": "success", "metadata": metadata})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _positive_int(data, key):
+    """data[key] as an int >= 1, or None when absent; raises ValueError otherwise."""
+    value = data.get(key)
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a positive integer")
+    if isinstance(value, bool) or number < 1:
+        raise ValueError(f"{key} must be a positive integer")
+    return number
+
+def _submit_process_job(project_name, data):
+    params = {key: data.get(key) for key in ("workers", "chunksize", "force", "profile")}
+    try:
+        job = job_manager.submit("process", project_name, params)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"status": "success", "job": job}), 202
+
+def _run_process_job(job, params):
+    project_path = project_manager.base_dir / job.project_name
+    if not project_path.exists():
+        raise FileNotFoundError(f"Project '{job.project_name}' does not exist")
+    metadata = DatasetProcessor(project_path).process(
+        workers=params.get("workers"),
+        chunksize=params.get("chunksize"),
+        force=bool(params.get("force")),
+        profile=params.get("profile"),
+        progress=job.progress,
+        should_stop=lambda: job.cancelled
+    )
+    errors = sum(1 for meta in metadata.values() if "error" in meta)
+    return {"processed": len(metadata) - errors, "errors": errors}
+
+job_manager.register("import", _run_import_job)
+job_manager.register("process", _run_process_job)
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    try:
+        jobs = job_manager.list(
+            project_name=request.args.get("project_name"),
+            active_only=request.args.get("active", "false").lower() == "true",
+            limit=request.args.get("limit", 50, type=int)
+        )
+        return jsonify({"status": "success", "jobs": jobs})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"status": "success", "job": job})
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    if not job_manager.cancel(job_id):
+        return jsonify({"error": "Job is not queued or running"}), 409
+    return jsonify({"status": "success", "job": job_manager.get(job_id)})
+
+@app.route("/jobs/<job_id>/resume", methods=["POST"])
+def resume_job(job_id):
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    try:
+        job = job_manager.resume(job_id)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    if job is None:
+        return jsonify({"error": "Job was not interrupted"}), 409
+    return jsonify({"status": "success", "job": job})
+
+from dataset.transport import TransportServer
+
+# Local binary channel for bulk pixels, thumbnails, tiles and job progress;
+# see dataset/transport.py for the framing. server.py starts it.
+transport = TransportServer()
+TRANSPORT_MAX_TILES = 1024
+_TERMINAL_JOB_STATES = ("completed", "failed", "cancelled", "interrupted")
+
+@app.route("/transport", methods=["GET"])
+def transport_info():
+    """Where the binary transport listens (the TCP fallback's token is only given to the launcher)."""
+    return jsonify(transport.info())
+
+def _transport_project(request_header):
+    project_name = request_header.get("project_name")
+    if not project_name:
+        raise ValueError("Missing project_name")
+    project_path = project_manager.base_dir / project_name
+    if not project_path.exists():
+        raise FileNotFoundError("Project does not exist")
+    return project_path
+
+def _send_pixels(reply, img):
+    """Send an image as raw 8-bit RGB(A) rows, straight from its decoded buffer."""
+    import numpy as np
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    pixels = np.asarray(img)
+    reply.send({"width": img.width, "height": img.height, "mode": img.mode,
+                "channels": pixels.shape[2], "dtype": "uint8"}, pixels)
+
+def _transport_thumbnail(req, reply):
+    image_id = req.get("image_id")
+    if not image_id:
+        raise ValueError("Missing image_id")
+    cache = get_thumbnail_cache(_transport_project(req))
+    path = cache.get(image_id, int(req.get("size", THUMBNAIL_TIERS[0])), timeout=THUMBNAIL_WAIT_SECONDS)
+    reply.send_file(path, {"mimetype": "image/jpeg"})
+
+def _transport_tile(req, reply):
+    pyramid = _open_pyramid(req)
+    path = pyramid.tile_path(int(req.get("level", 0)), int(req.get("x", 0)), int(req.get("y", 0)))
+    reply.send_file(path, {"mimetype": "image/jpeg"})
+
+def _transport_tiles(req, reply):
+    # One frame per tile, in request order; a missing tile is an error frame, not the end
+    pyramid = _open_pyramid(req)
+    tiles = req.get("tiles") or []
+    if len(tiles) > TRANSPORT_MAX_TILES:
+        raise ValueError(f"At most {TRANSPORT_MAX_TILES} tiles per request")
+    for index, (level, x, y) in enumerate(tiles):
+        header = {"index": index, "level": level, "x": x, "y": y}
+        try:
+            path = pyramid.tile_path(int(level), int(x), int(y))
+        except (ValueError, FileNotFoundError) as e:
+            reply.error(404 if isinstance(e, FileNotFoundError) else 400, str(e), more=True, **header)
+            continue
+        reply.send_file(path, {**header, "mimetype": "image/jpeg"}, more=True)
+    reply.send({"count": len(tiles)})
+
+def _transport_region(req, reply):
+    # "encoding": "raw" sends decoded RGB rows instead of a JPEG
+    pyramid = _open_pyramid(req)
+    region = pyramid.region(
+        int(req.get("level", 0)), int(req.get("left", 0)), int(req.get("top", 0)),
+        int(req.get("width", pyramid.tile_size)), int(req.get("height", pyramid.tile_size)),
+    )
+    if req.get("encoding", "jpeg") == "raw":
+        _send_pixels(reply, region)
+        return
+    buffer = io.BytesIO()
+    region.save(buffer, "JPEG", quality=90)
+    reply.send({"mimetype": "image/jpeg", "width": region.width, "height": region.height},
+               buffer.getbuffer())
+
+def _transport_pixels(req, reply):
+    # Decoded pixels of an image's processed output (or its raw file before processing),
+    # optionally reduced so the longer side is at most max_edge
+    from PIL import Image
+    from dataset.database import get_project_db
+    from dataset.fileio import raw_image_path
+    project_path = _transport_project(req)
+    image_id = req.get("image_id")
+    with get_project_db(project_path).connection() as conn:
+        row = conn.execute(
+            "SELECT filename, original_filename, processed_filename FROM images WHERE id = ?",
+            (image_id,)
+        ).fetchone()
+    if not row:
+        raise FileNotFoundError(f"Image id {image_id} not found.")
+    filename, original_filename, processed_filename = row
+    source = raw_image_path(project_path / "raw", image_id, filename, original_filename)
+    if processed_filename and (project_path / "processed" / processed_filename).exists():
+        source = project_path / "processed" / processed_filename
+    max_edge = req.get("max_edge")
+    with Image.open(source) as img:
+        if max_edge:
+            img.draft("RGB", (int(max_edge), int(max_edge)))
+            img.thumbnail((int(max_edge), int(max_edge)))
+        else:
+            img.load()
+        _send_pixels(reply, img)
+
+def _transport_job_progress(req, reply):
+    # Streams the job's status whenever it changes until it reaches a terminal state
+    job_id = req.get("job_id")
+    interval = max(0.05, float(req.get("interval_ms", 250)) / 1000)
+    last = None
+    while True:
+        job = job_manager.get(job_id)
+        if job is None:
+            raise FileNotFoundError("Job not found")
+        done = job["state"] in _TERMINAL_JOB_STATES
+        if done or job != last:
+            reply.send({"job": job}, more=not done)
+            last = job
+        if done:
+            return
+        time.sleep(interval)
+
+transport.register("thumbnail", _transport_thumbnail)
+transport.register("tile", _transport_tile)
+transport.register("tiles", _transport_tiles)
+transport.register("region", _transport_region)
+transport.register("pixels", _transport_pixels)
+transport.register("job_progress", _transport_job_progress)
+
+# dataset.augmentation is NumPy throughout, so it is imported on first use
+# rather than at startup (see /ready for the warm-up that preloads it)
+_AUGMENT_PARAMS = ("name", "pipeline", "seed", "copies", "batch_size", "image_ids")
+
+@app.route("/dataset/augment", methods=["POST"])
+def augment_dataset():
+    # JSON: project_name, name (version name), pipeline ([{"type": ..., ...}]),
+    # seed, copies, batch_size, image_ids (all optional but name/pipeline), background
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name or not data.get("name") or not data.get("pipeline"):
+        return jsonify({"error": "Missing project_name, name or pipeline"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        params = {key: data.get(key) for key in _AUGMENT_PARAMS if data.get(key) is not None}
+        if data.get("background"):
+            try:
+                job = job_manager.submit("augment", project_name, params)
+            except JobQueueFull as e:
+                return jsonify({"error": str(e)}), 503
+            return jsonify({"status": "success", "job": job}), 202
+        from dataset.augmentation import DatasetAugmenter
+        version = DatasetAugmenter(project_path).run(**params)
+        return jsonify({"status": "success", "version": version})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileExistsError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _run_augment_job(job, params):
+    from dataset.augmentation import DatasetAugmenter
+    project_path = project_manager.base_dir / job.project_name
+    return DatasetAugmenter(project_path).run(
+        **params, progress=job.progress, should_stop=lambda: job.cancelled
+    )
+
+job_manager.register("augment", _run_augment_job)
+
+from dataset.versions import VersionStore
+
+@app.route("/dataset/versions", methods=["POST"])
+def list_versions():
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name:
+        return jsonify({"error": "Missing project_name"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        return jsonify({"status": "success", "versions": VersionStore(project_path).list()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/dataset/snapshot", methods=["POST"])
+def create_snapshot():
+    # JSON: project_name, name, message (optional)
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name or not data.get("name"):
+        return jsonify({"error": "Missing project_name or name"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        version = VersionStore(project_path).create_snapshot(data["name"], data.get("message"))
+        return jsonify({"status": "success", "version": version})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileExistsError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/dataset/versions/diff", methods=["POST"])
+def diff_versions():
+    # JSON: project_name, from, to (snapshot names), limit (ids listed per category)
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name or not data.get("from") or not data.get("to"):
+        return jsonify({"error": "Missing project_name, from or to"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        diff = VersionStore(project_path).diff(data["from"], data["to"], limit=data.get("limit", 1000))
+        return jsonify({"status": "success", "diff": diff})
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/dataset/versions/delete", methods=["POST"])
+def delete_version():
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name or not data.get("name"):
+        return jsonify({"error": "Missing project_name or name"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        VersionStore(project_path).delete(data["name"])
+        return jsonify({"status": "success"})
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+from dataset.export import DatasetExporter
+
+_EXPORT_PARAMS = ("output_dir", "name", "version", "classes", "shard_size", "workers")
+
+@app.route("/dataset/export", methods=["POST"])
+def export_dataset():
+    # JSON: project_name, format ("coco" | "yolo" | "tar"), name or output_dir,
+    # version (optional), classes, shard_size, workers, background
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name or not data.get("format"):
+        return jsonify({"error": "Missing project_name or format"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        params = {key: data.get(key) for key in _EXPORT_PARAMS if data.get(key) is not None}
+        params["fmt"] = data["format"]
+        if data.get("background"):
+            try:
+                job = job_manager.submit("export", project_name, params)
+            except JobQueueFull as e:
+                return jsonify({"error": str(e)}), 503
+            return jsonify({"status": "success", "job": job}), 202
+        summary = DatasetExporter(project_path).export(**params)
+        return jsonify({"status": "success", "export": summary})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except FileExistsError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _run_export_job(job, params):
+    project_path = project_manager.base_dir / job.project_name
+    return DatasetExporter(project_path).export(
+        **params, progress=job.progress, should_stop=lambda: job.cancelled
+    )
+
+job_manager.register("export", _run_export_job)
+
+from dataset.history import DatasetHistory
+
 @app.route("/dataset/history", methods=["POST"])
 def dataset_history():
+    # JSON: project_name, limit, cursor, actions (str or list), since, until
+    # (ISO 8601, UTC unless an offset is given), filename
     data = request.json
     project_name = data.get("project_name")
     if not project_name:
@@ -263,38 +1042,73 @@ def dataset_history():
         db_path = project_path / "database.sqlite"
         if not db_path.exists():
             return jsonify({"error": "Project database does not exist"}), 404
-        import sqlite3
-        with sqlite3.connect(db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS dataset_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    action TEXT,
-                    filename TEXT,
-                    original_filename TEXT,
-                    details TEXT
-                )
-            """)
-            rows = conn.execute("SELECT id, timestamp, action, filename, original_filename, details FROM dataset_history ORDER BY id DESC").fetchall()
-            history = [
-                {
-                    "id": row[0],
-                    "timestamp": row[1],
-                    "action": row[2],
-                    "filename": row[3],
-                    "original_filename": row[4],
-                    "details": row[5]
-                }
-                for row in rows
-            ]
-        return jsonify({"status": "success", "history": history})
+        history = DatasetHistory(project_path)
+        page = history.page(
+            cursor=data.get("cursor"),
+            limit=data.get("limit"),
+            actions=data.get("actions"),
+            since=data.get("since"),
+            until=data.get("until"),
+            filename=data.get("filename")
+        )
+        if history.compaction_due():
+            _schedule_history_compaction(project_name)
+        return jsonify({"status": "success", **page})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/dataset/history/compact", methods=["POST"])
+def compact_dataset_history():
+    # JSON: project_name, older_than_days, retention_days, background
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name:
+        return jsonify({"error": "Missing project_name"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not (project_path / "database.sqlite").exists():
+            return jsonify({"error": "Project database does not exist"}), 404
+        params = {key: data.get(key) for key in ("older_than_days", "retention_days")
+                  if data.get(key) is not None}
+        if data.get("background"):
+            try:
+                job = job_manager.submit("history_compact", project_name, params)
+            except JobQueueFull as e:
+                return jsonify({"error": str(e)}), 503
+            return jsonify({"status": "success", "job": job}), 202
+        result = DatasetHistory(project_path).compact(**params)
+        return jsonify({"status": "success", "result": result})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _schedule_history_compaction(project_name):
+    """Queue the retention policy's compaction unless one is already pending."""
+    if any(job["kind"] == "history_compact"
+           for job in job_manager.list(project_name=project_name, active_only=True)):
+        return
+    try:
+        job_manager.submit("history_compact", project_name, {})
+    except JobQueueFull:
+        pass  # Retried on a later history request
+
+def _run_history_compact_job(job, params):
+    project_path = project_manager.base_dir / job.project_name
+    if not project_path.exists():
+        raise FileNotFoundError(f"Project '{job.project_name}' does not exist")
+    return DatasetHistory(project_path).compact(**params, should_stop=lambda: job.cancelled)
+
+job_manager.register("history_compact", _run_history_compact_job)
+
 # --- APPEND: Dataset Intake, Annotation, and Raw Metadata Endpoints (from previous LLM version) ---
 
 import json
 from pathlib import Path
+from dataset.annotation_store import AnnotationStore
+from dataset.raw_metadata import RawMetadataStore
 
 @app.route("/dataset/intake", methods=["POST"])
 def intake_to_refined():
@@ -306,9 +1120,21 @@ def intake_to_refined():
         project_path = project_manager.base_dir / project_name
         if not project_path.exists():
             return jsonify({"error": "Project does not exist"}), 404
+        workers = _positive_int(data, "workers")
+        chunksize = _positive_int(data, "chunksize")
+        if data.get("background"):
+            resolve_profile(data.get("profile"))  # Reject bad profiles before queueing
+            return _submit_process_job(project_name, {**data, "workers": workers, "chunksize": chunksize})
         processor = DatasetProcessor(project_path)
-        metadata = processor.process()
+        metadata = processor.process(
+            workers=workers,
+            chunksize=chunksize,
+            force=bool(data.get("force", False)),
+            profile=data.get("profile")
+        )
         return jsonify({"status": "success", "metadata": metadata})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -320,12 +1146,11 @@ def get_annotation():
         return jsonify({"error": "Missing project_name or image_filename"}), 400
     try:
         project_path = project_manager.base_dir / project_name
-        processed_dir = project_path / "processed"
-        annotation_path = processed_dir / f"{Path(image_filename).stem}.json"
-        if not annotation_path.exists():
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        annotation = AnnotationStore(project_path).get(Path(image_filename).stem)
+        if annotation is None:
             return jsonify({"error": "Annotation file not found"}), 404
-        with open(annotation_path, "r") as f:
-            annotation = json.load(f)
         return jsonify({"status": "success", "annotation": annotation})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -340,32 +1165,99 @@ def save_annotation():
         return jsonify({"error": "Missing project_name, image_filename, or annotation"}), 400
     try:
         project_path = project_manager.base_dir / project_name
-        processed_dir = project_path / "processed"
-        annotation_path = processed_dir / f"{Path(image_filename).stem}.json"
-        with open(annotation_path, "w") as f:
-            json.dump(annotation, f, indent=2)
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        AnnotationStore(project_path).save(Path(image_filename).stem, annotation)
         return jsonify({"status": "success"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/annotation/batch/get", methods=["POST"])
+def get_annotations_batch():
+    data = request.json
+    project_name = data.get("project_name")
+    image_filenames = data.get("image_filenames")
+    if not project_name or not isinstance(image_filenames, list):
+        return jsonify({"error": "Missing project_name or image_filenames"}), 400
+    if any(not isinstance(name, str) for name in image_filenames):
+        return jsonify({"error": "image_filenames must be strings"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        documents = AnnotationStore(project_path).get_many(
+            [Path(name).stem for name in image_filenames]
+        )
+        annotations = {name: documents.get(Path(name).stem) for name in image_filenames}
+        return jsonify({"status": "success", "annotations": annotations})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/annotation/batch/save", methods=["POST"])
+def save_annotations_batch():
+    data = request.json
+    project_name = data.get("project_name")
+    items = data.get("items")
+    if not project_name or not isinstance(items, list):
+        return jsonify({"error": "Missing project_name or items"}), 400
+    if any(not isinstance(item, dict) or not isinstance(item.get("image_filename"), str)
+           or not item["image_filename"] or not item.get("annotation") for item in items):
+        return jsonify({"error": "Each item needs image_filename and annotation"}), 400
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        saved = AnnotationStore(project_path).save_many(
+            [(Path(item["image_filename"]).stem, item["annotation"]) for item in items]
+        )
+        return jsonify({"status": "success", "saved": saved})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/annotation/query", methods=["POST"])
+def query_annotations():
+    """Find boxes by class and/or overlapping region, or images with no labels."""
+    data = request.json
+    project_name = data.get("project_name")
+    if not project_name:
+        return jsonify({"error": "Missing project_name"}), 400
+    region = data.get("region")
+    if region is not None and (not isinstance(region, list) or len(region) != 4):
+        return jsonify({"error": "region must be [x1, y1, x2, y2]"}), 400
+    limit = int(data.get("limit", 1000))
+    try:
+        project_path = project_manager.base_dir / project_name
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        store = AnnotationStore(project_path)
+        if data.get("unlabeled"):
+            return jsonify({"status": "success", "image_ids": store.unlabeled_images(limit)})
+        matches = store.query_boxes(label=data.get("class"), region=region, limit=limit)
+        return jsonify({"status": "success", "matches": matches})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/raw/metadata", methods=["GET"])
+@etagged(lambda params: _project_etag_key(params, bypass="export"))
 def get_raw_metadata():
     project_name = request.args.get("project_name")
+    export = request.args.get("export", "false").lower() == "true"
     if not project_name:
         return jsonify({"error": "Missing project_name"}), 400
     try:
         project_path = project_manager.base_dir / project_name
-        raw_dir = project_path / "raw"
-        metadata_path = raw_dir / "raw_metadata.json"
-        if not metadata_path.exists():
-            return jsonify({"status": "success", "metadata": {}})
-        with open(metadata_path, "r") as f:
-            metadata = json.load(f)
-        return jsonify({"status": "success", "metadata": metadata})
+        if not project_path.exists():
+            return jsonify({"error": "Project does not exist"}), 404
+        store = RawMetadataStore(project_path)
+        if export:
+            # Write raw/raw_metadata.json for external tools that read the file
+            store.export_json()
+        return jsonify({"status": "success", "metadata": store.all()})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/dataset/refined/list", methods=["POST"])
+@etagged(lambda params: _project_etag_key(params, bypass="revalidate"))
 def list_refined_images():
     data = request.json
     project_name = data.get("project_name")
@@ -375,6 +1267,9 @@ def list_refined_images():
         project_path = project_manager.base_dir / project_name
         if not project_path.exists():
             return jsonify({"error": "Project does not exist"}), 404
+        if _wants_page(data):
+            page = DatasetListing(project_path).list_page(processed_only=True, **_page_args(data))
+            return jsonify({"status": "success", **page})
         processed_dir = project_path / "processed"
         metadata_path = processed_dir / "metadata.json"
         if not metadata_path.exists():
@@ -392,9 +1287,18 @@ def list_refined_images():
                     "path": str(img_path)
                 })
         return jsonify({"status": "success", "images": images})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="127.0.0.1", port=port, debug=True)
+    # SEEKERAUG_RELOAD=0 skips the reloader's second interpreter for a faster start
+    reload = os.environ.get("SEEKERAUG_RELOAD", "1") != "0"
+    # With the reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if not reload or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        STARTUP.warm_up(WARM_UP_STEPS)
+        if os.environ.get("SEEKERAUG_TRANSPORT", "1") != "0":
+            print(f"Binary transport: {transport.start()}", flush=True)
+    app.run(host="127.0.0.1", port=port, debug=True, use_reloader=reload)
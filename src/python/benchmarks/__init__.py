@@ -0,0 +1 @@
+"""Benchmark harness and synthetic data generator; see benchmarks.run."""
@@ -0,0 +1,464 @@
+"""Benchmark the backend end to end through Flask's test client.
+
+Generates a synthetic project in a scratch directory, drives the HTTP
+endpoints the app uses (import, listing, processing, annotation, thumbnails,
+project listing), launches the real server to time its cold start, and
+reports per scenario: throughput, request latency
+percentiles and peak resident memory. Results are JSON so runs can be kept
+and compared:
+
+    cd src/python
+    python -m benchmarks.run --images 500 --output before.json
+    python -m benchmarks.run --images 500 --baseline before.json --output after.json
+
+The backend runs against a temporary HOME, so the real ~/.seekeraug is never
+touched. Scenarios not selected with --scenarios but needed by later ones
+(import, process) still run, unmeasured, as setup.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from importlib import metadata
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.synthetic import DEFAULT_CLASSES, generate_annotations, generate_images
+
+RESULTS_VERSION = 1
+PROJECT_NAME = "benchmark"
+SCENARIOS = (
+    "cold_start", "import", "list", "process", "reprocess", "refined_list", "annotate",
+    "annotation_query", "thumbnails", "projects_list",
+)
+PERCENTILES = (50, 90, 95, 99)
+SERVER_SCRIPT = Path(__file__).resolve().parent.parent / "server.py"
+COLD_START_TIMEOUT = 60
+
+
+class BenchmarkError(Exception):
+    """Raised when an endpoint fails during a benchmark run."""
+
+
+def _current_rss():
+    """Resident set size of this process in bytes, or None if unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss(who):
+    """Peak RSS in bytes from getrusage (kilobytes on Linux, bytes on macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples the process's RSS in a background thread to find a scenario's peak.
+
+    getrusage only reports the lifetime peak, which later scenarios can't go
+    below; sampling /proc gives each scenario its own. Where /proc is missing
+    the lifetime peak is reported instead.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = _current_rss()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            self.peak = _max_rss(resource.RUSAGE_SELF) if resource else None
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+
+class Scenario:
+    """Collects request latencies and the number of items a scenario handled."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.items = 0
+        self.extra = {}  # Scenario-specific fields added to its results
+
+    def request(self, call, path, **kwargs):
+        start = time.perf_counter()
+        response = call(path, **kwargs)
+        self.latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise BenchmarkError(
+                f"{self.name}: {path} returned {response.status_code}: {response.get_data(as_text=True)[:500]}"
+            )
+        return response
+
+
+def _percentile(sorted_values, percent):
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * percent / 100
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def _summarize(scenario, seconds, peak_rss):
+    latencies = sorted(scenario.latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    to_mb = lambda value: None if value is None else round(value / (1024 * 1024), 1)
+    latency = {f"p{p}": ms(_percentile(latencies, p)) for p in PERCENTILES}
+    latency["mean"] = ms(sum(latencies) / len(latencies)) if latencies else None
+    latency["max"] = ms(latencies[-1]) if latencies else None
+    return {
+        "items": scenario.items,
+        "requests": len(latencies),
+        "seconds": round(seconds, 4),
+        "items_per_second": round(scenario.items / seconds, 2) if seconds > 0 else None,
+        "latency_ms": latency,
+        "peak_rss_mb": to_mb(peak_rss),
+        # Lifetime peak of the largest finished child (the processor's pool workers)
+        "children_peak_rss_mb": to_mb(_max_rss(resource.RUSAGE_CHILDREN) if resource else None),
+        **scenario.extra,
+    }
+
+
+class BenchmarkRun:
+    """One benchmark run against a fresh synthetic project."""
+
+    def __init__(self, workdir, options):
+        self.workdir = Path(workdir)
+        self.options = options
+        self.client = None
+        self.source_paths = []
+        self.processed_filenames = []
+
+    def run(self, selected):
+        # The backend resolves ~/.seekeraug at import time, so point HOME away first
+        home = self.workdir / "home"
+        home.mkdir(parents=True, exist_ok=True)
+        os.environ["HOME"] = os.environ["USERPROFILE"] = str(home)
+        import api
+        self.client = api.app.test_client()
+
+        opts = self.options
+        self.source_paths = generate_images(
+            self.workdir / "sources", opts.images, opts.width, opts.height,
+            opts.tiff_ratio, seed=opts.seed
+        )
+        self.client.post("/project/create", json={"project_name": PROJECT_NAME})
+
+        results = {}
+        try:
+            for name in SCENARIOS:
+                step = getattr(self, f"_scenario_{name}")
+                scenario = Scenario(name)
+                if name not in selected:
+                    if name in ("import", "process"):
+                        step(scenario)
+                    continue
+                with PeakRSS() as rss:
+                    start = time.perf_counter()
+                    step(scenario)
+                    seconds = time.perf_counter() - start
+                results[name] = _summarize(scenario, seconds, rss.peak)
+                print(f"{name:>17}: {results[name]['items_per_second']} items/s, "
+                      f"p50 {results[name]['latency_ms']['p50']} ms", file=sys.stderr)
+        finally:
+            api.job_manager.shutdown()
+            from dataset.database import close_all
+            close_all()
+        return results
+
+    def _pages(self, scenario, path, payload):
+        cursor = None
+        while True:
+            body = scenario.request(
+                self.client.post, path, json={**payload, "limit": self.options.page_size, "cursor": cursor}
+            ).get_json()
+            yield body["images"]
+            cursor = body.get("next_cursor")
+            if not cursor:
+                return
+
+    def _scenario_cold_start(self, scenario):
+        # Latency is launch to the first successful /health; the server's own
+        # phase timings and its time to ready come from its stdout events
+        ready_ms = []
+        phases = {}
+        for launch in range(self.options.cold_starts):
+            with socket.socket() as probe:
+                probe.bind(("127.0.0.1", 0))
+                port = probe.getsockname()[1]
+            env = dict(os.environ, PORT=str(port), PYTHONUNBUFFERED="1",
+                       HOME=str(self.workdir / "cold-home"), USERPROFILE=str(self.workdir / "cold-home"))
+            events = {}
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, str(SERVER_SCRIPT)], env=env, text=True,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            reader = threading.Thread(target=self._read_events, args=(process, start, events), daemon=True)
+            reader.start()
+            try:
+                while True:
+                    if process.poll() is not None:
+                        raise BenchmarkError(f"cold_start: server exited with code {process.returncode}")
+                    if time.perf_counter() - start > COLD_START_TIMEOUT:
+                        raise BenchmarkError("cold_start: server did not answer /health in time")
+                    try:
+                        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                            break
+                    except (urllib.error.URLError, ConnectionError):
+                        time.sleep(0.002)
+                scenario.latencies.append(time.perf_counter() - start)
+                scenario.items += 1
+                reader_deadline = start + COLD_START_TIMEOUT
+                while "ready" not in events and process.poll() is None and time.perf_counter() < reader_deadline:
+                    time.sleep(0.005)
+            finally:
+                process.terminate()
+                process.wait()
+                reader.join()
+            if "ready" in events:
+                seconds, event = events["ready"]
+                ready_ms.append(seconds * 1000)
+                for name, ms in event.get("phases_ms", {}).items():
+                    phases.setdefault(name, []).append(ms)
+        ready_ms.sort()
+        rounded = lambda value: None if value is None else round(value, 3)
+        scenario.extra["ready_ms"] = {f"p{p}": rounded(_percentile(ready_ms, p)) for p in (50, 90)}
+        scenario.extra["startup_phases_ms"] = {
+            name: rounded(_percentile(sorted(values), 50)) for name, values in phases.items()
+        }
+
+    @staticmethod
+    def _read_events(process, start, events):
+        for line in process.stdout:
+            if line.startswith("SEEKERAUG_EVENT "):
+                event = json.loads(line.split(" ", 1)[1])
+                events[event["event"]] = (time.perf_counter() - start, event)
+
+    def _scenario_import(self, scenario):
+        batch = self.options.batch_size
+        for start in range(0, len(self.source_paths), batch):
+            files = [(open(path, "rb"), path.name) for path in self.source_paths[start:start + batch]]
+            try:
+                body = scenario.request(
+                    self.client.post, "/dataset/import",
+                    data={"project_name": PROJECT_NAME, "files[]": files},
+                    content_type="multipart/form-data",
+                ).get_json()
+            finally:
+                for handle, _ in files:
+                    handle.close()
+            scenario.items += len(body["imported"])
+
+    def _scenario_list(self, scenario):
+        for _ in range(self.options.repeat):
+            for images in self._pages(scenario, "/dataset/list", {"project_name": PROJECT_NAME}):
+                scenario.items += len(images)
+
+    def _scenario_process(self, scenario):
+        body = scenario.request(
+            self.client.post, "/dataset/process",
+            json={"project_name": PROJECT_NAME, "workers": self.options.workers},
+        ).get_json()
+        scenario.items += len(body["metadata"])
+        self.processed_filenames = sorted(
+            key for key, meta in body["metadata"].items() if "error" not in meta
+        )
+
+    def _scenario_reprocess(self, scenario):
+        # Nothing changed, so this measures the manifest check alone
+        self._scenario_process(scenario)
+
+    def _scenario_refined_list(self, scenario):
+        for _ in range(self.options.repeat):
+            for images in self._pages(scenario, "/dataset/refined/list", {"project_name": PROJECT_NAME}):
+                scenario.items += len(images)
+
+    def _scenario_annotate(self, scenario):
+        annotations_for = generate_annotations(
+            self.options.width, self.options.height, self.options.annotations, seed=self.options.seed
+        )
+        batch = self.options.batch_size
+        for start in range(0, len(self.processed_filenames), batch):
+            items = []
+            for index, filename in enumerate(self.processed_filenames[start:start + batch], start):
+                items.append({
+                    "image_filename": filename,
+                    "annotation": {"image_id": Path(filename).stem, "filename": filename,
+                                   "annotations": annotations_for(index)},
+                })
+            scenario.request(
+                self.client.post, "/annotation/batch/save",
+                json={"project_name": PROJECT_NAME, "items": items},
+            )
+            scenario.items += len(items)
+
+    def _scenario_annotation_query(self, scenario):
+        for _ in range(self.options.repeat):
+            for label in DEFAULT_CLASSES:
+                body = scenario.request(
+                    self.client.post, "/annotation/query",
+                    json={"project_name": PROJECT_NAME, "class": label, "limit": 100},
+                ).get_json()
+                scenario.items += len(body["matches"])
+
+    def _scenario_thumbnails(self, scenario):
+        for filename in self.processed_filenames[:self.options.thumbnails]:
+            scenario.request(
+                self.client.get, "/image/thumbnail",
+                query_string={"project_name": PROJECT_NAME, "image_id": Path(filename).stem},
+            )
+            scenario.items += 1
+
+    def _scenario_projects_list(self, scenario):
+        import api
+        for index in range(self.options.projects):
+            api.project_manager.create_project(f"{PROJECT_NAME}-{index:05d}")
+        for _ in range(self.options.repeat):
+            body = scenario.request(self.client.get, "/projects/list").get_json()
+            scenario.items += len(body["projects"])
+
+
+def _environment():
+    versions = {}
+    for package in ("flask", "Pillow", "numpy", "waitress"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+        "commit": commit,
+    }
+
+
+def compare(results, baseline):
+    """Ratios of results to baseline per scenario (>1 means more throughput, slower p50, more memory)."""
+    ratio = lambda new, old: round(new / old, 3) if new is not None and old else None
+    comparison = {}
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        comparison[name] = {
+            "items_per_second": ratio(current["items_per_second"], previous["items_per_second"]),
+            "p50_ms": ratio(current["latency_ms"]["p50"], previous["latency_ms"]["p50"]),
+            "p99_ms": ratio(current["latency_ms"]["p99"], previous["latency_ms"]["p99"]),
+            "peak_rss_mb": ratio(current["peak_rss_mb"], previous["peak_rss_mb"]),
+        }
+    return comparison
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the SeekerAug backend.")
+    parser.add_argument("--images", type=int, default=200, help="Synthetic images to generate")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--tiff-ratio", type=float, default=0.2, help="Share of images written as TIFF")
+    parser.add_argument("--annotations", type=float, default=3.0, help="Mean boxes per image")
+    parser.add_argument("--projects", type=int, default=50, help="Extra projects for projects_list")
+    parser.add_argument("--workers", type=int, default=None, help="Processor worker processes")
+    parser.add_argument("--batch-size", type=int, default=50, help="Files per import/annotation request")
+    parser.add_argument("--page-size", type=int, default=100, help="Listing page size")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of the read-only scenarios")
+    parser.add_argument("--thumbnails", type=int, default=50, help="Thumbnails to generate")
+    parser.add_argument("--cold-starts", type=int, default=5, help="Server launches timed by cold_start")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--workdir",
+                        help="Directory to create the scratch directory in (default: the temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = _parse_args(argv)
+    selected = [name.strip() for name in options.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    # Always a fresh directory of our own, so removing it never touches the user's files
+    if options.workdir:
+        Path(options.workdir).mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix="seekeraug-bench-", dir=options.workdir))
+    try:
+        scenarios = BenchmarkRun(workdir, options).run(selected)
+    finally:
+        if options.keep:
+            print(f"Scratch directory kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    results = {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(),
+        "config": {key: value for key, value in vars(options).items()
+                   if key not in ("workdir", "keep", "output", "baseline")},
+        "environment": _environment(),
+        "scenarios": scenarios,
+    }
+    if options.baseline:
+        with open(options.baseline, "r") as f:
+            results["comparison"] = compare(results, json.load(f))
+    data = json.dumps(results, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
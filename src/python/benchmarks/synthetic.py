@@ -0,0 +1,72 @@
+"""Deterministic synthetic datasets for the benchmarks.
+
+Every image and annotation is derived from the seed, so two runs with the
+same settings import, process and list byte-identical data.
+"""
+import random
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_CLASSES = ("car", "truck", "person", "boat", "aircraft")
+
+
+def generate_images(out_dir, count=100, width=640, height=480, tiff_ratio=0.2,
+                    tiff_compression="tiff_lzw", seed=0):
+    """Write count images to out_dir and return their paths in order.
+
+    A tiff_ratio share of them (spread evenly) are TIFFs, the rest RGB JPEGs.
+    Each image is a smooth gradient with a seeded patch of noise, which keeps
+    files realistically compressible and every file's content hash unique.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    ys, xs = np.indices((height, width), dtype=np.uint16)
+    gradient = np.stack([xs * 255 // max(1, width - 1), ys * 255 // max(1, height - 1),
+                         (xs + ys) % 256], axis=2).astype(np.uint8)
+    patch = (min(64, height), min(64, width))
+    paths = []
+    tiff_every = 1 / tiff_ratio if tiff_ratio > 0 else None
+    for index in range(count):
+        pixels = gradient.copy()
+        top = int(rng.integers(0, height - patch[0] + 1))
+        left = int(rng.integers(0, width - patch[1] + 1))
+        pixels[top:top + patch[0], left:left + patch[1]] = rng.integers(
+            0, 256, patch + (3,), dtype=np.uint8
+        )
+        is_tiff = tiff_every is not None and int(index % tiff_every) == 0
+        path = out_dir / f"synthetic_{index:06d}.{'tif' if is_tiff else 'jpg'}"
+        image = Image.fromarray(pixels)
+        if is_tiff:
+            image.save(path, "TIFF", compression=tiff_compression)
+        else:
+            image.save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def generate_annotations(width, height, density=3.0, classes=DEFAULT_CLASSES, seed=0):
+    """Return a callable(index) -> list of bbox annotations for image index.
+
+    The number of boxes per image is Poisson-distributed around density.
+    """
+    def annotations_for(index):
+        rng = random.Random(f"{seed}:{index}")
+        count = np.random.default_rng([seed, index]).poisson(density) if density > 0 else 0
+        boxes = []
+        for number in range(count):
+            w = rng.uniform(0.05, 0.4) * width
+            h = rng.uniform(0.05, 0.4) * height
+            x = rng.uniform(0, width - w)
+            y = rng.uniform(0, height - h)
+            boxes.append({
+                "id": f"synthetic-{index}-{number}",
+                "type": "bbox",
+                "class": rng.choice(classes),
+                "coordinates": [round(x, 1), round(y, 1), round(x + w, 1), round(y + h, 1)],
+            })
+        return boxes
+
+    return annotations_for
@@ -0,0 +1,220 @@
+import json
+import threading
+from pathlib import Path
+
+from dataset.database import get_project_db
+from dataset.generations import bump_project
+from dataset.locks import project_lock
+from dataset.metrics import stage
+
+# processed/*.json files that are bookkeeping, not per-image annotation files
+RESERVED_JSON_FILES = {"metadata.json", "manifest.json"}
+_LEGACY_IMPORTED_KEY = "annotation_json_imported"
+# Stay well under SQLite's bound-parameter limit for IN (...) lists
+_BATCH_SIZE = 500
+
+_checked_projects = set()
+_checked_lock = threading.Lock()
+
+
+def _bounds(annotation):
+    """Return (min_x, max_x, min_y, max_y) for an annotation's coordinates, or None.
+
+    Works for bbox [x1, y1, x2, y2], flat polygons [x1, y1, x2, y2, ...] and
+    nested point lists [[x, y], ...].
+    """
+    coords = annotation.get("coordinates")
+    if not isinstance(coords, list):
+        return None
+    flat = []
+    for value in coords:
+        if isinstance(value, (list, tuple)):
+            flat.extend(value)
+        else:
+            flat.append(value)
+    if len(flat) < 2 or len(flat) % 2:
+        return None
+    try:
+        xs = [float(v) for v in flat[0::2]]
+        ys = [float(v) for v in flat[1::2]]
+    except (TypeError, ValueError):
+        return None
+    return min(xs), max(xs), min(ys), max(ys)
+
+
+def _chunks(items, size=_BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class AnnotationStore:
+    """Per-image annotation documents stored in the project database.
+
+    The document (image info, history, ...) lives in annotation_documents,
+    each annotation object is a row in the annotations table, and an R-tree
+    (annotation_boxes) indexes their bounding boxes by annotation rowid.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = Path(project_path)
+        self.processed_dir = self.project_path / "processed"
+        self.db = get_project_db(self.project_path)
+        self.lock = project_lock(self.project_path)
+        self._import_legacy_json()
+
+    def get(self, image_id):
+        return self.get_many([image_id]).get(image_id)
+
+    @stage("annotations.get_many")
+    def get_many(self, image_ids):
+        """Return {image_id: document} for the ids that have one."""
+        image_ids = list(dict.fromkeys(image_ids))
+        documents = {}
+        with self.lock.read(), self.db.connection() as conn:
+            for chunk in _chunks(image_ids):
+                placeholders = ", ".join("?" for _ in chunk)
+                for image_id, data in conn.execute(
+                    f"SELECT image_id, data FROM annotation_documents WHERE image_id IN ({placeholders})",
+                    chunk
+                ):
+                    document = json.loads(data)
+                    document["annotations"] = []
+                    documents[image_id] = document
+                for image_id, data in conn.execute(
+                    f"""
+                    SELECT image_id, data FROM annotations
+                    WHERE image_id IN ({placeholders})
+                    ORDER BY image_id, position
+                    """,
+                    chunk
+                ):
+                    if image_id in documents:
+                        documents[image_id]["annotations"].append(json.loads(data))
+        return documents
+
+    def save(self, image_id, document):
+        self.save_many([(image_id, document)])
+
+    @stage("annotations.save_many")
+    def save_many(self, items):
+        """Replace the documents for (image_id, document) pairs in one transaction."""
+        with self.lock.write(), self.db.connection() as conn:
+            for image_id, document in items:
+                self._write(conn, image_id, document)
+        bump_project(self.project_path)
+        return len(items)
+
+    def seed(self, conn, image_id, document):
+        """Create a document if the image has none yet, inside the caller's transaction."""
+        exists = conn.execute(
+            "SELECT 1 FROM annotation_documents WHERE image_id = ?", (image_id,)
+        ).fetchone()
+        if not exists:
+            self._write(conn, image_id, document)
+
+    def delete(self, conn, image_id):
+        self._clear_annotations(conn, image_id)
+        conn.execute("DELETE FROM annotation_documents WHERE image_id = ?", (image_id,))
+
+    @stage("annotations.query")
+    def query_boxes(self, label=None, region=None, limit=1000):
+        """Return annotations of a class and/or overlapping region [x1, y1, x2, y2].
+
+        Region queries go through the R-tree; label-only queries use the label index.
+        """
+        where = []
+        params = []
+        source = "annotations a"
+        if region is not None:
+            x1, y1, x2, y2 = (float(v) for v in region)
+            source = "annotation_boxes b JOIN annotations a ON a.rowid = b.id"
+            where.append("b.min_x <= ? AND b.max_x >= ? AND b.min_y <= ? AND b.max_y >= ?")
+            params.extend([max(x1, x2), min(x1, x2), max(y1, y2), min(y1, y2)])
+        if label is not None:
+            where.append("a.label = ?")
+            params.append(label)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        with self.lock.read(), self.db.connection() as conn:
+            rows = conn.execute(
+                f"SELECT a.image_id, a.data FROM {source} {where_sql} LIMIT ?",
+                params + [int(limit)]
+            ).fetchall()
+        return [{"image_id": image_id, "annotation": json.loads(data)} for image_id, data in rows]
+
+    def unlabeled_images(self, limit=1000):
+        """Return ids of processed images without any annotation (indexed on annotation_count)."""
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT id FROM images
+                WHERE annotation_count = 0 AND processed_filename IS NOT NULL
+                LIMIT ?
+                """,
+                (int(limit),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _write(self, conn, image_id, document):
+        document = dict(document)
+        annotations = document.pop("annotations", None) or []
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO annotation_documents (image_id, data, updated)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            """,
+            (image_id, json.dumps(document))
+        )
+        self._clear_annotations(conn, image_id)
+        for position, annotation in enumerate(annotations):
+            cursor = conn.execute(
+                """
+                INSERT INTO annotations (id, image_id, data, label, type, position)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (f"{image_id}:{position}", image_id, json.dumps(annotation),
+                 annotation.get("class"), annotation.get("type"), position)
+            )
+            bounds = _bounds(annotation)
+            if bounds:
+                conn.execute(
+                    "INSERT INTO annotation_boxes (id, min_x, max_x, min_y, max_y) VALUES (?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, *bounds)
+                )
+        # Keep the count the listing's annotated filter relies on in sync
+        conn.execute(
+            "UPDATE images SET annotation_count = ? WHERE id = ?", (len(annotations), image_id)
+        )
+
+    def _clear_annotations(self, conn, image_id):
+        conn.execute(
+            "DELETE FROM annotation_boxes WHERE id IN (SELECT rowid FROM annotations WHERE image_id = ?)",
+            (image_id,)
+        )
+        conn.execute("DELETE FROM annotations WHERE image_id = ?", (image_id,))
+
+    def _import_legacy_json(self):
+        """Load per-image processed/*.json annotation files into the store once per project."""
+        key = str(self.project_path.resolve())
+        with _checked_lock:
+            if key in _checked_projects:
+                return
+            with self.db.connection() as conn:
+                done = conn.execute(
+                    "SELECT value FROM project_meta WHERE key = ?", (_LEGACY_IMPORTED_KEY,)
+                ).fetchone()
+                if not done:
+                    if self.processed_dir.exists():
+                        for path in sorted(self.processed_dir.glob("*.json")):
+                            if path.name in RESERVED_JSON_FILES:
+                                continue
+                            try:
+                                with open(path, "r") as f:
+                                    document = json.load(f)
+                            except (OSError, json.JSONDecodeError):
+                                continue
+                            self.seed(conn, path.stem, document)
+                    conn.execute(
+                        "INSERT INTO project_meta (key, value) VALUES (?, ?)",
+                        (_LEGACY_IMPORTED_KEY, "1")
+                    )
+            _checked_projects.add(key)
@@ -0,0 +1,580 @@
+import copy
+import datetime
+import json
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from dataset.annotation_store import AnnotationStore
+from dataset.database import get_project_db
+from dataset.locks import project_lock
+
+DEFAULT_BATCH_SIZE = 8
+# Batches are also cut at this many pixels, so large images go a few at a time
+MAX_BATCH_PIXELS = 16 * 1024 * 1024
+# Rotate resamples this many output rows at a time, bounding its index arrays
+ROTATE_ROWS = 256
+AUGMENTED_QUALITY = 95
+# Batches decoded ahead of the transform step, and encoded batches in flight
+PREFETCH_BATCHES = 2
+MAX_PENDING_WRITES = 2
+ANNOTATIONS_FILENAME = "annotations.jsonl"
+
+
+def _points(coordinates):
+    """Return (K, 2) points for flat [x1, y1, ...] or nested [[x, y], ...] coordinates, or None."""
+    if not isinstance(coordinates, list) or not coordinates:
+        return None
+    nested = isinstance(coordinates[0], (list, tuple))
+    try:
+        flat = [float(v) for point in coordinates for v in point] if nested else \
+            [float(v) for v in coordinates]
+    except (TypeError, ValueError):
+        return None
+    if len(flat) < 2 or len(flat) % 2:
+        return None
+    return np.asarray(flat, dtype=np.float64).reshape(-1, 2)
+
+
+def _is_bbox(annotation, coordinates):
+    kind = annotation.get("type")
+    return kind == "bbox" or (kind is None and len(coordinates) == 4
+                              and not isinstance(coordinates[0], (list, tuple)))
+
+
+def map_annotations(annotations, fn, width, height):
+    """Apply a point mapping to annotation coordinates, clipping to the new image size.
+
+    Boxes are mapped by their four corners and replaced with the axis-aligned
+    bounds, so rotations keep the object covered. Annotations that end up with
+    no area inside the image are dropped.
+    """
+    mapped = []
+    for annotation in annotations:
+        coordinates = annotation.get("coordinates")
+        points = _points(coordinates)
+        if points is None:
+            mapped.append(annotation)
+            continue
+        annotation = dict(annotation)
+        if _is_bbox(annotation, coordinates):
+            (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0)
+            corners = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]])
+            out = fn(corners)
+            x1, y1 = np.clip(out.min(axis=0), 0, [width, height])
+            x2, y2 = np.clip(out.max(axis=0), 0, [width, height])
+            if x2 - x1 <= 0 or y2 - y1 <= 0:
+                continue
+            annotation["coordinates"] = [round(float(v), 2) for v in (x1, y1, x2, y2)]
+        else:
+            out = np.clip(fn(points), 0, [width, height])
+            extent = out.max(axis=0) - out.min(axis=0)
+            if extent[0] <= 0 or extent[1] <= 0:
+                continue
+            values = [[round(float(x), 2), round(float(y), 2)] for x, y in out]
+            if not isinstance(coordinates[0], (list, tuple)):
+                values = [v for point in values for v in point]
+            annotation["coordinates"] = values
+        mapped.append(annotation)
+    return mapped
+
+
+class Transform:
+    """A batch transform. Subclasses draw per-image parameters from the RNG as arrays.
+
+    __call__ takes images as a float32 (N, H, W, C) array and a list of N
+    annotation lists, and returns the transformed pair plus one record per
+    image: a dict describing what was applied, or None if it was skipped.
+    """
+
+    name = None
+
+    def __init__(self, p=1.0):
+        self.p = float(p)
+
+    def _mask(self, rng, n):
+        return rng.random(n) < self.p
+
+    def __call__(self, images, annotations, rng):
+        raise NotImplementedError
+
+
+class HorizontalFlip(Transform):
+    name = "horizontal_flip"
+
+    def __call__(self, images, annotations, rng):
+        mask = self._mask(rng, len(images))
+        images[mask] = images[mask, :, ::-1]
+        width, height = images.shape[2], images.shape[1]
+        records = [None] * len(images)
+        for i in np.flatnonzero(mask):
+            annotations[i] = map_annotations(
+                annotations[i], lambda p: np.column_stack([width - p[:, 0], p[:, 1]]), width, height
+            )
+            records[i] = {"type": self.name}
+        return images, annotations, records
+
+
+class VerticalFlip(Transform):
+    name = "vertical_flip"
+
+    def __call__(self, images, annotations, rng):
+        mask = self._mask(rng, len(images))
+        images[mask] = images[mask, ::-1]
+        width, height = images.shape[2], images.shape[1]
+        records = [None] * len(images)
+        for i in np.flatnonzero(mask):
+            annotations[i] = map_annotations(
+                annotations[i], lambda p: np.column_stack([p[:, 0], height - p[:, 1]]), width, height
+            )
+            records[i] = {"type": self.name}
+        return images, annotations, records
+
+
+class Rotate(Transform):
+    """Rotate by a random angle in [-limit, limit] degrees about the centre, keeping the size.
+
+    Selected images are resampled (nearest neighbour) a band of ROTATE_ROWS
+    output rows at a time, so the index arrays stay small whatever the image
+    size; uncovered corners are filled with fill.
+    """
+
+    name = "rotate"
+
+    def __init__(self, limit=15.0, fill=0, p=1.0):
+        super().__init__(p)
+        self.limit = float(limit)
+        self.fill = fill
+
+    def __call__(self, images, annotations, rng):
+        n, height, width = images.shape[:3]
+        angles = np.where(self._mask(rng, n), rng.uniform(-self.limit, self.limit, n), 0.0)
+        records = [None] * n
+        selected = np.flatnonzero(angles)
+        if not selected.size:
+            return images, annotations, records
+        dx = np.arange(width, dtype=np.float32)[None, :] - (width - 1) / 2
+        for i in selected:
+            theta = np.deg2rad(angles[i:i + 1])[:, None]
+            cos, sin = np.cos(theta), np.sin(theta)
+            source = images[i].copy()
+            for top in range(0, height, ROTATE_ROWS):
+                bottom = min(top + ROTATE_ROWS, height)
+                dy = np.arange(top, bottom, dtype=np.float32)[:, None] - (height - 1) / 2
+                # Inverse mapping: for each output pixel, the source pixel it samples
+                src_x = np.rint(cos * dx + sin * dy + (width - 1) / 2).astype(np.intp)
+                src_y = np.rint(-sin * dx + cos * dy + (height - 1) / 2).astype(np.intp)
+                outside = (src_x < 0) | (src_x >= width) | (src_y < 0) | (src_y >= height)
+                np.clip(src_x, 0, width - 1, out=src_x)
+                np.clip(src_y, 0, height - 1, out=src_y)
+                band = source[src_y, src_x]
+                band[outside] = self.fill
+                images[i, top:bottom] = band
+        cx, cy = width / 2, height / 2
+        for i in selected:
+            c, s = np.cos(np.deg2rad(angles[i])), np.sin(np.deg2rad(angles[i]))
+
+            def rotate_points(p, c=c, s=s):
+                x, y = p[:, 0] - cx, p[:, 1] - cy
+                return np.column_stack([c * x - s * y + cx, s * x + c * y + cy])
+
+            annotations[i] = map_annotations(annotations[i], rotate_points, width, height)
+            records[i] = {"type": self.name, "angle": round(float(angles[i]), 3)}
+        return images, annotations, records
+
+
+class RandomCrop(Transform):
+    """Crop every image to width x height (clamped to the image) at a random offset.
+
+    Always applied, since it changes the batch shape; p is ignored.
+    """
+
+    name = "random_crop"
+
+    def __init__(self, width, height, p=1.0):
+        super().__init__(p)
+        self.width = int(width)
+        self.height = int(height)
+
+    def __call__(self, images, annotations, rng):
+        n, height, width = images.shape[:3]
+        crop_w, crop_h = min(self.width, width), min(self.height, height)
+        off_x = rng.integers(0, width - crop_w + 1, n)
+        off_y = rng.integers(0, height - crop_h + 1, n)
+        rows = off_y[:, None] + np.arange(crop_h)
+        cols = off_x[:, None] + np.arange(crop_w)
+        images = images[np.arange(n)[:, None, None], rows[:, :, None], cols[:, None, :]]
+        records = []
+        for i in range(n):
+            ox, oy = off_x[i], off_y[i]
+            annotations[i] = map_annotations(
+                annotations[i], lambda p, ox=ox, oy=oy: p - [ox, oy], crop_w, crop_h
+            )
+            records.append({"type": self.name, "x": int(ox), "y": int(oy),
+                            "width": crop_w, "height": crop_h})
+        return images, annotations, records
+
+
+class BrightnessContrast(Transform):
+    """Scale contrast by 1 +/- contrast around each image's mean and shift by +/- brightness * 255."""
+
+    name = "brightness_contrast"
+
+    def __init__(self, brightness=0.2, contrast=0.2, p=1.0):
+        super().__init__(p)
+        self.brightness = float(brightness)
+        self.contrast = float(contrast)
+
+    def __call__(self, images, annotations, rng):
+        n = len(images)
+        mask = self._mask(rng, n)
+        alpha = np.where(mask, 1 + rng.uniform(-self.contrast, self.contrast, n), 1.0)
+        beta = np.where(mask, rng.uniform(-self.brightness, self.brightness, n) * 255, 0.0)
+        mean = images.mean(axis=(1, 2, 3), keepdims=True)
+        images -= mean
+        images *= alpha.astype(np.float32)[:, None, None, None]
+        images += mean + beta.astype(np.float32)[:, None, None, None]
+        records = [
+            {"type": self.name, "alpha": round(float(alpha[i]), 4), "beta": round(float(beta[i]), 2)}
+            if mask[i] else None
+            for i in range(n)
+        ]
+        return images, annotations, records
+
+
+class GaussianNoise(Transform):
+    """Add zero-mean Gaussian noise with standard deviation std (in 0-255 units)."""
+
+    name = "gaussian_noise"
+
+    def __init__(self, std=10.0, p=1.0):
+        super().__init__(p)
+        self.std = float(std)
+
+    def __call__(self, images, annotations, rng):
+        mask = self._mask(rng, len(images))
+        selected = np.flatnonzero(mask)
+        if selected.size:
+            noise = rng.standard_normal((selected.size,) + images.shape[1:], dtype=np.float32)
+            images[selected] += noise * np.float32(self.std)
+        records = [{"type": self.name, "std": self.std} if m else None for m in mask]
+        return images, annotations, records
+
+
+TRANSFORMS = {
+    cls.name: cls
+    for cls in (HorizontalFlip, VerticalFlip, Rotate, RandomCrop, BrightnessContrast, GaussianNoise)
+}
+
+
+class AugmentationPipeline:
+    """An ordered list of transforms applied to whole batches."""
+
+    def __init__(self, transforms):
+        self.transforms = list(transforms)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a pipeline from [{"type": "rotate", "limit": 15, "p": 0.5}, ...]."""
+        transforms = []
+        for step in config:
+            step = dict(step)
+            kind = step.pop("type", None)
+            if kind not in TRANSFORMS:
+                raise ValueError(f"Unknown augmentation '{kind}'")
+            try:
+                transforms.append(TRANSFORMS[kind](**step))
+            except TypeError as e:
+                raise ValueError(f"Invalid parameters for '{kind}': {e}")
+        return cls(transforms)
+
+    def apply(self, images, annotations, rng):
+        """Transform a uint8 (N, H, W, C) batch and its annotations.
+
+        Returns (uint8 images, annotations, per-image lists of applied steps).
+        """
+        batch = images.astype(np.float32)
+        annotations = [copy.deepcopy(a) for a in annotations]
+        applied = [[] for _ in range(len(batch))]
+        for transform in self.transforms:
+            batch, annotations, records = transform(batch, annotations, rng)
+            for steps, record in zip(applied, records):
+                if record is not None:
+                    steps.append(record)
+        np.clip(batch, 0, 255, out=batch)
+        return np.rint(batch).astype(np.uint8), annotations, applied
+
+
+def _prefetch(iterable, depth):
+    """Run a generator in a background thread, holding at most depth items ahead."""
+    items = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        items.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            items.put(done)
+        except BaseException as e:
+            items.put(e)
+
+    thread = threading.Thread(target=produce, name="augment-loader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+class DatasetAugmenter:
+    """Writes augmented copies of the refined dataset into versions/<name>/.
+
+    Images are decoded in batches of equal size (so each batch is one NumPy
+    array, capped at MAX_BATCH_PIXELS) by a prefetching loader, transformed
+    batch-wise, and encoded by a small writer pool; the loader and writers are
+    both bounded, so memory stays flat regardless of dataset and image size.
+    Each batch draws from its own RNG
+    seeded with (seed, batch index, copy), which makes a run reproducible and
+    lets an interrupted run resume by redoing only unfinished batches.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = Path(project_path)
+        self.processed_dir = self.project_path / "processed"
+        self.versions_dir = self.project_path / "versions"
+        self.db = get_project_db(self.project_path)
+        self.lock = project_lock(self.project_path)
+
+    def run(self, pipeline, name, seed=0, copies=1, batch_size=DEFAULT_BATCH_SIZE,
+            image_ids=None, progress=None, should_stop=None):
+        """Augment processed images into a new version.
+
+        Args:
+            pipeline (list): Transform config for AugmentationPipeline.from_config.
+            name (str): Version name; also the directory under versions/.
+            seed (int): RNG seed; the same seed and inputs give the same images.
+            copies (int): Augmented variants written per source image.
+            batch_size (int): Images transformed together.
+            image_ids (list, optional): Restrict to these images.
+            progress (callable, optional): Called as progress(done, total) per batch.
+            should_stop (callable, optional): Polled between batches.
+
+        Re-running an incomplete version with the same name continues it.
+        Returns the version summary dict.
+        """
+        steps = AugmentationPipeline.from_config(pipeline)
+        if not name or Path(name).name != name or name.startswith("."):
+            raise ValueError(f"Invalid version name '{name}'")
+        copies = max(1, int(copies))
+        batch_size = max(1, int(batch_size))
+        params = {"pipeline": pipeline, "seed": seed, "copies": copies,
+                  "batch_size": batch_size, "image_ids": image_ids}
+        version_id, out_dir = self._start_version(name, params)
+        annotations_path = out_dir / ANNOTATIONS_FILENAME
+        finished = self._finished_slices(annotations_path)
+
+        work = self._work_items(image_ids)
+        batches = list(self._plan_batches(work, batch_size))
+        total = len(batches) * copies
+        store = AnnotationStore(self.project_path)
+        written = len(finished)
+        stopped = False
+        pending = deque()
+        with open(annotations_path, "a") as jsonl, \
+                ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                   thread_name_prefix="augment-writer") as writers:
+
+            def drain(limit):
+                nonlocal written
+                while len(pending) > limit:
+                    for document in pending.popleft().result():
+                        jsonl.write(json.dumps(document) + "\n")
+                        written += 1
+                jsonl.flush()
+
+            for index, part, (rows, pixels) in _prefetch(self._load(batches, copies, finished),
+                                                         PREFETCH_BATCHES):
+                if should_stop and should_stop():
+                    stopped = True
+                    break
+                stored = store.get_many([row["id"] for row in rows])
+                documents = [stored.get(row["id"], {}) for row in rows]
+                for copy_index in range(copies):
+                    wanted = [f"{row['id']}_{copy_index}" not in finished for row in rows]
+                    if any(wanted):
+                        # Parts after the first (split off by shape) get their own stream
+                        rng = np.random.default_rng(
+                            [int(seed), index, copy_index] + ([part] if part else [])
+                        )
+                        images, annotations, applied = steps.apply(
+                            pixels, [d.get("annotations", []) for d in documents], rng
+                        )
+                        pending.append(writers.submit(
+                            self._write_batch, out_dir, rows, images, annotations, applied,
+                            copy_index, wanted
+                        ))
+                        drain(MAX_PENDING_WRITES)
+                if progress:
+                    # Batches skipped by the loader were finished by an earlier run
+                    progress((index + 1) * copies, total)
+            drain(0)
+
+        status = "incomplete" if stopped else "complete"
+        with self.lock.write(), self.db.connection() as conn:
+            conn.execute(
+                "UPDATE versions SET status = ?, image_count = ? WHERE id = ?",
+                (status, written, version_id)
+            )
+            if not stopped:
+                conn.execute(
+                    "INSERT INTO dataset_history (action, filename, original_filename, details) VALUES (?, ?, ?, ?)",
+                    ("augment", name, None, json.dumps({"version_id": version_id, "images": written}))
+                )
+        return {"id": version_id, "name": name, "path": str(out_dir), "status": status,
+                "image_count": written}
+
+    def _start_version(self, name, params):
+        out_dir = self.versions_dir / name
+        with self.lock.write(), self.db.connection() as conn:
+            row = conn.execute(
+                "SELECT id, status, params FROM versions WHERE name = ?", (name,)
+            ).fetchone()
+            if row:
+                if row[1] != "incomplete" or json.loads(row[2] or "{}") != params:
+                    raise FileExistsError(f"Version '{name}' already exists.")
+                version_id = row[0]
+            else:
+                if out_dir.exists():
+                    raise FileExistsError(f"Version '{name}' already exists.")
+                version_id = conn.execute(
+                    """
+                    INSERT INTO versions (name, kind, path, params, status, image_count)
+                    VALUES (?, 'augmentation', ?, ?, 'incomplete', 0)
+                    """,
+                    (name, str(Path("versions") / name), json.dumps(params))
+                ).lastrowid
+        (out_dir / "images").mkdir(parents=True, exist_ok=True)
+        return version_id, out_dir
+
+    def _finished_slices(self, annotations_path):
+        """Slice ids already written by an earlier, interrupted run of this version."""
+        finished = set()
+        if annotations_path.exists():
+            valid_bytes = 0
+            with open(annotations_path, "rb") as f:
+                for line in f:
+                    try:
+                        finished.add(json.loads(line)["slice_id"])
+                    except (ValueError, KeyError):
+                        break  # Torn last line from a crash
+                    valid_bytes += len(line)
+            with open(annotations_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        return finished
+
+    def _work_items(self, image_ids):
+        where = "WHERE processed_filename IS NOT NULL"
+        params = []
+        if image_ids:
+            where += f" AND id IN ({', '.join('?' for _ in image_ids)})"
+            params = list(image_ids)
+        with self.lock.read(), self.db.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, filename, processed_filename, width, height FROM images {where}
+                ORDER BY height, width, id
+                """,
+                params
+            ).fetchall()
+        return [
+            {"id": r[0], "raw_filename": r[1], "processed_filename": r[2], "size": (r[3], r[4])}
+            for r in rows
+        ]
+
+    def _plan_batches(self, work, batch_size):
+        """Group rows of equal cached size into batches, in a deterministic order.
+
+        A batch holds at most batch_size images and, past its first image, at
+        most MAX_BATCH_PIXELS pixels.
+        """
+        batch = []
+        for row in work:
+            width, height = row["size"]
+            pixels = (width or 0) * (height or 0)
+            if batch and (len(batch) == batch_size or batch[0]["size"] != row["size"]
+                          or (len(batch) + 1) * pixels > MAX_BATCH_PIXELS):
+                yield batch
+                batch = []
+            batch.append(row)
+        if batch:
+            yield batch
+
+    def _load(self, batches, copies, finished):
+        """Yield (batch index, part, (rows, uint8 array)) for batches with unwritten slices.
+
+        A batch is planned from cached sizes; if the decoded images turn out
+        to differ in shape (stale cache), it is split into one part per shape
+        so every image is still written.
+        """
+        for index, rows in enumerate(batches):
+            if all(f"{row['id']}_{c}" in finished for row in rows for c in range(copies)):
+                continue
+            arrays = []
+            for row in rows:
+                with Image.open(self.processed_dir / row["processed_filename"]) as img:
+                    arrays.append(np.asarray(img.convert("RGB")))
+            parts = {}
+            for row, array in zip(rows, arrays):
+                part_rows, part_arrays = parts.setdefault(array.shape, ([], []))
+                part_rows.append(row)
+                part_arrays.append(array)
+            for part, (part_rows, part_arrays) in enumerate(parts.values()):
+                yield index, part, (part_rows, np.stack(part_arrays))
+
+    def _write_batch(self, out_dir, rows, images, annotations, applied, copy_index, wanted):
+        """Encode one transformed batch; returns the slice documents for annotations.jsonl."""
+        now = datetime.datetime.now().isoformat()
+        documents = []
+        for row, pixels, slice_annotations, steps, keep in zip(
+                rows, images, annotations, applied, wanted):
+            if not keep:
+                continue
+            slice_id = f"{row['id']}_{copy_index}"
+            filename = f"{slice_id}.jpg"
+            path = out_dir / "images" / filename
+            tmp_path = path.with_name(f".{filename}.tmp")
+            Image.fromarray(pixels).save(tmp_path, "JPEG", quality=AUGMENTED_QUALITY)
+            os.replace(tmp_path, path)
+            documents.append({
+                "slice_id": slice_id,
+                "filename": filename,
+                "dimensions": [int(pixels.shape[1]), int(pixels.shape[0])],
+                "parent_refined_id": row["id"],
+                "parent_refined_filename": row["processed_filename"],
+                "parent_raw_id": row["id"],
+                "parent_raw_filename": row["raw_filename"],
+                "augmentation_pipeline": steps,
+                "annotations": slice_annotations,
+                "history": [{"action": "created", "by": "augmentation", "at": now}],
+            })
+        return documents
@@ -0,0 +1,115 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from dataset.metrics import stage
+from dataset.schema import migrate
+
+DB_FILENAME = "database.sqlite"
+# Idle connections kept per project; extra connections opened under load are closed on release
+POOL_SIZE = 8
+BUSY_TIMEOUT_SECONDS = 10
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+    "PRAGMA mmap_size=268435456",
+)
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_project_db(project_path):
+    """Return the shared ProjectDatabase for a project, opening and migrating it on first use."""
+    key = str(Path(project_path).resolve())
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = _databases[key] = ProjectDatabase(Path(project_path) / DB_FILENAME)
+        return db
+
+
+def close_project_db(project_path):
+    """Close a project's pooled connections (before it is renamed or deleted)."""
+    with _databases_lock:
+        db = _databases.pop(str(Path(project_path).resolve()), None)
+    if db is not None:
+        db.close()
+
+
+def close_all():
+    """Close every pooled connection, e.g. on server shutdown."""
+    with _databases_lock:
+        databases = list(_databases.values())
+        _databases.clear()
+    for db in databases:
+        db.close()
+
+
+class ProjectDatabase:
+    """Pool of WAL-mode SQLite connections to one project database.
+
+    The schema is migrated once, when the pool is created, instead of on
+    every request. WAL lets readers proceed while an import is writing.
+    """
+
+    def __init__(self, db_path, pool_size=POOL_SIZE):
+        self.db_path = Path(db_path)
+        if not self.db_path.parent.exists():
+            raise FileNotFoundError(f"Project directory {self.db_path.parent} does not exist.")
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._closed = False
+        conn = self._connect()
+        try:
+            migrate(conn)
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False
+        )
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+            with stage("db.commit"):
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,390 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dataset.annotation_store import AnnotationStore
+from dataset.database import get_project_db
+from dataset.fileio import link_or_copy, write_json_atomic
+from dataset.image_info import probe_image
+from dataset.locks import project_lock
+from dataset.versions import SNAPSHOT_KIND, VersionStore
+
+EXPORT_FORMATS = ("coco", "yolo", "tar")
+DEFAULT_SHARD_SIZE = 1000
+# Rows read from the database per query while streaming a project
+READ_BATCH_SIZE = 500
+
+
+def _points(coordinates):
+    """Flatten [x1, y1, ...] or [[x, y], ...] into a list of (x, y) floats, or None."""
+    if not isinstance(coordinates, list) or not coordinates:
+        return None
+    try:
+        if isinstance(coordinates[0], (list, tuple)):
+            flat = [float(v) for point in coordinates for v in point]
+        else:
+            flat = [float(v) for v in coordinates]
+    except (TypeError, ValueError):
+        return None
+    if len(flat) < 4 or len(flat) % 2:
+        return None
+    return list(zip(flat[0::2], flat[1::2]))
+
+
+def _geometry(annotation):
+    """Return (bbox [x, y, w, h], polygon points or None) for an annotation, or None."""
+    points = _points(annotation.get("coordinates"))
+    if points is None:
+        return None
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    bbox = [min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)]
+    if bbox[2] <= 0 or bbox[3] <= 0:
+        return None
+    is_box = annotation.get("type") == "bbox" or (annotation.get("type") is None and len(points) == 2)
+    return bbox, None if is_box else points
+
+
+def _polygon_area(points):
+    return abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]))) / 2
+
+
+class DatasetExporter:
+    """Streams a project, snapshot or augmentation version into a training format.
+
+    Items are read lazily (a few hundred database rows at a time) and
+    grouped into shards of shard_size; shards are written in parallel by a
+    thread pool with a bounded number in flight, so memory depends on the
+    shard size, not the dataset size.
+
+    Formats:
+        coco: annotations.json and images/. Each shard writes JSON-lines
+              fragments that are streamed into the final file in order.
+        yolo: images/, labels/<key>.txt (class cx cy w h, normalized; polygons
+              are exported as their bounding box) and classes.txt.
+        tar:  shard-NNNNNN.tar files holding <key>.jpg and <key>.json pairs
+              (WebDataset layout) for sequential reads.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = Path(project_path)
+        self.processed_dir = self.project_path / "processed"
+        self.db = get_project_db(self.project_path)
+        self.lock = project_lock(self.project_path)
+
+    def export(self, fmt, output_dir=None, name=None, version=None, classes=None,
+               shard_size=DEFAULT_SHARD_SIZE, workers=None, progress=None, should_stop=None):
+        """Export the current refined dataset, or a version, to output_dir.
+
+        Args:
+            fmt (str): 'coco', 'yolo' or 'tar'.
+            output_dir (str, optional): Target directory; defaults to
+                exports/<name> inside the project.
+            name (str, optional): Export name used for the default output_dir.
+            version (str, optional): Snapshot or augmentation version to export.
+            classes (list, optional): Class names in index order. Defaults to
+                the sorted labels found in the data (one extra streaming pass).
+            shard_size (int): Items per shard (and per tar file).
+            workers (int, optional): Shards written concurrently.
+            progress (callable, optional): Called as progress(done, total) per shard.
+            should_stop (callable, optional): Polled between shards.
+
+        Returns:
+            dict summary with output_dir, images, annotations, shards and classes.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{fmt}'")
+        if output_dir is None:
+            if not name or Path(name).name != name or name.startswith("."):
+                raise ValueError(f"Invalid export name '{name}'")
+            output_dir = self.project_path / "exports" / name
+        output_dir = Path(output_dir)
+        if output_dir.exists() and any(output_dir.iterdir()):
+            raise FileExistsError(f"Export directory '{output_dir}' is not empty.")
+        shard_size = max(1, int(shard_size))
+        workers = max(1, int(workers or min(4, os.cpu_count() or 1)))
+
+        source = self._source(version)
+        if classes is None:
+            classes = sorted({
+                str(annotation["class"])
+                for item in source()
+                for annotation in item["annotations"]
+                if annotation.get("class") is not None
+            })
+        class_ids = {name: index for index, name in enumerate(classes)}
+        total = self._count(version)
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if fmt in ("coco", "yolo"):
+            (output_dir / "images").mkdir(exist_ok=True)
+        if fmt == "yolo":
+            (output_dir / "labels").mkdir(exist_ok=True)
+        fragments_dir = output_dir / ".fragments"
+        if fmt == "coco":
+            fragments_dir.mkdir(exist_ok=True)
+
+        write_shard = {"coco": self._write_coco_shard, "yolo": self._write_yolo_shard,
+                       "tar": self._write_tar_shard}[fmt]
+        summary = {"images": 0, "annotations": 0, "skipped_annotations": 0, "shards": 0}
+        done = 0
+        stopped = False
+        pending = deque()
+
+        def collect(limit):
+            nonlocal done
+            while len(pending) > limit:
+                count, annotations, skipped = pending.popleft().result()
+                summary["images"] += count
+                summary["annotations"] += annotations
+                summary["skipped_annotations"] += skipped
+                summary["shards"] += 1
+                done += count
+                if progress:
+                    progress(done, total)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") as pool:
+            for index, shard in enumerate(self._shards(source(), shard_size)):
+                if should_stop and should_stop():
+                    stopped = True
+                    break
+                pending.append(pool.submit(write_shard, output_dir, index, shard, class_ids))
+                # At most two shards per worker are held in memory at once
+                collect(workers * 2)
+            collect(0)
+
+        if fmt == "coco" and not stopped:
+            self._merge_coco(output_dir, fragments_dir, summary["shards"], classes)
+        if fmt == "yolo":
+            with open(output_dir / "classes.txt", "w") as f:
+                f.writelines(f"{name}\n" for name in classes)
+        summary.update({
+            "format": fmt,
+            "version": version,
+            "output_dir": str(output_dir),
+            "classes": classes,
+            "status": "incomplete" if stopped else "complete",
+        })
+        write_json_atomic(output_dir / "export.json", summary)
+        return summary
+
+    def _source(self, version):
+        """Return a callable that starts a fresh item stream for the project or a version.
+
+        Items are dicts with key, path, width, height and annotations.
+        """
+        if version is None:
+            return self._project_items
+        store = VersionStore(self.project_path)
+        info = store.get(version)
+        if info is None:
+            raise FileNotFoundError(f"Version '{version}' does not exist.")
+        if info["kind"] == SNAPSHOT_KIND:
+            def snapshot_items():
+                for image_id, path, document, meta in store.iter_snapshot(version):
+                    document = document or {}
+                    meta = meta or {}
+                    yield {
+                        "key": image_id,
+                        "path": path,
+                        "width": document.get("width") or meta.get("width"),
+                        "height": document.get("height") or meta.get("height"),
+                        "annotations": document.get("annotations", []),
+                    }
+            return snapshot_items
+        version_dir = self.project_path / info["path"]
+
+        def augmented_items():
+            with open(version_dir / "annotations.jsonl", "r") as f:
+                for line in f:
+                    document = json.loads(line)
+                    width, height = document.get("dimensions") or (None, None)
+                    yield {
+                        "key": document["slice_id"],
+                        "path": version_dir / "images" / document["filename"],
+                        "width": width,
+                        "height": height,
+                        "annotations": document.get("annotations", []),
+                    }
+        return augmented_items
+
+    def _project_items(self):
+        annotations = AnnotationStore(self.project_path)
+        last_id = ""
+        while True:
+            with self.lock.read(), self.db.connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT id, processed_filename, width, height FROM images
+                    WHERE processed_filename IS NOT NULL AND id > ?
+                    ORDER BY id LIMIT ?
+                    """,
+                    (last_id, READ_BATCH_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            documents = annotations.get_many([row[0] for row in rows])
+            for image_id, filename, width, height in rows:
+                yield {
+                    "key": image_id,
+                    "path": self.processed_dir / filename,
+                    "width": width,
+                    "height": height,
+                    "annotations": documents.get(image_id, {}).get("annotations", []),
+                }
+            last_id = rows[-1][0]
+
+    def _count(self, version):
+        with self.lock.read(), self.db.connection() as conn:
+            if version is None:
+                return conn.execute(
+                    "SELECT COUNT(*) FROM images WHERE processed_filename IS NOT NULL"
+                ).fetchone()[0]
+            return conn.execute(
+                "SELECT image_count FROM versions WHERE name = ?", (version,)
+            ).fetchone()[0]
+
+    def _shards(self, items, shard_size):
+        shard = []
+        for item in items:
+            shard.append(item)
+            if len(shard) == shard_size:
+                yield shard
+                shard = []
+        if shard:
+            yield shard
+
+    def _size(self, item):
+        if item["width"] and item["height"]:
+            return item["width"], item["height"]
+        info = probe_image(item["path"])
+        return info["width"], info["height"]
+
+    def _write_coco_shard(self, output_dir, index, shard, class_ids):
+        """Write images and two JSON-lines fragments (images, annotations) for one shard."""
+        fragments_dir = output_dir / ".fragments"
+        count = annotations = skipped = 0
+        with open(fragments_dir / f"{index:06d}.images.jsonl", "w") as images_out, \
+                open(fragments_dir / f"{index:06d}.annotations.jsonl", "w") as annotations_out:
+            for item in shard:
+                if not item["path"].exists():
+                    continue
+                filename = f"{item['key']}{item['path'].suffix}"
+                link_or_copy(item["path"], output_dir / "images" / filename)
+                width, height = self._size(item)
+                images_out.write(json.dumps({
+                    "key": item["key"], "file_name": f"images/{filename}",
+                    "width": width, "height": height,
+                }) + "\n")
+                count += 1
+                for annotation in item["annotations"]:
+                    geometry = _geometry(annotation)
+                    label = annotation.get("class")
+                    if geometry is None or label is None or str(label) not in class_ids:
+                        skipped += 1
+                        continue
+                    bbox, polygon = geometry
+                    entry = {
+                        "key": item["key"],
+                        "category_id": class_ids[str(label)],
+                        "bbox": [round(v, 2) for v in bbox],
+                        "area": round(_polygon_area(polygon) if polygon else bbox[2] * bbox[3], 2),
+                        "iscrowd": 0,
+                    }
+                    if polygon:
+                        entry["segmentation"] = [[round(v, 2) for point in polygon for v in point]]
+                    annotations_out.write(json.dumps(entry) + "\n")
+                    annotations += 1
+        return count, annotations, skipped
+
+    def _merge_coco(self, output_dir, fragments_dir, shard_count, classes):
+        """Stream shard fragments into annotations.json, assigning sequential ids."""
+        path = output_dir / "annotations.json"
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        image_ids = {}
+        with open(tmp_path, "w") as out:
+            out.write('{"info": {"description": "SeekerAug export"},\n"images": [\n')
+            first = True
+            for index in range(shard_count):
+                with open(fragments_dir / f"{index:06d}.images.jsonl", "r") as f:
+                    for line in f:
+                        image = json.loads(line)
+                        image_ids[image.pop("key")] = image["id"] = len(image_ids) + 1
+                        out.write(("" if first else ",\n") + json.dumps(image))
+                        first = False
+            out.write('\n],\n"annotations": [\n')
+            first = True
+            annotation_id = 0
+            for index in range(shard_count):
+                with open(fragments_dir / f"{index:06d}.annotations.jsonl", "r") as f:
+                    for line in f:
+                        annotation = json.loads(line)
+                        annotation_id += 1
+                        annotation = {"id": annotation_id,
+                                      "image_id": image_ids[annotation.pop("key")], **annotation}
+                        out.write(("" if first else ",\n") + json.dumps(annotation))
+                        first = False
+            out.write('\n],\n"categories": ')
+            json.dump([{"id": i, "name": name} for i, name in enumerate(classes)], out)
+            out.write("}\n")
+        os.replace(tmp_path, path)
+        shutil.rmtree(fragments_dir, ignore_errors=True)
+
+    def _write_yolo_shard(self, output_dir, index, shard, class_ids):
+        count = annotations = skipped = 0
+        for item in shard:
+            if not item["path"].exists():
+                continue
+            filename = f"{item['key']}{item['path'].suffix}"
+            link_or_copy(item["path"], output_dir / "images" / filename)
+            width, height = self._size(item)
+            lines = []
+            for annotation in item["annotations"]:
+                geometry = _geometry(annotation)
+                label = annotation.get("class")
+                if geometry is None or label is None or str(label) not in class_ids \
+                        or not width or not height:
+                    skipped += 1
+                    continue
+                x, y, w, h = geometry[0]
+                lines.append(
+                    f"{class_ids[str(label)]} {(x + w / 2) / width:.6f} {(y + h / 2) / height:.6f} "
+                    f"{w / width:.6f} {h / height:.6f}\n"
+                )
+            with open(output_dir / "labels" / f"{item['key']}.txt", "w") as f:
+                f.writelines(lines)
+            count += 1
+            annotations += len(lines)
+        return count, annotations, skipped
+
+    def _write_tar_shard(self, output_dir, index, shard, class_ids):
+        path = output_dir / f"shard-{index:06d}.tar"
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        count = annotations = skipped = 0
+        with tarfile.open(tmp_path, "w") as tar:
+            for item in shard:
+                if not item["path"].exists():
+                    continue
+                width, height = self._size(item)
+                labelled = []
+                for annotation in item["annotations"]:
+                    label = annotation.get("class")
+                    if label is not None and str(label) in class_ids:
+                        labelled.append({**annotation, "category_id": class_ids[str(label)]})
+                    else:
+                        skipped += 1
+                tar.add(item["path"], arcname=f"{item['key']}{item['path'].suffix}")
+                data = json.dumps({"key": item["key"], "width": width, "height": height,
+                                   "annotations": labelled}).encode("utf-8")
+                info = tarfile.TarInfo(f"{item['key']}.json")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                count += 1
+                annotations += len(labelled)
+        os.replace(tmp_path, path)
+        return count, annotations, skipped
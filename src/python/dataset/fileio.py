@@ -0,0 +1,60 @@
+import errno
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+# Errors from os.link meaning "this filesystem can't hardlink here"; fall back to copying
+_LINK_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+
+def write_json_atomic(path, data, indent=2, **kwargs):
+    """Write data as JSON to path via a temp file and os.replace.
+
+    Readers see either the old file or the complete new one, never a partial
+    write. The temp name is unique per process and thread so concurrent
+    writers don't clobber each other's temp file; the last replace wins.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=indent, **kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def link_or_copy(source, dest):
+    """Hardlink source to dest, copying instead where links aren't possible.
+
+    Returns True if a link was made.
+    """
+    try:
+        os.link(source, dest)
+        return True
+    except OSError as e:
+        if e.errno not in _LINK_UNSUPPORTED:
+            raise
+    shutil.copy2(source, dest)
+    return False
+
+
+def raw_image_path(raw_dir, image_id, filename, original_filename):
+    """Path of an image's file in raw/.
+
+    Renaming an image only changes its recorded filename, so a renamed image
+    is still stored under its import name, <id><original extension>.
+    """
+    path = Path(raw_dir) / filename
+    if not path.exists():
+        stored = Path(raw_dir) / f"{image_id}{os.path.splitext(original_filename or '')[1]}"
+        if stored.exists():
+            return stored
+    return path
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import threading
+import uuid
+
+# Counter key for the project catalog behind /projects/list
+CATALOG_KEY = "<catalog>"
+
+
+class Generations:
+    """Monotonically increasing change counters, one per project, kept in memory.
+
+    Every writer bumps its project's counter after its transaction commits,
+    so a reader that sees generation N also sees every change up to N. List
+    endpoints turn the counter into an ETag and can answer If-None-Match
+    from memory alone. Counters restart at 0 with the process, so tags also
+    carry a per-process epoch: a restart invalidates every tag handed out
+    before it. Changes made outside the app (editing files in the project
+    folder) are not counted.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def bump(self, key):
+        with self._lock:
+            self._counters[key] = generation = self._counters.get(key, 0) + 1
+        return generation
+
+    def current(self, key):
+        return self._counters.get(key, 0)
+
+    def etag(self, key, variant=None):
+        """ETag value for key's current generation; variant distinguishes request parameters."""
+        tag = f"{self.epoch}-{self.current(key)}"
+        if variant:
+            tag += "-" + hashlib.blake2b(variant.encode("utf-8"), digest_size=6).hexdigest()
+        return tag
+
+
+GENERATIONS = Generations()
+
+
+def project_key(project_path):
+    # abspath is pure string handling, so computing a tag never touches the disk
+    return os.path.abspath(project_path)
+
+
+def bump_project(project_path):
+    """Record that a project's images, metadata or annotations changed."""
+    return GENERATIONS.bump(project_key(project_path))
+
+
+def bump_catalog():
+    """Record that the set of projects or their catalog entries changed."""
+    return GENERATIONS.bump(CATALOG_KEY)
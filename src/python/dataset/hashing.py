@@ -0,0 +1,17 @@
+import hashlib
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def new_hash():
+    """Return a fresh hash object for content hashing."""
+    return hashlib.sha256()
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Return the hex content hash of a file, read in fixed-size chunks."""
+    digest = new_hash()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,260 @@
+import base64
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dataset.database import get_project_db
+from dataset.locks import project_lock
+from dataset.metrics import stage
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Per-file rows older than this many days are collapsed into one summary row
+# per import/batch (or per day for rows written before batches were recorded);
+# 0 disables compaction
+COMPACT_AFTER_DAYS = int(os.environ.get("SEEKERAUG_HISTORY_COMPACT_DAYS", "30"))
+# Rows older than this many days are deleted outright; 0 keeps them forever
+RETENTION_DAYS = int(os.environ.get("SEEKERAUG_HISTORY_RETENTION_DAYS", "0"))
+# Automatic compaction runs at most once per interval per project
+COMPACT_INTERVAL = timedelta(hours=24)
+COMPACTED_ACTIONS = ("add", "remove")
+# Filenames kept on a summary row as a sample of what the batch touched
+SUMMARY_SAMPLE_SIZE = 5
+
+_COMPACTED_AT_KEY = "history_compacted_at"
+_SELECT_COLUMNS = "id, timestamp, action, filename, original_filename, details, batch_id, item_count"
+# Summary rows keep the batch_id of their rows; rows without one group by day
+_GROUP_EXPR = "COALESCE(batch_id, substr(timestamp, 1, 10))"
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def new_batch_id():
+    """Return an id for the history rows written by one import or batch operation."""
+    return uuid.uuid4().hex
+
+
+def _db_timestamp(value):
+    """Convert an ISO 8601 string or datetime to the UTC format SQLite's CURRENT_TIMESTAMP uses."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid timestamp '{value}'")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime(_TIMESTAMP_FORMAT)
+
+
+def _days_ago(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime(_TIMESTAMP_FORMAT)
+
+
+def _encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps([last_id]).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    try:
+        (last_id,) = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(last_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class DatasetHistory:
+    """Reads and compacts a project's dataset_history log."""
+
+    def __init__(self, project_path):
+        self.project_path = Path(project_path)
+        self.db = get_project_db(self.project_path)
+        self.lock = project_lock(self.project_path)
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE, actions=None, since=None, until=None,
+             filename=None):
+        """Return one page of history entries, newest first.
+
+        Args:
+            cursor (str, optional): next_cursor from the previous page.
+            limit (int): Page size, capped at MAX_PAGE_SIZE.
+            actions (str or list, optional): Only entries with these actions.
+            since (str, optional): ISO 8601 time; only entries at or after it.
+            until (str, optional): ISO 8601 time; only entries before it.
+            filename (str, optional): Only entries whose filename or original
+                filename is exactly this.
+
+        Returns:
+            dict: {"history": [...], "next_cursor": str or None}
+        """
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        where = []
+        params = []
+        if actions:
+            actions = [actions] if isinstance(actions, str) else list(actions)
+            where.append(f"action IN ({', '.join('?' * len(actions))})")
+            params.extend(actions)
+        if since:
+            where.append("timestamp >= ?")
+            params.append(_db_timestamp(since))
+        if until:
+            where.append("timestamp < ?")
+            params.append(_db_timestamp(until))
+        if filename:
+            where.append("(filename = ? OR original_filename = ?)")
+            params.extend([filename, filename])
+        if cursor:
+            where.append("id < ?")
+            params.append(_decode_cursor(cursor))
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self.lock.read(), self.db.connection() as conn:
+            # Fetch one extra row to learn whether another page follows
+            with stage("history.query"):
+                rows = conn.execute(
+                    f"SELECT {_SELECT_COLUMNS} FROM dataset_history {where_sql} ORDER BY id DESC LIMIT ?",
+                    params + [limit + 1]
+                ).fetchall()
+        page = rows[:limit]
+        history = [
+            {
+                "id": row[0],
+                "timestamp": row[1],
+                "action": row[2],
+                "filename": row[3],
+                "original_filename": row[4],
+                "details": row[5],
+                "batch_id": row[6],
+                "item_count": row[7],
+            }
+            for row in page
+        ]
+        next_cursor = _encode_cursor(page[-1][0]) if len(rows) > limit else None
+        return {"history": history, "next_cursor": next_cursor}
+
+    def compaction_due(self):
+        """True when the retention policy is enabled and hasn't run within COMPACT_INTERVAL."""
+        if not COMPACT_AFTER_DAYS and not RETENTION_DAYS:
+            return False
+        with self.db.connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM project_meta WHERE key = ?", (_COMPACTED_AT_KEY,)
+            ).fetchone()
+        if not row:
+            return True
+        last = datetime.fromisoformat(row[0])
+        return datetime.now(timezone.utc) - last >= COMPACT_INTERVAL
+
+    def compact(self, older_than_days=None, retention_days=None, should_stop=None):
+        """Apply the retention policy to the history log.
+
+        Per-file "add"/"remove" rows older than older_than_days are collapsed
+        into one summary row per batch (rows from before batches were recorded
+        group by day). A summary takes the id and timestamp of the newest row
+        it replaces, so it sorts where the batch ended, and its details hold
+        the count, the time span and a sample of the filenames. Summaries are
+        merged again if more rows of the same batch age out later. Rows older
+        than retention_days are then deleted. Each group is its own
+        transaction, so the project is never write-locked for long.
+
+        Args:
+            older_than_days (int, optional): Defaults to COMPACT_AFTER_DAYS; 0 skips compaction.
+            retention_days (int, optional): Defaults to RETENTION_DAYS; 0 keeps everything.
+            should_stop (callable, optional): Polled between groups; once it
+                                              returns True compaction stops early.
+
+        Returns:
+            dict: {"compacted_rows", "summaries", "deleted_rows"}
+        """
+        older_than_days = COMPACT_AFTER_DAYS if older_than_days is None else int(older_than_days)
+        retention_days = RETENTION_DAYS if retention_days is None else int(retention_days)
+        if older_than_days < 0 or retention_days < 0:
+            raise ValueError("older_than_days and retention_days must not be negative")
+        result = {"compacted_rows": 0, "summaries": 0, "deleted_rows": 0}
+
+        if older_than_days:
+            cutoff = _days_ago(older_than_days)
+            with self.db.connection() as conn:
+                bound = conn.execute(
+                    "SELECT MAX(id) FROM dataset_history WHERE timestamp < ?", (cutoff,)
+                ).fetchone()[0]
+                groups = conn.execute(
+                    f"""
+                    SELECT action, {_GROUP_EXPR}, MIN(id), MAX(id), COUNT(*)
+                    FROM dataset_history
+                    WHERE id <= ? AND timestamp < ?
+                          AND action IN ({', '.join('?' * len(COMPACTED_ACTIONS))})
+                    GROUP BY action, {_GROUP_EXPR}
+                    HAVING COUNT(*) > 1
+                    """,
+                    [bound or 0, cutoff, *COMPACTED_ACTIONS]
+                ).fetchall() if bound else []
+            for action, group, first_id, last_id, _ in groups:
+                if should_stop and should_stop():
+                    break
+                with stage("history.compact"), self.lock.write(), self.db.connection() as conn:
+                    replaced = self._compact_group(conn, action, group, first_id, last_id, cutoff)
+                if replaced:
+                    result["compacted_rows"] += replaced
+                    result["summaries"] += 1
+
+        if retention_days and not (should_stop and should_stop()):
+            with stage("history.compact"), self.lock.write(), self.db.connection() as conn:
+                result["deleted_rows"] = conn.execute(
+                    "DELETE FROM dataset_history WHERE timestamp < ?", (_days_ago(retention_days),)
+                ).rowcount
+
+        with self.db.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO project_meta (key, value) VALUES (?, ?)",
+                (_COMPACTED_AT_KEY, datetime.now(timezone.utc).isoformat())
+            )
+        return result
+
+    def _compact_group(self, conn, action, group, first_id, last_id, cutoff):
+        """Replace one group's rows with a single summary row; returns the rows replaced."""
+        match = f"id BETWEEN ? AND ? AND timestamp < ? AND action = ? AND {_GROUP_EXPR} = ?"
+        params = [first_id, last_id, cutoff, action, group]
+        rows = conn.execute(
+            f"""
+            SELECT id, timestamp, COALESCE(original_filename, filename), details,
+                   batch_id, item_count
+            FROM dataset_history WHERE {match} ORDER BY id
+            """,
+            params
+        ).fetchall()
+        if len(rows) < 2:
+            return 0  # Changed since the groups were listed
+        count = 0
+        first_id, first_timestamp = rows[0][0], rows[0][1]
+        samples = []
+        for _, timestamp, name, details, _, item_count in rows:
+            count += item_count
+            if item_count > 1:
+                # An earlier summary of the same group: carry its span and samples over
+                summary = json.loads(details or "{}")
+                first_id = min(first_id, summary.get("first_id", first_id))
+                first_timestamp = min(first_timestamp, summary.get("first_timestamp", timestamp))
+                samples.extend(summary.get("samples", []))
+            elif name:
+                samples.append(name)
+        last = rows[-1]
+        details = {
+            "compacted": True,
+            "count": count,
+            "first_id": first_id,
+            "first_timestamp": first_timestamp,
+            "last_timestamp": last[1],
+            "samples": samples[:SUMMARY_SAMPLE_SIZE],
+        }
+        conn.execute(f"DELETE FROM dataset_history WHERE {match}", params)
+        conn.execute(
+            """
+            INSERT INTO dataset_history (id, timestamp, action, filename, original_filename,
+                                         details, batch_id, item_count)
+            VALUES (?, ?, ?, NULL, NULL, ?, ?, ?)
+            """,
+            (last[0], last[1], action, json.dumps(details), last[4], count)
+        )
+        return len(rows)
@@ -0,0 +1,42 @@
+import os
+
+from dataset.metrics import stage
+
+# Columns on the images table that cache what the listing would otherwise
+# have to read from the file itself.
+INFO_COLUMNS = ("width", "height", "size_bytes", "format", "mode", "file_mtime_ns")
+
+
+def probe_image(source):
+    """Read width, height, format and mode from an image header (path or file object).
+
+    Only the header is parsed; pixel data is never decoded. Fields are None
+    when the source is not a readable image.
+    """
+    try:
+        from PIL import Image
+        with stage("image.header"), Image.open(source) as img:
+            return {
+                "width": img.width,
+                "height": img.height,
+                "format": img.format,
+                "mode": img.mode,
+            }
+    except Exception:
+        return {"width": None, "height": None, "format": None, "mode": None}
+
+
+def file_info(path, probe_source=None):
+    """Return the cached-column values for an image file.
+
+    probe_source lets callers that already hold the header bytes skip
+    reopening the file; the file is used if the probe comes back empty.
+    """
+    with stage("file.stat"):
+        stat = os.stat(path)
+    info = probe_image(probe_source) if probe_source is not None else None
+    if not info or info["width"] is None:
+        info = probe_image(path)
+    info["size_bytes"] = stat.st_size
+    info["file_mtime_ns"] = stat.st_mtime_ns
+    return info
@@ -1,60 +1,152 @@
 import os
 from pathlib import Path
-import sqlite3
 import json
 
+from dataset.database import get_project_db
+from dataset.fileio import raw_image_path
+from dataset.generations import bump_project
+from dataset.history import new_batch_id
+from dataset.locks import project_lock
+from dataset.raw_metadata import RawMetadataStore
+from dataset.thumbnails import get_thumbnail_cache
+
+# Largest batch accepted by rename_images/delete_images
+MAX_BATCH_SIZE = 10000
+# Ids bound per IN (...) query
+_ID_CHUNK = 500
+
 class ImageOps:
     """Handles image rename and delete operations within a project."""
 
     def __init__(self, project_path):
         self.project_path = Path(project_path)
-        self.db_path = self.project_path / "database.sqlite"
         self.raw_dir = self.project_path / "raw"
+        self.lock = project_lock(self.project_path)
 
     def rename_image(self, image_id, new_filename):
-        # Update central metadata file
-        raw_metadata_path = self.raw_dir / "raw_metadata.json"
-        if not raw_metadata_path.exists():
-            raise FileNotFoundError("raw_metadata.json not found.")
-        with open(raw_metadata_path, "r") as f:
-            raw_metadata = json.load(f)
-        if image_id not in raw_metadata:
-            raise FileNotFoundError(f"Image id {image_id} not found in metadata.")
-        # Only update the filename in metadata, do not rename the file on disk
-        raw_metadata[image_id]["filename"] = new_filename
-        with open(raw_metadata_path, "w") as f:
-            json.dump(raw_metadata, f, indent=2)
-        # Optionally update the database for consistency
-        with sqlite3.connect(self.db_path) as conn:
+        raw_metadata = RawMetadataStore(self.project_path)
+        with self.lock.write(), get_project_db(self.project_path).connection() as conn:
+            # Only update the filename in metadata, do not rename the file on disk
+            if not raw_metadata.set_field(conn, image_id, "filename", new_filename):
+                raise FileNotFoundError(f"Image id {image_id} not found in metadata.")
+            # Optionally update the database for consistency
             conn.execute("UPDATE images SET filename = ? WHERE id = ?", (new_filename, image_id))
-            conn.commit()
+        bump_project(self.project_path)
+        get_thumbnail_cache(self.project_path).invalidate(image_id)
         return new_filename
 
     def delete_image(self, image_id):
-        with sqlite3.connect(self.db_path) as conn:
-            # Add dataset_history table if not present
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS dataset_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    action TEXT,
-                    filename TEXT,
-                    original_filename TEXT,
-                    details TEXT
-                )
-            """)
+        raw_metadata = RawMetadataStore(self.project_path)
+        with self.lock.write(), get_project_db(self.project_path).connection() as conn:
             row = conn.execute("SELECT filename, original_filename FROM images WHERE id = ?", (image_id,)).fetchone()
             if not row:
                 raise FileNotFoundError(f"Image id {image_id} not found.")
             filename, original_filename = row
-            file_path = self.raw_dir / filename
+            file_path = raw_image_path(self.raw_dir, image_id, filename, original_filename)
             if file_path.exists():
                 os.remove(file_path)
             conn.execute("DELETE FROM images WHERE id = ?", (image_id,))
+            raw_metadata.delete(conn, image_id)
             # Log to history
             conn.execute(
                 "INSERT INTO dataset_history (action, filename, original_filename, details) VALUES (?, ?, ?, ?)",
                 ("remove", filename, original_filename, json.dumps({}))
             )
-            conn.commit()
+        bump_project(self.project_path)
+        get_thumbnail_cache(self.project_path).invalidate(image_id)
         return True
+
+    def rename_images(self, renames):
+        """Rename many images in one transaction.
+
+        renames is a list of (image_id, new_filename) pairs; as with
+        rename_image only the recorded filename changes. Returns one result
+        per pair, in order: {"image_id", "status": "success", "new_filename"}
+        or {"image_id", "status": "error", "error"}.
+        """
+        renames = list(renames)
+        _check_batch_size(renames)
+        raw_metadata = RawMetadataStore(self.project_path)
+        results = []
+        updates = []
+        with self.lock.write(), get_project_db(self.project_path).connection() as conn:
+            known = raw_metadata.existing_ids(conn, {image_id for image_id, _ in renames})
+            for image_id, new_filename in renames:
+                if not new_filename:
+                    results.append(_error(image_id, "Missing new_filename"))
+                elif image_id not in known:
+                    results.append(_error(image_id, f"Image id {image_id} not found in metadata."))
+                else:
+                    updates.append((image_id, new_filename))
+                    results.append({"image_id": image_id, "status": "success", "new_filename": new_filename})
+            raw_metadata.set_field_many(conn, "filename", updates)
+            conn.executemany(
+                "UPDATE images SET filename = ? WHERE id = ?",
+                ((new_filename, image_id) for image_id, new_filename in updates)
+            )
+        bump_project(self.project_path)
+        cache = get_thumbnail_cache(self.project_path)
+        for image_id in {image_id for image_id, _ in updates}:
+            cache.invalidate(image_id)
+        return results
+
+    def delete_images(self, image_ids):
+        """Delete many images in one transaction with one batch of history rows.
+
+        Raw files are removed after the transaction commits, still under the
+        project write lock. Returns one result per id, in order:
+        {"image_id", "status": "success"} or {"image_id", "status": "error", "error"}.
+        """
+        image_ids = list(image_ids)
+        _check_batch_size(image_ids)
+        raw_metadata = RawMetadataStore(self.project_path)
+        unique_ids = list(dict.fromkeys(image_ids))
+        with self.lock.write():
+            with get_project_db(self.project_path).connection() as conn:
+                rows = {}
+                for start in range(0, len(unique_ids), _ID_CHUNK):
+                    chunk = unique_ids[start:start + _ID_CHUNK]
+                    rows.update((row[0], row[1:]) for row in conn.execute(
+                        f"SELECT id, filename, original_filename FROM images "
+                        f"WHERE id IN ({', '.join('?' for _ in chunk)})",
+                        chunk
+                    ))
+                found = [image_id for image_id in unique_ids if image_id in rows]
+                conn.executemany("DELETE FROM images WHERE id = ?", ((image_id,) for image_id in found))
+                raw_metadata.delete_many(conn, found)
+                batch_id = new_batch_id()
+                conn.executemany(
+                    "INSERT INTO dataset_history (action, filename, original_filename, details, batch_id) VALUES (?, ?, ?, ?, ?)",
+                    (("remove", rows[image_id][0], rows[image_id][1], json.dumps({"batch": True}), batch_id)
+                     for image_id in found)
+                )
+            bump_project(self.project_path)
+            failed = {}
+            for image_id in found:
+                try:
+                    file_path = raw_image_path(self.raw_dir, image_id, *rows[image_id])
+                    if file_path.exists():
+                        os.remove(file_path)
+                except OSError as e:
+                    failed[image_id] = f"Removed from the project but the file was left behind: {e}"
+        cache = get_thumbnail_cache(self.project_path)
+        for image_id in found:
+            cache.invalidate(image_id)
+        results = []
+        for image_id in image_ids:
+            if image_id not in rows:
+                results.append(_error(image_id, f"Image id {image_id} not found."))
+            elif image_id in failed:
+                results.append(_error(image_id, failed[image_id]))
+            else:
+                results.append({"image_id": image_id, "status": "success"})
+        return results
+
+
+def _check_batch_size(items):
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batches are limited to {MAX_BATCH_SIZE} images")
+
+
+def _error(image_id, message):
+    return {"image_id": image_id, "status": "error", "error": message}
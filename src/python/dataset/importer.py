@@ -1,3 +1,4 @@
+import io
 import os
 import shutil
 import uuid
@@ -5,75 +6,260 @@ from pathlib import Path
 import sqlite3
 import json
 
+from dataset.hashing import hash_file, new_hash
+from dataset.image_info import file_info
+from dataset.raw_metadata import RawMetadataStore
+from dataset.database import get_project_db
+from dataset.generations import bump_project
+from dataset.history import new_batch_id
+from dataset.locks import project_lock
+from dataset.metrics import stage
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Bytes kept from the start of a stream to read the image header from
+HEADER_PROBE_SIZE = 256 * 1024
+# project_meta key set once images without a content hash have been hashed
+_HASH_BACKFILL_KEY = "content_hash_backfill_done"
+
+
 class DatasetImporter:
     """Handles importing images into a SeekerAug project."""
 
     def __init__(self, project_path):
         self.project_path = Path(project_path)
-        self.db_path = self.project_path / "database.sqlite"
         self.raw_dir = self.project_path / "raw"
         self.raw_dir.mkdir(parents=True, exist_ok=True)
+        self.raw_metadata = RawMetadataStore(self.project_path)
+        self.lock = project_lock(self.project_path)
+
+    def import_images(self, image_paths, progress=None, should_stop=None, move=False):
+        """Import a list of image file paths into the project.
 
-    def import_images(self, image_paths):
-        """Import a list of image file paths into the project."""
+        Files whose content is already in the project are not copied again, so
+        re-running an interrupted import only copies what is missing. Each file
+        is committed on its own under the project write lock, so listings see
+        the import progress and are never blocked for long.
+        Returns a dict with the "imported" entries and the skipped "duplicates".
+
+        Args:
+            progress (callable, optional): Called as progress(done, total) per file.
+            should_stop (callable, optional): Polled before each file; once it
+                                              returns True the import stops early.
+            move (bool): Move the files into raw/ instead of copying them, for
+                         uploads staged inside the project. Duplicates are left
+                         where they are.
+        """
         imported = []
-        raw_metadata_path = self.raw_dir / "raw_metadata.json"
-        # Load or initialize metadata
-        if raw_metadata_path.exists():
-            with open(raw_metadata_path, "r") as f:
-                raw_metadata = json.load(f)
-        else:
-            raw_metadata = {}
-        with sqlite3.connect(self.db_path) as conn:
-            # Add original_filename column if not present
-            try:
-                conn.execute("ALTER TABLE images ADD COLUMN original_filename TEXT")
-            except Exception:
-                pass  # Already exists
-            # Add dataset_history table if not present
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS dataset_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    action TEXT,
-                    filename TEXT,
-                    original_filename TEXT,
-                    details TEXT
-                )
-            """)
-            for src_path in image_paths:
+        duplicates = []
+        image_paths = list(image_paths)
+        batch_id = new_batch_id()
+        with get_project_db(self.project_path).connection() as conn:
+            self._backfill_content_hashes(conn)
+            for done, src_path in enumerate(image_paths):
+                if should_stop and should_stop():
+                    break
+                if progress:
+                    progress(done, len(image_paths))
+                original_filename = os.path.basename(src_path)
+                with stage("import.hash"):
+                    content_hash = hash_file(src_path)
+                existing = self._find_by_hash(conn, content_hash)
+                if existing:
+                    duplicates.append(self._duplicate_entry(existing, original_filename, src_path))
+                    continue
                 ext = os.path.splitext(src_path)[1]
                 image_id = str(uuid.uuid4())
                 dest_filename = f"{image_id}{ext}"
                 dest_path = self.raw_dir / dest_filename
-                shutil.copy2(src_path, dest_path)
-                original_filename = os.path.basename(src_path)
-                # Register in database
-                conn.execute(
-                    "INSERT INTO images (id, filename, original_filename) VALUES (?, ?, ?)",
-                    (image_id, dest_filename, original_filename)
+                part_path = dest_path.with_name(f".{dest_filename}.part")
+                if move:
+                    with stage("import.move"):
+                        try:
+                            os.replace(src_path, part_path)
+                        except OSError:
+                            # Staged on another filesystem
+                            shutil.copy2(src_path, part_path)
+                else:
+                    with stage("import.copy"):
+                        shutil.copy2(src_path, part_path)
+                entry, existing = self._commit(
+                    conn, part_path, image_id, dest_filename, original_filename,
+                    original_path=src_path, content_hash=content_hash,
+                    details={"source": "path"}, batch_id=batch_id
                 )
-                # Log to history
-                conn.execute(
-                    "INSERT INTO dataset_history (action, filename, original_filename, details) VALUES (?, ?, ?, ?)",
-                    ("add", dest_filename, original_filename, json.dumps({"src_path": src_path}))
+                if existing:
+                    duplicates.append(self._duplicate_entry(existing, original_filename, src_path))
+                else:
+                    imported.append(entry)
+            else:
+                if progress:
+                    progress(len(image_paths), len(image_paths))
+        return {"imported": imported, "duplicates": duplicates}
+
+    def import_streams(self, uploads):
+        """Import (filename, binary stream) pairs without a temporary copy.
+
+        Each stream is written straight to its final raw/<uuid><ext> location
+        while its content hash and image dimensions are computed from the bytes
+        passing through, so every image is written to disk exactly once.
+        Uploads whose content is already in the project are discarded.
+        Returns a dict with the "imported" entries and the skipped "duplicates".
+        """
+        imported = []
+        duplicates = []
+        batch_id = new_batch_id()
+        with get_project_db(self.project_path).connection() as conn:
+            self._backfill_content_hashes(conn)
+            for original_filename, stream in uploads:
+                ext = os.path.splitext(original_filename)[1]
+                image_id = str(uuid.uuid4())
+                dest_filename = f"{image_id}{ext}"
+                dest_path = self.raw_dir / dest_filename
+                part_path = dest_path.with_name(f".{dest_filename}.part")
+                content_hash, header = self._stream_to(stream, part_path)
+                entry, existing = self._commit(
+                    conn, part_path, image_id, dest_filename, original_filename,
+                    original_path=None, content_hash=content_hash,
+                    details={"source": "upload"}, batch_id=batch_id, header=header
                 )
-                # --- APPEND: Update central raw_metadata.json ---
-                raw_metadata[image_id] = {
-                    "id": image_id,
-                    "filename": dest_filename,
-                    "original_filename": original_filename,
-                    "imported_at": str(Path(dest_path).stat().st_mtime),
-                    "original_path": src_path
-                }
-                imported.append({
-                    "id": image_id,
-                    "filename": dest_filename,
-                    "original_filename": original_filename,
-                    "original_path": src_path
-                })
+                if existing:
+                    duplicates.append(self._duplicate_entry(existing, original_filename, None))
+                else:
+                    imported.append(entry)
+        return {"imported": imported, "duplicates": duplicates}
+
+    def _commit(self, conn, part_path, image_id, dest_filename, original_filename,
+                original_path, content_hash, details, batch_id=None, header=None):
+        """Move a fully written .part file into raw/ and register it, one file per transaction.
+
+        The duplicate check runs again under the project write lock so two
+        concurrent imports of the same content can't both keep it. Returns
+        (entry, None) for a new image or (None, existing row) for a duplicate.
+        """
+        dest_path = self.raw_dir / dest_filename
+        with stage("import.commit"), self.lock.write():
+            existing = self._find_by_hash(conn, content_hash)
+            if existing:
+                os.remove(part_path)
+                return None, existing
+            os.replace(part_path, dest_path)
+            # Falls back to the file when the header lies beyond the probe
+            # window (e.g. TIFF with a trailing IFD)
+            info = file_info(dest_path, probe_source=io.BytesIO(header) if header else None)
+            entry = self._register(
+                conn, image_id, dest_filename, original_filename,
+                original_path=original_path, content_hash=content_hash,
+                details=details, batch_id=batch_id, info=info
+            )
             conn.commit()
-        # Save updated metadata
-        with open(raw_metadata_path, "w") as f:
-            json.dump(raw_metadata, f, indent=2)
-        return imported
+        bump_project(self.project_path)
+        return entry, None
+
+    def _stream_to(self, stream, part_path):
+        """Copy a stream to part_path, returning (content hash, header bytes).
+
+        The caller renames the .part file into place once it decides to keep
+        it, so an interrupted upload never leaves a truncated image in raw/.
+        """
+        digest = new_hash()
+        header = bytearray()
+        try:
+            with stage("import.stream"), open(part_path, "wb") as out:
+                for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    if len(header) < HEADER_PROBE_SIZE:
+                        header += chunk[:HEADER_PROBE_SIZE - len(header)]
+                    out.write(chunk)
+        except BaseException:
+            if part_path.exists():
+                os.remove(part_path)
+            raise
+        return digest.hexdigest(), bytes(header)
+
+    def _find_by_hash(self, conn, content_hash):
+        return conn.execute(
+            "SELECT id, filename FROM images WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+
+    def _duplicate_entry(self, existing, original_filename, original_path):
+        return {
+            "original_filename": original_filename,
+            "original_path": original_path,
+            "duplicate_of": existing[0],
+            "filename": existing[1]
+        }
+
+    def _backfill_content_hashes(self, conn):
+        """Hash images imported before content hashes were recorded (one-time).
+
+        Rows that cannot be indexed (missing files, pre-existing duplicates)
+        keep a NULL hash; the project_meta flag stops them from being
+        re-hashed on every import.
+        """
+        done = conn.execute(
+            "SELECT value FROM project_meta WHERE key = ?", (_HASH_BACKFILL_KEY,)
+        ).fetchone()
+        if done:
+            return
+        with self.lock.write():
+            rows = conn.execute(
+                "SELECT id, filename FROM images WHERE content_hash IS NULL"
+            ).fetchall()
+            self._hash_rows(conn, rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO project_meta (key, value) VALUES (?, ?)",
+                (_HASH_BACKFILL_KEY, "1")
+            )
+            conn.commit()
+
+    def _hash_rows(self, conn, rows):
+        for image_id, filename in rows:
+            file_path = self.raw_dir / filename
+            if not file_path.exists():
+                continue
+            try:
+                conn.execute(
+                    "UPDATE images SET content_hash = ? WHERE id = ?",
+                    (hash_file(file_path), image_id)
+                )
+            except sqlite3.IntegrityError:
+                pass  # Pre-existing duplicate; leave it unindexed
+
+    def _register(self, conn, image_id, dest_filename, original_filename,
+                  original_path, content_hash, details, batch_id, info):
+        """Record an imported file in the database, history and raw metadata."""
+        # Register in database, caching file info so listings never reopen the file
+        conn.execute(
+            """
+            INSERT INTO images (id, filename, original_filename, content_hash,
+                                width, height, size_bytes, format, mode, file_mtime_ns)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (image_id, dest_filename, original_filename, content_hash,
+             info["width"], info["height"], info["size_bytes"], info["format"],
+             info["mode"], info["file_mtime_ns"])
+        )
+        # Log to history; the source path is kept in raw metadata, not here
+        conn.execute(
+            "INSERT INTO dataset_history (action, filename, original_filename, details, batch_id) VALUES (?, ?, ?, ?, ?)",
+            ("add", dest_filename, original_filename, json.dumps(details), batch_id)
+        )
+        self.raw_metadata.put(conn, {
+            "id": image_id,
+            "filename": dest_filename,
+            "original_filename": original_filename,
+            "imported_at": str(info["file_mtime_ns"] / 1e9),
+            "original_path": original_path,
+            "sha256": content_hash,
+            "width": info["width"],
+            "height": info["height"]
+        })
+        return {
+            "id": image_id,
+            "filename": dest_filename,
+            "original_filename": original_filename,
+            "original_path": original_path,
+            "sha256": content_hash,
+            "width": info["width"],
+            "height": info["height"]
+        }
@@ -0,0 +1,352 @@
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing
+from pathlib import Path
+
+JOBS_SUFFIX = ".jobs.sqlite"
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 32
+# Progress is kept in memory on every update but only written this often
+PROGRESS_SAVE_INTERVAL = 1.0
+
+
+class JobQueueFull(Exception):
+    """Raised when the bounded job queue cannot take another job."""
+
+
+class JobCancelled(Exception):
+    """Raised by Job.check_cancelled() to unwind a job that was asked to stop."""
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+class Job:
+    """Handle passed to a job runner for reporting progress and checking cancellation."""
+
+    def __init__(self, manager, job_id, kind, project_name, params):
+        self.manager = manager
+        self.id = job_id
+        self.kind = kind
+        self.project_name = project_name
+        self.params = params
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.started_at = None
+        self._cancel = threading.Event()
+        self._last_saved = 0.0
+        # Set when the backend, not the user, stopped the job
+        self.interrupted = False
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def progress(self, done, total=None, message=None):
+        """Record per-item progress; persisted at most every PROGRESS_SAVE_INTERVAL seconds."""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if now - self._last_saved >= PROGRESS_SAVE_INTERVAL or done == self.total:
+            self._last_saved = now
+            self.manager._save_progress(self)
+
+    def eta_seconds(self):
+        if not self.started_at or not self.total or not self.done:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        return round(elapsed / self.done * (self.total - self.done), 1)
+
+
+class JobManager:
+    """Runs long dataset operations on a small pool of worker threads.
+
+    Jobs go through a bounded queue and return an id immediately. Their state
+    and progress are stored in a SQLite database beside the projects directory
+    (~/.seekeraug/projects.jobs.sqlite), so jobs that were queued or running
+    when the backend stopped can be resumed on the next start. Runners must
+    therefore be safe to re-run: the processor and importer skip work that
+    already finished.
+    """
+
+    def __init__(self, base_dir, workers=None, queue_size=None):
+        self.base_dir = Path(base_dir)
+        self.db_path = self.base_dir.parent / f"{self.base_dir.name}{JOBS_SUFFIX}"
+        self.workers = workers or int(os.environ.get("SEEKERAUG_JOB_WORKERS", DEFAULT_WORKERS))
+        self._queue = queue.Queue(
+            maxsize=queue_size or int(os.environ.get("SEEKERAUG_JOB_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        )
+        self._runners = {}
+        self._live = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._db_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    project_name TEXT,
+                    params TEXT,
+                    state TEXT NOT NULL,
+                    done INTEGER DEFAULT 0,
+                    total INTEGER,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created TEXT,
+                    started TEXT,
+                    finished TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_project ON jobs(project_name, created)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return closing(conn)
+
+    def _execute(self, sql, params=()):
+        with self._db_lock, self._connect() as conn:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+
+    def register(self, kind, runner):
+        """Register runner(job, params) -> JSON-serializable result for a job kind."""
+        self._runners[kind] = runner
+
+    def submit(self, kind, project_name, params=None):
+        """Queue a job and return its status dict. Raises JobQueueFull if the queue is full."""
+        if kind not in self._runners:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job_id = str(uuid.uuid4())
+        params = params or {}
+        self._execute(
+            """
+            INSERT INTO jobs (id, kind, project_name, params, state, created)
+            VALUES (?, ?, ?, ?, 'queued', ?)
+            """,
+            (job_id, kind, project_name, json.dumps(params), _now())
+        )
+        try:
+            self._enqueue(job_id)
+        except JobQueueFull:
+            self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            raise
+        return self.get(job_id)
+
+    def get(self, job_id):
+        rows = self._execute(
+            """
+            SELECT id, kind, project_name, state, done, total, message, result, error,
+                   created, started, finished
+            FROM jobs WHERE id = ?
+            """,
+            (job_id,)
+        )
+        return self._row_to_status(rows[0]) if rows else None
+
+    def list(self, project_name=None, active_only=False, limit=50):
+        where = []
+        params = []
+        if project_name is not None:
+            where.append("project_name = ?")
+            params.append(project_name)
+        if active_only:
+            where.append("state IN ('queued', 'running')")
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        rows = self._execute(
+            f"""
+            SELECT id, kind, project_name, state, done, total, message, result, error,
+                   created, started, finished
+            FROM jobs {where_sql} ORDER BY created DESC LIMIT ?
+            """,
+            params + [int(limit)]
+        )
+        return [self._row_to_status(row) for row in rows]
+
+    def cancel(self, job_id):
+        """Ask a job to stop. Queued jobs are dropped; running jobs stop at their next check."""
+        with self._lock:
+            live = self._live.get(job_id)
+            if live is not None:
+                live._cancel.set()
+                return True
+            rows = self._execute(
+                "UPDATE jobs SET state = 'cancelled', finished = ? WHERE id = ? AND state = 'queued' RETURNING id",
+                (_now(), job_id)
+            )
+        return bool(rows)
+
+    def resume(self, job_id):
+        """Re-queue an interrupted job; returns its status or None if it is not resumable."""
+        rows = self._execute(
+            "UPDATE jobs SET state = 'queued', error = NULL WHERE id = ? AND state = 'interrupted' RETURNING id",
+            (job_id,)
+        )
+        if not rows:
+            return None
+        try:
+            self._enqueue(job_id)
+        except JobQueueFull:
+            self._execute("UPDATE jobs SET state = 'interrupted' WHERE id = ?", (job_id,))
+            raise
+        return self.get(job_id)
+
+    def resume_interrupted(self):
+        """Re-queue jobs left queued or running by a previous backend process.
+
+        Jobs that don't fit in the queue are marked 'interrupted' and can be
+        resumed later with resume(). Returns the ids that were re-queued.
+        """
+        rows = self._execute(
+            "SELECT id FROM jobs WHERE state IN ('queued', 'running') ORDER BY created"
+        )
+        resumed = []
+        for (job_id,) in rows:
+            self._execute("UPDATE jobs SET state = 'queued' WHERE id = ?", (job_id,))
+            try:
+                self._enqueue(job_id)
+                resumed.append(job_id)
+            except JobQueueFull:
+                self._execute(
+                    "UPDATE jobs SET state = 'interrupted', error = ? WHERE id = ?",
+                    ("Job queue was full when the backend restarted", job_id)
+                )
+        return resumed
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads after asking running jobs to cancel.
+
+        Jobs stopped this way are left 'queued' in the database so the next
+        start resumes them.
+        """
+        with self._lock:
+            for live in self._live.values():
+                live._cancel.set()
+                live.interrupted = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _enqueue(self, job_id):
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} jobs)")
+
+    def _ensure_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker, name=f"job-worker-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        with self._lock:
+            rows = self._execute(
+                "SELECT kind, project_name, params FROM jobs WHERE id = ? AND state = 'queued'",
+                (job_id,)
+            )
+            if not rows:
+                return  # Cancelled while queued
+            kind, project_name, params = rows[0]
+            job = Job(self, job_id, kind, project_name, json.loads(params or "{}"))
+            self._live[job_id] = job
+        job.started_at = time.monotonic()
+        self._execute(
+            "UPDATE jobs SET state = 'running', started = ?, done = 0, total = NULL WHERE id = ?",
+            (_now(), job_id)
+        )
+        state, result, error = "completed", None, None
+        try:
+            result = self._runners[kind](job, job.params)
+            if job.cancelled:
+                state = "cancelled"
+        except JobCancelled:
+            state = "cancelled"
+        except Exception as e:
+            traceback.print_exc()
+            state, error = "failed", str(e)
+        finally:
+            with self._lock:
+                self._live.pop(job_id, None)
+        if state == "cancelled" and job.interrupted:
+            # Stopped by shutdown(), not by the user: resume on next start
+            self._execute("UPDATE jobs SET state = 'queued' WHERE id = ?", (job_id,))
+            return
+        self._execute(
+            """
+            UPDATE jobs SET state = ?, done = ?, total = ?, message = ?, result = ?, error = ?,
+                            finished = ?
+            WHERE id = ?
+            """,
+            (state, job.done, job.total, job.message,
+             json.dumps(result) if result is not None else None, error, _now(), job_id)
+        )
+
+    def _save_progress(self, job):
+        self._execute(
+            "UPDATE jobs SET done = ?, total = ?, message = ? WHERE id = ?",
+            (job.done, job.total, job.message, job.id)
+        )
+
+    def _row_to_status(self, row):
+        (job_id, kind, project_name, state, done, total, message, result, error,
+         created, started, finished) = row
+        status = {
+            "id": job_id,
+            "kind": kind,
+            "project_name": project_name,
+            "state": state,
+            "done": done,
+            "total": total,
+            "message": message,
+            "eta_seconds": None,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created": created,
+            "started": started,
+            "finished": finished,
+        }
+        with self._lock:
+            live = self._live.get(job_id)
+        if live is not None:
+            # In-memory progress is fresher than the throttled database copy
+            status.update(done=live.done, total=live.total, message=live.message,
+                          eta_seconds=live.eta_seconds(),
+                          cancel_requested=live.cancelled)
+        return status
@@ -1,42 +1,194 @@
-import sqlite3
+import base64
+import json
 from pathlib import Path
 import os
 
+from dataset.image_info import file_info
+from dataset.database import get_project_db
+from dataset.locks import project_lock
+from dataset.metrics import stage
+
+# Sortable fields and the indexed expression each one orders by
+SORT_EXPRESSIONS = {
+    "added": "added",
+    "filename": "filename",
+    "size": "IFNULL(size_bytes, -1)",
+}
+
+# The format filter matches PIL format names; common extensions map onto them
+FORMAT_ALIASES = {
+    "JPG": "JPEG",
+    "JPE": "JPEG",
+    "TIF": "TIFF",
+}
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+_SELECT_COLUMNS = """
+    id, filename, original_filename, added,
+    width, height, size_bytes, format, mode, file_mtime_ns, processed_filename
+"""
+
+
+def _encode_cursor(sort_by, sort_desc, sort_value, image_id):
+    payload = json.dumps([sort_by, sort_desc, sort_value, image_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor, sort_by, sort_desc):
+    try:
+        cursor_sort, cursor_desc, sort_value, image_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort_by or cursor_desc != sort_desc:
+        raise ValueError("Cursor does not match the requested sort order")
+    return sort_value, image_id
+
+
 class DatasetListing:
     """Handles listing images in a SeekerAug project."""
 
     def __init__(self, project_path):
         self.project_path = Path(project_path)
-        self.db_path = self.project_path / "database.sqlite"
         self.raw_dir = self.project_path / "raw"
 
-    def list_images(self):
-        """Return a list of images in the project, with metadata."""
-        images = []
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT id, filename, original_filename, added FROM images")
-            for row in cursor.fetchall():
-                image_id, filename, original_filename, added = row
-                file_path = self.raw_dir / filename
-                size = None
-                width = None
-                height = None
-                if file_path.exists():
-                    size = file_path.stat().st_size
-                    try:
-                        from PIL import Image
-                        with Image.open(file_path) as img:
-                            width, height = img.size
-                    except Exception:
-                        width, height = None, None
-                images.append({
-                    "id": image_id,
-                    "filename": filename,
-                    "original_filename": original_filename,
-                    "path": str(file_path),
-                    "size": size,
-                    "width": width,
-                    "height": height,
-                    "added": added
-                })
+    def list_images(self, revalidate=False):
+        """Return a list of images in the project, with metadata.
+
+        Dimensions and file stats come from columns cached on the images table,
+        so a listing is a single query. Rows without cached info (imported
+        before it was recorded) are filled in once. With revalidate=True every
+        file is stat()ed and rows whose mtime changed are refreshed.
+        """
+        with project_lock(self.project_path).read(), get_project_db(self.project_path).connection() as conn:
+            with stage("listing.query"):
+                rows = conn.execute(f"SELECT {_SELECT_COLUMNS} FROM images").fetchall()
+            with stage("listing.rows"):
+                images = [self._row_to_image(conn, row, revalidate) for row in rows]
         return images
+
+    def list_page(self, cursor=None, limit=DEFAULT_PAGE_SIZE, sort_by="added", sort_desc=False,
+                  filters=None, processed_only=False):
+        """Return one page of images using keyset pagination.
+
+        Args:
+            cursor (str, optional): next_cursor from the previous page.
+            limit (int): Page size, capped at MAX_PAGE_SIZE.
+            sort_by (str): 'added', 'filename' or 'size'.
+            sort_desc (bool): Sort in descending order.
+            filters (dict, optional): Any of 'format' (str or list of PIL
+                names such as 'JPEG', or extensions such as 'jpg'),
+                'min_width', 'max_width', 'min_height', 'max_height' (int) and
+                'annotated' (bool).
+            processed_only (bool): Only images with a processed (refined) output.
+
+        Returns:
+            dict: {"images": [...], "next_cursor": str or None}
+        """
+        if sort_by not in SORT_EXPRESSIONS:
+            raise ValueError(f"Unsupported sort_by '{sort_by}'")
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        sort_desc = bool(sort_desc)
+        sort_expr = SORT_EXPRESSIONS[sort_by]
+        direction = "DESC" if sort_desc else "ASC"
+
+        where, params = self._filter_clauses(filters or {})
+        if processed_only:
+            where.append("processed_filename IS NOT NULL")
+        if cursor:
+            sort_value, last_id = _decode_cursor(cursor, sort_by, sort_desc)
+            # The plain bound on the sort key lets SQLite seek expression indexes too
+            where.append(f"{sort_expr} {'<=' if sort_desc else '>='} ?")
+            where.append(f"({sort_expr}, id) {'<' if sort_desc else '>'} (?, ?)")
+            params.extend([sort_value, sort_value, last_id])
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with project_lock(self.project_path).read(), get_project_db(self.project_path).connection() as conn:
+            # Fetch one extra row to learn whether another page follows
+            with stage("listing.query"):
+                rows = conn.execute(
+                    f"""
+                    SELECT {_SELECT_COLUMNS}, {sort_expr} FROM images {where_sql}
+                    ORDER BY {sort_expr} {direction}, id {direction}
+                    LIMIT ?
+                    """,
+                    params + [limit + 1]
+                ).fetchall()
+            page = rows[:limit]
+            with stage("listing.rows"):
+                images = [self._row_to_image(conn, row[:-1]) for row in page]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = _encode_cursor(sort_by, sort_desc, last[-1], last[0])
+        if processed_only:
+            processed_dir = self.project_path / "processed"
+            for image in images:
+                image["path"] = str(processed_dir / image["processed_filename"])
+        return {"images": images, "next_cursor": next_cursor}
+
+    def _filter_clauses(self, filters):
+        where = []
+        params = []
+        image_format = filters.get("format")
+        if image_format:
+            formats = [image_format] if isinstance(image_format, str) else list(image_format)
+            where.append(f"format IN ({', '.join('?' for _ in formats)})")
+            for f in formats:
+                name = str(f).upper().lstrip(".")
+                params.append(FORMAT_ALIASES.get(name, name))
+        for key, column, op in (
+            ("min_width", "width", ">="), ("max_width", "width", "<="),
+            ("min_height", "height", ">="), ("max_height", "height", "<="),
+        ):
+            if filters.get(key) is not None:
+                where.append(f"{column} {op} ?")
+                params.append(int(filters[key]))
+        if filters.get("annotated") is not None:
+            where.append("annotation_count > 0" if filters["annotated"] else "annotation_count = 0")
+        return where, params
+
+    def _row_to_image(self, conn, row, revalidate=False):
+        image_id, filename, original_filename, added = row[:4]
+        width, height, size, image_format, mode, mtime_ns, processed_filename = row[4:]
+        file_path = self.raw_dir / filename
+        if mtime_ns is None or revalidate:
+            info = self._refresh_info(conn, image_id, file_path, mtime_ns)
+            if info:
+                width, height, size = info["width"], info["height"], info["size_bytes"]
+                image_format, mode = info["format"], info["mode"]
+        return {
+            "id": image_id,
+            "filename": filename,
+            "original_filename": original_filename,
+            "path": str(file_path),
+            "size": size,
+            "width": width,
+            "height": height,
+            "format": image_format,
+            "mode": mode,
+            "processed_filename": processed_filename,
+            "added": added
+        }
+
+    def _refresh_info(self, conn, image_id, file_path, cached_mtime_ns):
+        """Re-read and store file info if the file changed; return it, or None if unchanged."""
+        with stage("file.stat"):
+            if not file_path.exists():
+                return None
+            if cached_mtime_ns is not None and os.stat(file_path).st_mtime_ns == cached_mtime_ns:
+                return None
+        info = file_info(file_path)
+        conn.execute(
+            """
+            UPDATE images SET width = ?, height = ?, size_bytes = ?, format = ?, mode = ?,
+                              file_mtime_ns = ?
+            WHERE id = ?
+            """,
+            (info["width"], info["height"], info["size_bytes"], info["format"],
+             info["mode"], info["file_mtime_ns"], image_id)
+        )
+        return info
@@ -0,0 +1,97 @@
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from dataset.metrics import stage
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+class RWLock:
+    """Writer-preferring reader/writer lock.
+
+    Any number of threads may hold it for reading; a writer waits for current
+    readers to leave and blocks new ones while it waits. It is re-entrant: a
+    reader may read again and a writer may read or write again, but a reader
+    cannot upgrade to writing (that would deadlock against another reader).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._cond:
+                if self._writer is not None or self._waiting_writers:
+                    # Only contended acquisitions are timed
+                    with stage("lock.read_wait"):
+                        while self._writer is not None or self._waiting_writers:
+                            self._cond.wait()
+                self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                with self._cond:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+            else:
+                if getattr(self._local, "depth", 0):
+                    raise RuntimeError("Cannot take a write lock while holding the read lock")
+                self._waiting_writers += 1
+                try:
+                    if self._writer is not None or self._readers:
+                        with stage("lock.write_wait"):
+                            while self._writer is not None or self._readers:
+                                self._cond.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+                self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+def project_lock(project_path):
+    """Return the process-wide RWLock for a project.
+
+    Readers are requests that read project files and the database; writers
+    are the short sections that change them (one imported file, a processing
+    checkpoint, an annotation save). Long operations take the write lock per
+    step rather than for their whole run, so listings keep flowing during an
+    import. Project rename and delete hold it for their whole duration.
+    """
+    key = str(Path(project_path).resolve())
+    with _locks_lock:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = RWLock()
+        return lock
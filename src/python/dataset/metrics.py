@@ -0,0 +1,317 @@
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency bucket upper bounds in seconds (Prometheus "le" labels)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+METRIC_PREFIX = "seekeraug"
+PROFILER_INTERVAL = 0.01
+# Distinct stacks kept by the profiler; rarer ones beyond this are counted as dropped
+PROFILER_MAX_STACKS = 20000
+PROFILER_MAX_DEPTH = 64
+# Leaf frames in these modules are threads blocked waiting, not doing work
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py", "socket.py", "socketserver.py",
+                 "selector_events.py")
+
+_local = threading.local()
+_started = time.time()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, safe to update from many threads."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        """Return count, sum, errors, cumulative buckets and estimated percentiles."""
+        with self._lock:
+            counts, count, total, errors = list(self.counts), self.count, self.sum, self.errors
+        cumulative = []
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            running += n
+            cumulative.append((bound, running))
+        return {
+            "count": count,
+            "sum": total,
+            "errors": errors,
+            "mean": total / count if count else None,
+            "p50": _estimate(cumulative, count, 0.5),
+            "p90": _estimate(cumulative, count, 0.9),
+            "p99": _estimate(cumulative, count, 0.99),
+            "buckets": cumulative,
+        }
+
+
+def _estimate(cumulative, count, quantile):
+    """Interpolate a quantile from cumulative buckets, as Prometheus' histogram_quantile does."""
+    if not count:
+        return None
+    rank = quantile * count
+    lower, below = 0.0, 0
+    for bound, running in cumulative:
+        if running >= rank:
+            if bound == float("inf"):
+                return lower
+            inside = running - below
+            return lower + (bound - lower) * ((rank - below) / inside if inside else 0)
+        lower, below = bound, running
+    return lower
+
+
+class MetricsRegistry:
+    """Request and stage histograms keyed by their labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (route, method) -> Histogram
+        self.statuses = collections.Counter()  # (route, method, status) -> count
+        self.stages = {}  # stage name -> Histogram
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram())
+        return histogram
+
+    def observe_request(self, route, method, status, seconds):
+        self._histogram(self.requests, (route, method)).observe(seconds, error=status >= 500)
+        with self._lock:
+            self.statuses[(route, method, status)] += 1
+
+    def observe_stage(self, name, seconds, error=False):
+        self._histogram(self.stages, name).observe(seconds, error)
+
+    def snapshot(self):
+        with self._lock:
+            requests = dict(self.requests)
+            statuses = dict(self.statuses)
+            stages = dict(self.stages)
+        routes = {}
+        for (route, method), histogram in sorted(requests.items()):
+            entry = histogram.snapshot()
+            entry["statuses"] = {
+                str(status): count for (r, m, status), count in sorted(statuses.items())
+                if r == route and m == method
+            }
+            routes.setdefault(route, {})[method] = entry
+        return {
+            "uptime_seconds": time.time() - _started,
+            "routes": routes,
+            "stages": {name: stages[name].snapshot() for name in sorted(stages)},
+        }
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_uptime_seconds Seconds since the backend started.",
+            f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+            f"{METRIC_PREFIX}_uptime_seconds {snapshot['uptime_seconds']:.3f}",
+        ]
+        name = f"{METRIC_PREFIX}_request_duration_seconds"
+        lines += [f"# HELP {name} HTTP request latency by route.", f"# TYPE {name} histogram"]
+        for route, methods in snapshot["routes"].items():
+            for method, entry in methods.items():
+                lines += _histogram_lines(name, {"route": route, "method": method}, entry)
+        name = f"{METRIC_PREFIX}_requests_total"
+        lines += [f"# HELP {name} HTTP responses by route and status.", f"# TYPE {name} counter"]
+        for route, methods in snapshot["routes"].items():
+            for method, entry in methods.items():
+                for status, count in entry["statuses"].items():
+                    lines.append(f"{name}{_labels({'route': route, 'method': method, 'status': status})} {count}")
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines += [f"# HELP {name} Time spent in instrumented stages.", f"# TYPE {name} histogram"]
+        for stage_name, entry in snapshot["stages"].items():
+            lines += _histogram_lines(name, {"stage": stage_name}, entry)
+        name = f"{METRIC_PREFIX}_stage_errors_total"
+        lines += [f"# HELP {name} Stages that raised.", f"# TYPE {name} counter"]
+        for stage_name, entry in snapshot["stages"].items():
+            lines.append(f"{name}{_labels({'stage': stage_name})} {entry['errors']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    escape = lambda value: str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name, labels, entry):
+    lines = []
+    for bound, running in entry["buckets"]:
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {running}")
+    lines.append(f"{name}_sum{_labels(labels)} {entry['sum']:.6f}")
+    lines.append(f"{name}_count{_labels(labels)} {entry['count']}")
+    return lines
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def stage(name):
+    """Time a block as stage name; the time also counts toward the current request's breakdown."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe_stage(name, elapsed, error)
+        stages = getattr(_local, "stages", None)
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def begin_request():
+    """Start collecting this thread's stage times for a per-request breakdown."""
+    _local.stages = {}
+
+
+def end_request():
+    """Return {stage: seconds} collected since begin_request() and stop collecting."""
+    stages = getattr(_local, "stages", None) or {}
+    _local.stages = None
+    return stages
+
+
+class SamplingProfiler:
+    """Statistical profiler that snapshots every thread's stack at a fixed interval.
+
+    It runs in its own thread and only reads frames, so the app is not slowed
+    beyond the sampling itself (a few microseconds per thread per sample).
+    Stacks are aggregated in memory and can be read in the collapsed format
+    flame graph tools take, or as a ranking of the functions on top of the
+    stack.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.interval = PROFILER_INTERVAL
+        self.include_idle = False
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.dropped = 0
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None, include_idle=False, reset=True):
+        with self._lock:
+            if self.running:
+                return False
+            if reset:
+                self.stacks = collections.Counter()
+                self.samples = self.dropped = 0
+            self.interval = max(0.001, interval or PROFILER_INTERVAL)
+            self.include_idle = include_idle
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+        return not self.running
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 3),
+            "include_idle": self.include_idle,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "dropped": self.dropped,
+            "started_at": self.started_at,
+        }
+
+    def collapsed(self, limit=None):
+        """Lines of 'outer;...;inner count', most frequent first."""
+        with self._lock:
+            items = self.stacks.most_common(limit)
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in items)
+
+    def top(self, limit=50):
+        """Functions ranked by samples on top of the stack (self) and anywhere in it (total)."""
+        own = collections.Counter()
+        total = collections.Counter()
+        with self._lock:
+            items = list(self.stacks.items())
+        for stack, count in items:
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+        samples = sum(count for _, count in items) or 1
+        return [
+            {"function": frame, "self": count, "total": total[frame],
+             "self_percent": round(100 * count / samples, 2),
+             "total_percent": round(100 * total[frame] / samples, 2)}
+            for frame, count in own.most_common(limit)
+        ]
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = _stack(frame)
+                    if not self.include_idle and stack and stack[-1].split(" ")[-1].startswith(_IDLE_MODULES):
+                        continue
+                    if stack not in self.stacks and len(self.stacks) >= PROFILER_MAX_STACKS:
+                        self.dropped += 1
+                        continue
+                    self.stacks[stack] += 1
+
+
+def _stack(frame):
+    """Outermost-first tuple of 'function file:line' labels, at most PROFILER_MAX_DEPTH deep."""
+    frames = []
+    while frame is not None and len(frames) < PROFILER_MAX_DEPTH:
+        code = frame.f_code
+        frames.append(f"{code.co_name} {os.path.basename(code.co_filename)}:{frame.f_lineno}")
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+PROFILER = SamplingProfiler()
@@ -1,74 +1,424 @@
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from PIL import Image, TiffImagePlugin
 import json
+import shutil
+
+from dataset.fileio import link_or_copy, write_json_atomic
+from dataset.hashing import hash_file
+from dataset.annotation_store import AnnotationStore
+from dataset.database import get_project_db
+from dataset.generations import bump_project
+from dataset.locks import project_lock
+from dataset.metrics import stage
+from dataset.raw_metadata import RAW_METADATA_FILENAME
+from dataset.tiles import TILES_DIRNAME, needs_tiling, process_large_tiff, tiff_tag_dict
+
+# A chunk that took the worker pool down is split up and retried; a single
+# file gets this many attempts before it is recorded as an error.
+MAX_CRASH_ATTEMPTS = 2
+
+MANIFEST_VERSION = 1
+# Progress is saved this often so an interrupted run resumes where it stopped
+CHECKPOINT_SECONDS = 10
+
+# Output encodings for processed images. With "passthrough", inputs already
+# in the target format, in RGB and within max_edge are hardlinked (or copied)
+# instead of being decoded and re-encoded. "max_edge" downscales larger
+# images, letting JPEG sources decode at reduced scale via draft().
+OUTPUT_PROFILES = {
+    "jpeg": {"format": "JPEG", "quality": 95, "passthrough": True},
+    "jpeg-preview": {"format": "JPEG", "quality": 85, "max_edge": 2048, "passthrough": True},
+    "png": {"format": "PNG", "compress_level": 6, "passthrough": True},
+    "webp": {"format": "WEBP", "quality": 90, "method": 4, "passthrough": True},
+    "webp-lossless": {"format": "WEBP", "lossless": True, "method": 4, "passthrough": False},
+}
+DEFAULT_PROFILE = os.environ.get("SEEKERAUG_OUTPUT_PROFILE", "jpeg")
+_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+_SAVE_OPTIONS = {
+    "JPEG": {"quality", "optimize", "progressive", "subsampling"},
+    "PNG": {"compress_level", "optimize"},
+    "WEBP": {"quality", "method", "lossless"},
+}
+
+
+def resolve_profile(profile=None):
+    """Return the settings dict for a profile name, or for a dict of overrides.
+
+    A dict may name a "base" profile (default DEFAULT_PROFILE) and override
+    any of its settings. When it overrides the format, base options the new
+    format does not support are dropped. Raises ValueError for unknown
+    profiles, or for options the caller passed that the format does not take.
+    """
+    overrides = {}
+    if isinstance(profile, dict):
+        overrides = dict(profile)
+        profile = overrides.pop("base", None)
+    name = profile or DEFAULT_PROFILE
+    if name not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile '{name}'")
+    base = OUTPUT_PROFILES[name]
+    fmt = str(overrides.get("format", base["format"])).upper()
+    if fmt not in _EXTENSIONS:
+        raise ValueError(f"Unsupported output format '{overrides['format']}'")
+    allowed = _SAVE_OPTIONS[fmt] | {"format", "passthrough", "max_edge"}
+    settings = {**{key: value for key, value in base.items() if key in allowed}, **overrides}
+    unknown = set(overrides) - allowed
+    if unknown:
+        raise ValueError(f"Unknown {fmt} options: {', '.join(sorted(unknown))}")
+    settings["format"] = fmt
+    settings["name"] = name
+    return settings
+
+
+# EXIF Orientation tag
+_ORIENTATION = 0x0112
+
+
+def _conforms(img, profile):
+    """True if img can be used as-is under profile, judged from its header alone.
+
+    Images with an EXIF orientation are re-encoded, which drops the tag: a
+    linked copy would keep it and be shown rotated, while widths, heights and
+    annotations refer to the stored pixels.
+    """
+    max_edge = profile.get("max_edge")
+    return (profile.get("passthrough") and img.format == profile["format"] and img.mode == "RGB"
+            and (not max_edge or max(img.size) <= max_edge)
+            and img.getexif().get(_ORIENTATION, 1) == 1)
+
+
+def _is_raw_image_name(name):
+    # raw_metadata.json exports and in-flight .part uploads are not images
+    return name != RAW_METADATA_FILENAME and not name.startswith(".")
+
+
+def _process_file(file, processed_dir, known_hash=None, profile=None):
+    """Convert one raw image to the output profile's format (JPG by default).
+
+    Returns a (raw name, metadata key, metadata, content hash) tuple. When the
+    content hash equals known_hash the file is not decoded and key/metadata are
+    None. Conforming inputs are linked rather than re-encoded, and TIFFs above
+    the tiling threshold are turned into a tile pyramid instead of being
+    decoded whole. Runs inside pool workers, so it must stay a picklable
+    module-level function.
+    """
+    profile = profile or resolve_profile()
+    ext = file.suffix.lower()
+    orig_name = file.name
+    content_hash = None
+    try:
+        content_hash = hash_file(file)
+        if known_hash is not None and content_hash == known_hash:
+            return orig_name, None, None, content_hash
+        if ext in [".tif", ".tiff"] and needs_tiling(file):
+            jpg_name, meta = process_large_tiff(file, processed_dir)
+            return orig_name, jpg_name, meta, content_hash
+        from PIL import Image
+        with Image.open(file) as img:
+            fmt = img.format
+            # TIFF-specific: extract tags (e.g., scale, georeferencing) before convert() drops them
+            tiff_tags = tiff_tag_dict(img.tag_v2) if ext in [".tif", ".tiff"] else None
+            out_name = f"{file.stem}{_EXTENSIONS[profile['format']]}"
+            out_path = processed_dir / out_name
+            # Replace rather than overwrite: version snapshots hardlink these files
+            tmp_path = processed_dir / f".{out_name}.tmp"
+            passthrough = _conforms(img, profile)
+            if passthrough:
+                # rename() between two links to one file is a no-op, so skip outputs already linked
+                if not (out_path.exists() and os.path.samefile(file, out_path)):
+                    if tmp_path.exists():
+                        os.remove(tmp_path)
+                    link_or_copy(file, tmp_path)
+                    os.replace(tmp_path, out_path)
+            else:
+                max_edge = profile.get("max_edge")
+                if max_edge:
+                    # JPEG decodes straight at a reduced DCT scale; others are resized after loading
+                    img.draft("RGB", (max_edge, max_edge))
+                    if max(img.size) > max_edge:
+                        img.thumbnail((max_edge, max_edge), reducing_gap=3.0)
+                # Convert to RGB for the output encoder
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                options = {key: value for key, value in profile.items()
+                           if key in _SAVE_OPTIONS[profile["format"]]}
+                img.save(tmp_path, profile["format"], **options)
+                os.replace(tmp_path, out_path)
+            # Extract metadata
+            meta = {
+                "original_filename": orig_name,
+                "processed_filename": out_name,
+                "width": img.width,
+                "height": img.height,
+                "format": fmt,
+                "mode": "RGB",
+                "size_bytes": file.stat().st_size,
+                "profile": profile["name"],
+                "passthrough": passthrough,
+            }
+            if tiff_tags is not None:
+                meta["tiff_tags"] = tiff_tags
+            return orig_name, out_name, meta, content_hash
+    except Exception as e:
+        return orig_name, orig_name, {"error": str(e)}, content_hash
+
+
+def _process_chunk(items, processed_dir, profile=None):
+    """Process a chunk of (file, known hash) items in one worker round-trip."""
+    return [_process_file(file, processed_dir, known_hash, profile) for file, known_hash in items]
+
 
 class DatasetProcessor:
-    """Processes raw dataset: converts images to JPG, extracts metadata, saves to processed/."""
+    """Processes raw dataset: converts images to JPG (or another output profile), extracts metadata, saves to processed/."""
 
     def __init__(self, project_path):
         self.project_path = Path(project_path)
+        self.db_path = self.project_path / "database.sqlite"
         self.raw_dir = self.project_path / "raw"
         self.processed_dir = self.project_path / "processed"
         self.processed_dir.mkdir(parents=True, exist_ok=True)
         self.metadata_path = self.processed_dir / "metadata.json"
+        self.manifest_path = self.processed_dir / "manifest.json"
+
+    def process(self, workers=None, chunksize=None, force=False, progress=None, should_stop=None,
+                profile=None):
+        """Convert new or changed images in raw/ to JPG in processed/, extract metadata.
+
+        A manifest of each raw file's size, mtime and content hash is kept in
+        processed/manifest.json. Files whose size and mtime are unchanged are
+        skipped without being read; files that were touched but hash the same
+        are skipped without being decoded. Files that failed are retried on
+        every run. Outputs whose raw source is gone are removed. Metadata and
+        manifest are checkpointed every CHECKPOINT_SECONDS, so a run that is
+        stopped or killed picks up where it left off next time.
+
+        Args:
+            workers (int, optional): Number of worker processes. Defaults to the
+                                     CPU count; 1 processes serially in-process.
+            chunksize (int, optional): Files handed to a worker per round-trip.
+                                       Defaults to a size derived from the batch.
+            force (bool): Reprocess every file regardless of the manifest.
+            progress (callable, optional): Called as progress(done, total) as files finish.
+            should_stop (callable, optional): Polled between files (or chunks); once it
+                                              returns True the run stops early and
+                                              saves what it finished.
+            profile (str or dict, optional): Output profile name from OUTPUT_PROFILES, or
+                                             a dict of overrides (see resolve_profile).
+                                             Changing the profile reprocesses every file.
+        """
+        profile = resolve_profile(profile)
+        previous = self._load_json(self.metadata_path, {})
+        manifest, manifest_profile = self._load_manifest()
+        if manifest_profile != profile:
+            force = True
+        metadata = dict(previous)
+        new_manifest = {}
+        pending = {}
+        todo = []
+        with os.scandir(self.raw_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not _is_raw_image_name(entry.name):
+                    continue
+                stat = entry.stat()
+                known = manifest.get(entry.name)
+                # Only trust the manifest while its output is still recorded and
+                # did not fail; failures may be transient and are retried
+                if (force or not known or known["key"] not in previous
+                        or "error" in previous[known["key"]]):
+                    known = None
+                elif known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+                    new_manifest[entry.name] = known
+                    continue
+                pending[entry.name] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": None,
+                    "key": known["key"] if known else None,
+                }
+                todo.append((Path(entry.path), known["sha256"] if known else None))
+        todo.sort(key=lambda item: item[0].name)
+
+        processed = []
+        done = 0
+        last_checkpoint = time.monotonic()
+        for raw_name, key, meta, content_hash in self._run(todo, workers, chunksize, profile, should_stop):
+            entry = pending.pop(raw_name)
+            entry["sha256"] = content_hash
+            new_manifest[raw_name] = entry
+            done += 1
+            if key is not None:
+                stale_key = manifest.get(raw_name, {}).get("key")
+                if stale_key and stale_key != key:
+                    # The output name changed (e.g. a new profile's extension)
+                    metadata.pop(stale_key, None)
+                    stale_path = self.processed_dir / stale_key
+                    if stale_path.exists():
+                        os.remove(stale_path)
+                entry["key"] = key
+                metadata[key] = meta
+                processed.append((None if "error" in meta else key, Path(raw_name).stem))
+            # Touched but byte-identical files keep their previous output
+            if progress:
+                progress(done, len(todo))
+            if time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                # Files not reached yet keep their old entries until they are
+                self._save(processed, [], metadata, {**manifest, **new_manifest}, profile)
+                processed = []
+                last_checkpoint = time.monotonic()
+
+        # Files left unprocessed by an early stop are retried next run
+        for raw_name in pending:
+            if raw_name in manifest:
+                new_manifest[raw_name] = manifest[raw_name]
+
+        # Drop outputs whose raw source no longer exists
+        removed = []
+        for raw_name, known in manifest.items():
+            if raw_name not in new_manifest and raw_name not in pending:
+                self._remove_outputs(known["key"])
+                metadata.pop(known["key"], None)
+                removed.append(Path(raw_name).stem)
+
+        if done or removed or metadata != previous or new_manifest != manifest or force:
+            self._save(processed, removed, metadata, new_manifest, profile)
+        return {key: metadata[key] for key in sorted(metadata)}
+
+    @stage("process.save")
+    def _save(self, processed, removed, metadata, manifest_files, profile):
+        """Record results in the database, then write metadata.json and manifest.json.
+
+        The database goes first: if the process dies in between, the manifest
+        still lacks these files and they are simply processed again.
+        """
+        # Merge in filename order so metadata.json is identical across runs
+        metadata = {key: metadata[key] for key in sorted(metadata)}
+        with project_lock(self.project_path).write():
+            if self.db_path.exists():
+                self._record_processed(processed, removed, metadata)
+            write_json_atomic(self.metadata_path, metadata)
+            write_json_atomic(self.manifest_path, {
+                "version": MANIFEST_VERSION, "profile": profile, "files": manifest_files
+            })
+        bump_project(self.project_path)
+
+    def _run(self, items, workers, chunksize, profile, should_stop=None):
+        """Process (file, known hash) items serially or on the pool, yielding results as they finish."""
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(items) <= 1:
+            for file, known_hash in items:
+                if should_stop and should_stop():
+                    return
+                yield _process_file(file, self.processed_dir, known_hash, profile)
+            return
+        if not chunksize:
+            chunksize = max(1, min(64, len(items) // (workers * 4)))
+        yield from self._process_parallel(items, workers, chunksize, profile, should_stop)
+
+    def _record_processed(self, processed, removed, metadata):
+        """Store each image's processed filename (None on failure) for refined listings.
+
+        Newly processed images get an empty annotation document and removed
+        images lose theirs. If the database disagrees with metadata.json about
+        how many images are processed (e.g. a project processed before this
+        column existed), every entry is written rather than just this run's
+        changes.
+        """
+        annotations = AnnotationStore(self.project_path)
+        with get_project_db(self.project_path).connection() as conn:
+            conn.executemany("UPDATE images SET processed_filename = ? WHERE id = ?", processed)
+            for key, image_id in processed:
+                if key:
+                    annotations.seed(conn, image_id, self._initial_document(image_id, metadata[key]))
+            for image_id in removed:
+                annotations.delete(conn, image_id)
+            ok_keys = [key for key, meta in metadata.items() if "error" not in meta]
+            recorded = conn.execute(
+                "SELECT COUNT(*) FROM images WHERE processed_filename IS NOT NULL"
+            ).fetchone()[0]
+            if recorded != len(ok_keys):
+                conn.execute("UPDATE images SET processed_filename = NULL")
+                conn.executemany(
+                    "UPDATE images SET processed_filename = ? WHERE id = ?",
+                    ((key, Path(key).stem) for key in ok_keys)
+                )
+
+    def _initial_document(self, image_id, meta):
+        return {
+            "image_id": image_id,
+            "filename": meta["processed_filename"],
+            "original_filename": meta["original_filename"],
+            "width": meta["width"],
+            "height": meta["height"],
+            "format": meta["format"],
+            "mode": meta["mode"],
+            "size_bytes": meta["size_bytes"],
+            "annotations": [],
+            "history": [
+                {"action": "created", "at": None}
+            ]
+        }
+
+    def _load_json(self, path, default):
+        if not path.exists():
+            return default
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return default
+
+    def _load_manifest(self):
+        """Return (files, profile) from the manifest.
+
+        Manifests written before output profiles existed were produced by
+        the default JPEG settings, so they count as that profile.
+        """
+        manifest = self._load_json(self.manifest_path, {})
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}, None
+        return manifest.get("files", {}), manifest.get("profile", resolve_profile("jpeg"))
+
+    def _remove_outputs(self, key):
+        """Delete the processed image, its tile pyramid and any legacy annotation file for a metadata key."""
+        if not key:
+            return
+        stem = Path(key).stem
+        for path in (self.processed_dir / key, self.processed_dir / f"{stem}.json"):
+            if path.exists():
+                os.remove(path)
+        tiles_dir = self.processed_dir / TILES_DIRNAME / stem
+        if tiles_dir.exists():
+            shutil.rmtree(tiles_dir)
 
-    def process(self):
-        """Convert all images in raw/ to JPG in processed/, extract metadata."""
-        metadata = {}
-        for file in self.raw_dir.iterdir():
-            if not file.is_file():
-                continue
-            ext = file.suffix.lower()
-            orig_name = file.name
-            try:
-                with Image.open(file) as img:
-                    # Convert to RGB for JPG
-                    if img.mode != "RGB":
-                        img = img.convert("RGB")
-                    # Save as JPG in processed/
-                    jpg_name = f"{file.stem}.jpg"
-                    jpg_path = self.processed_dir / jpg_name
-                    img.save(jpg_path, "JPEG", quality=95)
-                    # Extract metadata
-                    meta = {
-                        "original_filename": orig_name,
-                        "processed_filename": jpg_name,
-                        "width": img.width,
-                        "height": img.height,
-                        "format": img.format,
-                        "mode": img.mode,
-                        "size_bytes": file.stat().st_size,
-                    }
-                    # TIFF-specific: extract tags (e.g., scale, georeferencing)
-                    if ext in [".tif", ".tiff"]:
-                        tiff_tags = {}
-                        for tag, value in img.tag_v2.items():
-                            tag_name = TiffImagePlugin.TAGS_V2.get(tag, tag)
-                            tiff_tags[str(tag_name)] = value
-                        meta["tiff_tags"] = tiff_tags
-                    metadata[jpg_name] = meta
-                    # --- APPEND: Per-image annotation/metadata file creation ---
-                    annotation_path = self.processed_dir / f"{file.stem}.json"
-                    if not annotation_path.exists():
-                        with open(annotation_path, "w") as f:
-                            json.dump({
-                                "image_id": file.stem,
-                                "filename": jpg_name,
-                                "original_filename": orig_name,
-                                "width": img.width,
-                                "height": img.height,
-                                "format": img.format,
-                                "mode": img.mode,
-                                "size_bytes": file.stat().st_size,
-                                "annotations": [],
-                                "history": [
-                                    {"action": "created", "at": None}
-                                ]
-                            }, f, indent=2)
-            except Exception as e:
-                metadata[orig_name] = {"error": str(e)}
-        # Save metadata
-        with open(self.metadata_path, "w") as f:
-            json.dump(metadata, f, indent=2)
-        return metadata
+    def _process_parallel(self, items, workers, chunksize, profile, should_stop=None):
+        """Fan chunks out to a process pool, surviving worker crashes."""
+        pending = [(items[i:i + chunksize], 0) for i in range(0, len(items), chunksize)]
+        while pending:
+            retry = []
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                futures = {
+                    pool.submit(_process_chunk, chunk, self.processed_dir, profile): (chunk, attempts)
+                    for chunk, attempts in pending
+                }
+                for future in as_completed(futures):
+                    chunk, attempts = futures[future]
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        # The pool broke (e.g. a decoder segfault); isolate the culprit
+                        if len(chunk) > 1:
+                            retry.extend(([item], 0) for item in chunk)
+                        elif attempts + 1 < MAX_CRASH_ATTEMPTS:
+                            retry.append((chunk, attempts + 1))
+                        else:
+                            name = chunk[0][0].name
+                            yield name, name, {"error": f"Worker crashed: {e}"}, None
+                        continue
+                    yield from results
+                    if should_stop and should_stop():
+                        # Chunks already running finish; queued ones are dropped
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        return
+            pending = retry
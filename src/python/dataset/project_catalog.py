@@ -0,0 +1,200 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+from dataset.generations import bump_catalog
+from dataset.metrics import stage
+
+CATALOG_SUFFIX = ".catalog.sqlite"
+DEFAULT_TIME = datetime.datetime.min.isoformat()
+
+# Sortable fields and the column holding their sort key
+SORT_COLUMNS = {
+    "name": "name",
+    "created": "created_sort",
+    "last_accessed": "last_accessed_sort",
+}
+
+_lock = threading.Lock()
+# Catalog databases whose schema this process has already created
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def _sort_time(value):
+    """Normalize a stored timestamp for ordering; unparseable values sort as the minimum."""
+    try:
+        return datetime.datetime.fromisoformat(value).isoformat()
+    except (ValueError, TypeError):
+        return ""
+
+
+class ProjectCatalog:
+    """Index of projects kept in a small SQLite database next to the projects directory.
+
+    ProjectManager and ProjectOps update it as they change projects, so listing
+    is an indexed query. The projects directory's mtime is recorded after each
+    sync; if it changes (a project folder added or removed outside the app) the
+    next listing rebuilds the catalog from disk. The database sits beside the
+    directory (~/.seekeraug/projects.catalog.sqlite) because creating its
+    files inside would itself change the directory's mtime.
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = Path(base_dir)
+        self.db_path = self.base_dir.parent / f"{self.base_dir.name}{CATALOG_SUFFIX}"
+
+    def _connect(self):
+        self._ensure_schema()
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _ensure_schema(self):
+        """Create the tables once per process rather than on every connection."""
+        key = str(self.db_path)
+        if key in _schema_ready:
+            return
+        with _schema_lock:
+            if key in _schema_ready:
+                return
+            with closing(sqlite3.connect(self.db_path, timeout=10)) as conn:
+                self._create_schema(conn)
+                conn.commit()
+            _schema_ready.add(key)
+
+    def _create_schema(self, conn):
+        # WAL is a property of the database file, so setting it once is enough
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS projects (
+                dir_name TEXT PRIMARY KEY,
+                name TEXT,
+                path TEXT,
+                created TEXT,
+                created_sort TEXT,
+                version INTEGER,
+                last_accessed TEXT,
+                last_accessed_sort TEXT,
+                is_archived INTEGER
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        for column in SORT_COLUMNS.values():
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_projects_{column} ON projects(is_archived, {column})"
+            )
+
+    def list(self, archived=None, sort_by="last_accessed", sort_desc=True, limit=None, refresh=False):
+        """Return catalog entries in the shape ProjectListing.list_projects returns."""
+        with _lock, closing(self._connect()) as conn:
+            if refresh or self._is_stale(conn):
+                with stage("catalog.rebuild"):
+                    self._rebuild(conn)
+            where = ""
+            params = []
+            if archived is not None:
+                where = "WHERE is_archived = ?"
+                params.append(int(bool(archived)))
+            direction = "DESC" if sort_desc else "ASC"
+            order = f"{SORT_COLUMNS.get(sort_by, 'name')} {direction}, dir_name {direction}"
+            sql = f"""
+                SELECT name, path, created, version, last_accessed, is_archived
+                FROM projects {where} ORDER BY {order}
+            """
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(int(limit))
+            with stage("catalog.query"):
+                rows = conn.execute(sql, params).fetchall()
+        return [
+            {
+                "name": name,
+                "path": path,
+                "created": created,
+                "version": version,
+                "last_accessed": last_accessed,
+                "is_archived": bool(is_archived),
+            }
+            for name, path, created, version, last_accessed, is_archived in rows
+        ]
+
+    def record(self, project_dir, config=None, dir_changed=False):
+        """Insert or update one project's entry from its (given or on-disk) config.
+
+        Pass dir_changed=True when the caller just created or renamed the
+        project folder, so that change doesn't trigger a full rebuild.
+        """
+        project_dir = Path(project_dir)
+        if config is None:
+            config = self._read_config(project_dir)
+        with _lock, closing(self._connect()) as conn:
+            with conn:
+                self._upsert(conn, project_dir, config)
+                if dir_changed:
+                    self._mark_synced(conn)
+        bump_catalog()
+
+    def remove(self, dir_name):
+        """Remove the entry for a project directory that was deleted or renamed away."""
+        with _lock, closing(self._connect()) as conn:
+            with conn:
+                conn.execute("DELETE FROM projects WHERE dir_name = ?", (dir_name,))
+                self._mark_synced(conn)
+        bump_catalog()
+
+    def _upsert(self, conn, project_dir, config):
+        created = config.get("created", DEFAULT_TIME)
+        last_accessed = config.get("last_accessed", config.get("created", DEFAULT_TIME))
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO projects
+                (name, dir_name, path, created, created_sort, version,
+                 last_accessed, last_accessed_sort, is_archived)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (config.get("name", project_dir.name), project_dir.name, str(project_dir),
+             created, _sort_time(created), config.get("version", 1),
+             last_accessed, _sort_time(last_accessed), int(bool(config.get("is_archived", False))))
+        )
+
+    def _read_config(self, project_dir):
+        config_path = project_dir / "project.json"
+        if config_path.exists():
+            try:
+                with open(config_path, "r") as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                # Handle potential corruption or empty file
+                pass
+        return {}
+
+    def _base_mtime(self):
+        return str(os.stat(self.base_dir).st_mtime_ns)
+
+    def _is_stale(self, conn):
+        row = conn.execute("SELECT value FROM catalog_state WHERE key = 'base_mtime_ns'").fetchone()
+        return row is None or row[0] != self._base_mtime()
+
+    def _mark_synced(self, conn):
+        conn.execute(
+            "INSERT OR REPLACE INTO catalog_state (key, value) VALUES ('base_mtime_ns', ?)",
+            (self._base_mtime(),)
+        )
+
+    def _rebuild(self, conn):
+        """Re-read every project.json; used when the directory changed outside the app."""
+        with conn:
+            conn.execute("DELETE FROM projects")
+            for project_dir in self.base_dir.iterdir():
+                if project_dir.is_dir():
+                    self._upsert(conn, project_dir, self._read_config(project_dir))
+            self._mark_synced(conn)
+        bump_catalog()
@@ -1,7 +1,10 @@
 import os
 from pathlib import Path
 import sqlite3
-import json
+
+from dataset.fileio import write_json_atomic
+from dataset.project_catalog import ProjectCatalog
+from dataset.schema import migrate
 
 class ProjectManager:
     """Handles creation and management of SeekerAug projects."""
@@ -36,35 +39,11 @@ class ProjectManager:
             "created": str(Path().cwd()),
             "version": 1
         }
-        with open(project_path / "project.json", "w") as f:
-            json.dump(config, f, indent=2)
+        write_json_atomic(project_path / "project.json", config)
+        ProjectCatalog(self.base_dir).record(project_path, config, dir_changed=True)
 
         return str(project_path)
 
     def _init_db(self, conn):
         """Initialize the SQLite database schema."""
-        cursor = conn.cursor()
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS images (
-            id TEXT PRIMARY KEY,
-            filename TEXT,
-            added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS annotations (
-            id TEXT PRIMARY KEY,
-            image_id TEXT,
-            data TEXT,
-            created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(image_id) REFERENCES images(id)
-        );
-        """)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS versions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-        conn.commit()
+        migrate(conn)
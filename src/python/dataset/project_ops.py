@@ -6,12 +6,20 @@ import datetime
 import subprocess
 import sys
 
+from dataset.database import close_project_db
+from dataset.fileio import write_json_atomic
+from dataset.generations import bump_project
+from dataset.locks import project_lock
+from dataset.project_catalog import ProjectCatalog
+from dataset.thumbnails import forget_thumbnail_cache
+
 class ProjectOps:
     """Handles project rename and delete operations."""
 
     def __init__(self, base_dir=None):
         self.base_dir = Path(base_dir or Path.home() / ".seekeraug" / "projects")
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog = ProjectCatalog(self.base_dir)
 
     def rename_project(self, old_name, new_name):
         old_path = self.base_dir / old_name
@@ -20,22 +28,36 @@ class ProjectOps:
             raise FileNotFoundError(f"Project '{old_name}' does not exist.")
         if new_path.exists():
             raise FileExistsError(f"Project '{new_name}' already exists.")
-        os.rename(old_path, new_path)
+        # Wait for in-flight writes; later requests find the project gone
+        with project_lock(old_path).write():
+            # Pooled connections hold the database open (and block the rename on Windows)
+            close_project_db(old_path)
+            os.rename(old_path, new_path)
+            forget_thumbnail_cache(old_path)
         # Update project.json
         config_path = new_path / "project.json"
         if config_path.exists():
-            with open(config_path, "r") as f:
-                config = json.load(f)
-            config["name"] = new_name
-            with open(config_path, "w") as f:
-                json.dump(config, f, indent=2)
+            with project_lock(new_path).write():
+                with open(config_path, "r") as f:
+                    config = json.load(f)
+                config["name"] = new_name
+                write_json_atomic(config_path, config)
+        self.catalog.remove(old_name)
+        self.catalog.record(new_path, dir_changed=True)
+        bump_project(old_path)
+        bump_project(new_path)
         return str(new_path)
 
     def delete_project(self, name):
         path = self.base_dir / name
         if not path.exists():
             raise FileNotFoundError(f"Project '{name}' does not exist.")
-        shutil.rmtree(path)
+        with project_lock(path).write():
+            close_project_db(path)
+            shutil.rmtree(path)
+            forget_thumbnail_cache(path)
+        self.catalog.remove(name)
+        bump_project(path)
         return True
 
     def _read_config(self, project_path):
@@ -51,22 +73,22 @@ class ProjectOps:
             return None
 
     def _write_config(self, project_path, config):
-        """Helper to write project config."""
-        config_path = project_path / "project.json"
-        with open(config_path, "w") as f:
-            json.dump(config, f, indent=2)
+        """Helper to write project config and keep the catalog entry in step."""
+        write_json_atomic(project_path / "project.json", config)
+        self.catalog.record(project_path, config)
 
     def update_last_accessed(self, name):
         """Update the last_accessed timestamp for a project."""
         project_path = self.base_dir / name
         if not project_path.exists():
             raise FileNotFoundError(f"Project '{name}' does not exist.")
-        config = self._read_config(project_path)
-        if config is None:
-            # If config doesn't exist or is invalid, create a basic one
-            config = {"name": name, "path": str(project_path)}
-        config["last_accessed"] = datetime.datetime.now().isoformat()
-        self._write_config(project_path, config)
+        with project_lock(project_path).write():
+            config = self._read_config(project_path)
+            if config is None:
+                # If config doesn't exist or is invalid, create a basic one
+                config = {"name": name, "path": str(project_path)}
+            config["last_accessed"] = datetime.datetime.now().isoformat()
+            self._write_config(project_path, config)
         return config["last_accessed"]
 
     def set_archived_status(self, name, is_archived):
@@ -74,14 +96,15 @@ class ProjectOps:
         project_path = self.base_dir / name
         if not project_path.exists():
             raise FileNotFoundError(f"Project '{name}' does not exist.")
-        config = self._read_config(project_path)
-        if config is None:
-            config = {"name": name, "path": str(project_path)}
-        config["is_archived"] = bool(is_archived)
-        # Ensure last_accessed exists if archiving/restoring
-        if "last_accessed" not in config:
-             config["last_accessed"] = datetime.datetime.now().isoformat()
-        self._write_config(project_path, config)
+        with project_lock(project_path).write():
+            config = self._read_config(project_path)
+            if config is None:
+                config = {"name": name, "path": str(project_path)}
+            config["is_archived"] = bool(is_archived)
+            # Ensure last_accessed exists if archiving/restoring
+            if "last_accessed" not in config:
+                 config["last_accessed"] = datetime.datetime.now().isoformat()
+            self._write_config(project_path, config)
         return config["is_archived"]
 
     def open_project_location(self, name):
@@ -0,0 +1,110 @@
+import json
+import threading
+from pathlib import Path
+
+from dataset.database import get_project_db
+from dataset.fileio import write_json_atomic
+from dataset.locks import project_lock
+
+RAW_METADATA_FILENAME = "raw_metadata.json"
+_LEGACY_IMPORTED_KEY = "raw_metadata_json_imported"
+# Ids bound per IN (...) query, below SQLite's variable limit on old builds
+_ID_CHUNK = 500
+
+_checked_projects = set()
+_checked_lock = threading.Lock()
+
+
+class RawMetadataStore:
+    """Per-image raw metadata kept in the project database instead of raw/raw_metadata.json.
+
+    Each image is one row holding its JSON entry, so a single-image update
+    touches one row. raw_metadata.json is still produced on demand by
+    export_json() for tools that read the file.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = Path(project_path)
+        self.raw_dir = self.project_path / "raw"
+        self.json_path = self.raw_dir / RAW_METADATA_FILENAME
+        self.db = get_project_db(self.project_path)
+        self.lock = project_lock(self.project_path)
+        self._import_legacy_json()
+
+    def put(self, conn, entry):
+        """Insert or replace an image's entry inside the caller's transaction."""
+        conn.execute(
+            "INSERT OR REPLACE INTO raw_metadata (id, data) VALUES (?, ?)",
+            (entry["id"], json.dumps(entry))
+        )
+
+    def get(self, image_id):
+        with self.lock.read(), self.db.connection() as conn:
+            row = conn.execute("SELECT data FROM raw_metadata WHERE id = ?", (image_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_field(self, conn, image_id, field, value):
+        """Update one field of an entry in place; returns False if the image has no entry."""
+        cursor = conn.execute(
+            "UPDATE raw_metadata SET data = json_set(data, ?, ?) WHERE id = ?",
+            (f"$.{field}", value, image_id)
+        )
+        return cursor.rowcount > 0
+
+    def set_field_many(self, conn, field, values):
+        """Set field on many entries, given (image_id, value) pairs, in the caller's transaction."""
+        conn.executemany(
+            "UPDATE raw_metadata SET data = json_set(data, ?, ?) WHERE id = ?",
+            ((f"$.{field}", value, image_id) for image_id, value in values)
+        )
+
+    def delete(self, conn, image_id):
+        conn.execute("DELETE FROM raw_metadata WHERE id = ?", (image_id,))
+
+    def delete_many(self, conn, image_ids):
+        conn.executemany("DELETE FROM raw_metadata WHERE id = ?", ((image_id,) for image_id in image_ids))
+
+    def existing_ids(self, conn, image_ids):
+        """Return the subset of image_ids that have an entry."""
+        found = set()
+        image_ids = list(image_ids)
+        for start in range(0, len(image_ids), _ID_CHUNK):
+            chunk = image_ids[start:start + _ID_CHUNK]
+            found.update(row[0] for row in conn.execute(
+                f"SELECT id FROM raw_metadata WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+            ))
+        return found
+
+    def all(self):
+        """Return every entry keyed by image id, in import order (the raw_metadata.json layout)."""
+        with self.lock.read(), self.db.connection() as conn:
+            rows = conn.execute("SELECT id, data FROM raw_metadata ORDER BY rowid").fetchall()
+        return {image_id: json.loads(data) for image_id, data in rows}
+
+    def export_json(self, path=None):
+        """Write the full metadata to raw_metadata.json (or path) and return the path."""
+        return write_json_atomic(Path(path or self.json_path), self.all())
+
+    def _import_legacy_json(self):
+        """Load an existing raw_metadata.json into the table once per project."""
+        key = str(self.project_path.resolve())
+        with _checked_lock:
+            if key in _checked_projects:
+                return
+            with self.db.connection() as conn:
+                done = conn.execute(
+                    "SELECT value FROM project_meta WHERE key = ?", (_LEGACY_IMPORTED_KEY,)
+                ).fetchone()
+                if not done:
+                    if self.json_path.exists():
+                        with open(self.json_path, "r") as f:
+                            legacy = json.load(f)
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO raw_metadata (id, data) VALUES (?, ?)",
+                            ((image_id, json.dumps(entry)) for image_id, entry in legacy.items())
+                        )
+                    conn.execute(
+                        "INSERT INTO project_meta (key, value) VALUES (?, ?)",
+                        (_LEGACY_IMPORTED_KEY, "1")
+                    )
+            _checked_projects.add(key)
@@ -0,0 +1,210 @@
+import sqlite3
+
+
+def _add_column(conn, table, column_def):
+    """Add a column, ignoring the error raised when it already exists.
+
+    Databases from before versioned migrations may already have some columns.
+    """
+    try:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column_def}")
+    except sqlite3.OperationalError:
+        pass  # Already exists
+
+
+def _base_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS images (
+        id TEXT PRIMARY KEY,
+        filename TEXT,
+        added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS annotations (
+        id TEXT PRIMARY KEY,
+        image_id TEXT,
+        data TEXT,
+        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(image_id) REFERENCES images(id)
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS versions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+
+def _import_history(conn):
+    _add_column(conn, "images", "original_filename TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dataset_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            action TEXT,
+            filename TEXT,
+            original_filename TEXT,
+            details TEXT
+        )
+    """)
+
+
+def _content_hash(conn):
+    _add_column(conn, "images", "content_hash TEXT")
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_images_content_hash ON images(content_hash)"
+    )
+
+
+def _cached_file_info(conn):
+    # Cached file info, filled at import and revalidated when file_mtime_ns changes
+    _add_column(conn, "images", "width INTEGER")
+    _add_column(conn, "images", "height INTEGER")
+    _add_column(conn, "images", "size_bytes INTEGER")
+    _add_column(conn, "images", "format TEXT")
+    _add_column(conn, "images", "mode TEXT")
+    _add_column(conn, "images", "file_mtime_ns INTEGER")
+
+
+def _listing_indexes(conn):
+    # Set by DatasetProcessor / the annotation handler for refined listing and filters
+    _add_column(conn, "images", "processed_filename TEXT")
+    _add_column(conn, "images", "annotation_count INTEGER DEFAULT 0")
+    # Keyset pagination indexes: every sort key is paired with id as tiebreaker
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_images_added ON images(added, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_images_filename ON images(filename, id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_images_size ON images(IFNULL(size_bytes, -1), id)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_images_format ON images(format)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_images_annotation_count ON images(annotation_count)"
+    )
+
+
+def _raw_metadata_store(conn):
+    # One JSON entry per raw image, replacing full rewrites of raw/raw_metadata.json
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS raw_metadata (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS project_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def _annotation_store(conn):
+    # Annotations move out of processed/*.json: one document row per image and
+    # one annotations row per annotation object, with an R-tree over their boxes
+    _add_column(conn, "annotations", "label TEXT")
+    _add_column(conn, "annotations", "type TEXT")
+    _add_column(conn, "annotations", "position INTEGER")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_annotations_image ON annotations(image_id, position)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_annotations_label ON annotations(label)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS annotation_documents (
+            image_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS annotation_boxes
+        USING rtree(id, min_x, max_x, min_y, max_y)
+    """)
+
+
+def _version_runs(conn):
+    # versions rows describe a directory under versions/ and how it was made
+    _add_column(conn, "versions", "kind TEXT")
+    _add_column(conn, "versions", "path TEXT")
+    _add_column(conn, "versions", "params TEXT")
+    _add_column(conn, "versions", "status TEXT")
+    _add_column(conn, "versions", "image_count INTEGER DEFAULT 0")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_versions_name ON versions(name)")
+
+
+def _version_snapshots(conn):
+    # Snapshot index: one row per image per version. Files are identified by
+    # inode/size/mtime (snapshots hardlink them) and documents by the hash of
+    # their content in version_blobs, which stores each distinct one once.
+    _add_column(conn, "versions", "parent_id INTEGER")
+    _add_column(conn, "versions", "message TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS version_files (
+            version_id INTEGER NOT NULL,
+            image_id TEXT NOT NULL,
+            filename TEXT,
+            file_key TEXT,
+            annotation_hash TEXT,
+            metadata_hash TEXT,
+            PRIMARY KEY (version_id, image_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS version_blobs (
+            hash TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+
+def _history_log(conn):
+    # Paginated, filterable history: batch_id groups the rows one import or
+    # batch operation wrote, and item_count > 1 marks a compacted summary row
+    _add_column(conn, "dataset_history", "batch_id TEXT")
+    _add_column(conn, "dataset_history", "item_count INTEGER NOT NULL DEFAULT 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON dataset_history(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_action ON dataset_history(action, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_filename ON dataset_history(filename)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_history_original_filename "
+        "ON dataset_history(original_filename)"
+    )
+
+
+# Ordered schema migrations; a database at PRAGMA user_version N has had the
+# first N applied. Append new steps, never edit or reorder shipped ones.
+MIGRATIONS = [
+    _base_tables,
+    _import_history,
+    _content_hash,
+    _cached_file_info,
+    _listing_indexes,
+    _raw_metadata_store,
+    _annotation_store,
+    _version_runs,
+    _version_snapshots,
+    _history_log,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """Apply pending migrations, each in its own transaction, and bump user_version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-check under the write lock in case another process migrated first
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return SCHEMA_VERSION
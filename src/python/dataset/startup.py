@@ -0,0 +1,78 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from dataset.metrics import stage
+
+
+class StartupTracker:
+    """Times the backend's startup phases and tracks its warm-up.
+
+    The server answers requests as soon as it is listening; heavy imports
+    (Pillow, NumPy) and resuming interrupted jobs happen afterwards in a
+    background warm-up, and /ready reports when that has finished.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # phase -> seconds, in the order they ran
+        self.state = "starting"
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block as startup phase name (also recorded as stage startup.<name>)."""
+        start = time.perf_counter()
+        try:
+            with stage(f"startup.{name}"):
+                yield
+        finally:
+            with self._lock:
+                self.phases[name] = time.perf_counter() - start
+
+    def warm_up(self, steps, on_ready=None):
+        """Run [(phase, callable)] in a daemon thread, then mark the backend ready.
+
+        A failing step is recorded in errors but does not block readiness;
+        whatever it would have loaded is loaded on first use instead.
+        on_ready(status) is called once every step has run.
+        """
+        def run():
+            self.state = "warming"
+            for name, step in steps:
+                try:
+                    with self.phase(name):
+                        step()
+                except Exception as e:
+                    self.errors[name] = str(e)
+            self.state = "ready"
+            self._ready.set()
+            if on_ready:
+                on_ready(self.status())
+
+        thread = threading.Thread(target=run, name="startup-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def status(self):
+        with self._lock:
+            phases = dict(self.phases)
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "uptime_seconds": round(time.perf_counter() - self.started, 3),
+            "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in phases.items()},
+            "errors": dict(self.errors),
+        }
+
+
+STARTUP = StartupTracker()
@@ -0,0 +1,186 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dataset.database import get_project_db
+from dataset.fileio import raw_image_path
+from dataset.metrics import stage
+from dataset.tiles import PYRAMID_FILENAME, pyramid_dir
+
+# Thumbnails are only generated at these edge lengths; requests snap up to the
+# nearest tier so the cache holds a handful of variants per image at most.
+THUMBNAIL_TIERS = (128, 256, 512)
+THUMBNAIL_QUALITY = 85
+DEFAULT_BUDGET_MB = 512
+
+_executor = None
+_executor_lock = threading.Lock()
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _get_executor():
+    """Shared pool for thumbnail generation; Pillow releases the GIL while decoding."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1),
+                thread_name_prefix="thumbnail"
+            )
+        return _executor
+
+
+def snap_to_tier(size):
+    """Return the smallest tier that is at least size (or the largest tier)."""
+    for tier in THUMBNAIL_TIERS:
+        if size <= tier:
+            return tier
+    return THUMBNAIL_TIERS[-1]
+
+
+def get_thumbnail_cache(project_path):
+    """Return the process-wide ThumbnailCache for a project."""
+    key = str(Path(project_path).resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ThumbnailCache(project_path)
+        return cache
+
+
+def forget_thumbnail_cache(project_path):
+    """Drop the cached instance for a project that was renamed or deleted."""
+    with _caches_lock:
+        _caches.pop(str(Path(project_path).resolve()), None)
+
+
+class ThumbnailCache:
+    """On-disk thumbnail cache under the project's temp/ with LRU eviction by byte budget."""
+
+    def __init__(self, project_path, budget_bytes=None):
+        self.project_path = Path(project_path)
+        self.raw_dir = self.project_path / "raw"
+        self.cache_dir = self.project_path / "temp" / "thumbnails"
+        if budget_bytes is None:
+            budget_mb = int(os.environ.get("SEEKERAUG_THUMBNAIL_BUDGET_MB", DEFAULT_BUDGET_MB))
+            budget_bytes = budget_mb * 1024 * 1024
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = None  # OrderedDict of cache path -> size, least recent first
+        self._total_bytes = 0
+        self._pending = {}
+
+    def path_for(self, image_id, tier):
+        return self.cache_dir / str(tier) / f"{image_id}.jpg"
+
+    def get(self, image_id, size, timeout=None):
+        """Return the thumbnail path, generating it in the background pool if needed.
+
+        Raises concurrent.futures.TimeoutError if generation takes longer than
+        timeout; the thumbnail keeps generating and a later call will find it.
+        """
+        tier = snap_to_tier(size)
+        path = self.path_for(image_id, tier)
+        with self._lock:
+            self._load_index()
+            if path in self._entries and path.exists():
+                self._entries.move_to_end(path)
+                os.utime(path)  # Persist recency across restarts
+                return path
+        return self.request(image_id, tier).result(timeout)
+
+    def request(self, image_id, size):
+        """Queue generation of a thumbnail, returning a Future for its path."""
+        tier = snap_to_tier(size)
+        path = self.path_for(image_id, tier)
+        with self._lock:
+            future = self._pending.get(path)
+            if future is None:
+                future = _get_executor().submit(self._generate, image_id, tier, path)
+                self._pending[path] = future
+            return future
+
+    def invalidate(self, image_id):
+        """Remove every tier of an image's thumbnail."""
+        with self._lock:
+            self._load_index()
+            for tier in THUMBNAIL_TIERS:
+                path = self.path_for(image_id, tier)
+                self._total_bytes -= self._entries.pop(path, 0)
+                if path.exists():
+                    os.remove(path)
+
+    @stage("thumbnail.generate")
+    def _generate(self, image_id, tier, path):
+        try:
+            source = self._source_path(image_id)
+            from PIL import Image
+            with Image.open(source) as img:
+                # JPEG can decode straight at a reduced scale
+                img.draft("RGB", (tier, tier))
+                if img.mode not in ("RGB", "RGBA", "L"):
+                    img = img.convert("RGB")
+                img.thumbnail((tier, tier), reducing_gap=2.0)
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.tmp")
+                img.save(tmp_path, "JPEG", quality=THUMBNAIL_QUALITY)
+                os.replace(tmp_path, path)
+            size = path.stat().st_size
+            with self._lock:
+                self._load_index()
+                self._total_bytes += size - self._entries.pop(path, 0)
+                self._entries[path] = size
+                self._evict_locked()
+            return path
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def _source_path(self, image_id):
+        # Tiled images are too large to decode; their processed preview stands in
+        if (pyramid_dir(self.project_path, image_id) / PYRAMID_FILENAME).exists():
+            preview = self.project_path / "processed" / f"{image_id}.jpg"
+            if preview.exists():
+                return preview
+        with get_project_db(self.project_path).connection() as conn:
+            row = conn.execute(
+                "SELECT filename, original_filename FROM images WHERE id = ?", (image_id,)
+            ).fetchone()
+        if not row:
+            raise FileNotFoundError(f"Image id {image_id} not found.")
+        source = raw_image_path(self.raw_dir, image_id, *row)
+        if not source.exists():
+            raise FileNotFoundError(f"Image file for id {image_id} not found.")
+        return source
+
+    def _load_index(self):
+        """Build the LRU index from disk on first use, oldest mtime first."""
+        if self._entries is not None:
+            return
+        found = []
+        if self.cache_dir.exists():
+            for tier_dir in self.cache_dir.iterdir():
+                if not tier_dir.is_dir():
+                    continue
+                for entry in os.scandir(tier_dir):
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        found.append((stat.st_mtime_ns, Path(entry.path), stat.st_size))
+        found.sort(key=lambda item: item[0])
+        self._entries = OrderedDict((path, size) for _, path, size in found)
+        self._total_bytes = sum(self._entries.values())
+        self._evict_locked()
+
+    def _evict_locked(self):
+        while self._total_bytes > self.budget_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,440 @@
+import io
+import json
+import math
+import os
+import shutil
+import struct
+from pathlib import Path
+
+# NumPy and Pillow are imported where they are used: api.py imports this
+# module at startup, and the backend should start without loading either.
+from dataset.fileio import write_json_atomic
+
+TILE_SIZE = 256
+TILE_QUALITY = 90
+TILES_DIRNAME = "tiles"
+PYRAMID_FILENAME = "pyramid.json"
+# The processed JPG of a tiled image is the first pyramid level that fits this edge
+PREVIEW_MAX_EDGE = 2048
+# TIFFs with more pixels than this are processed tile by tile
+TILED_THRESHOLD_PIXELS = int(os.environ.get("SEEKERAUG_TILED_THRESHOLD_MP", 64)) * 1_000_000
+# Uncompressed strips are read this many rows at a time
+BAND_ROWS = TILE_SIZE
+# A compressed strip or tile must decode to at most this many bytes
+MAX_CHUNK_BYTES = 256 * 1024 * 1024
+# Largest region the viewer can request in one call, per side
+MAX_REGION_EDGE = 4096
+
+# Strip/tile layout tags: long offset arrays that mean nothing once decoded
+_LAYOUT_TAGS = {273, 279, 324, 325, 347}
+_SHORT, _LONG, _UNDEFINED = 3, 4, 7
+_TYPE_FORMATS = {_SHORT: "H", _LONG: "L", _UNDEFINED: "B"}
+
+
+def tiff_tag_dict(tags):
+    """Name TIFF tags and make their values JSON-serializable for metadata.json."""
+    from PIL import TiffTags
+    result = {}
+    for tag, value in tags.items():
+        if tag in _LAYOUT_TAGS:
+            continue
+        name = TiffTags.lookup(tag).name
+        result[str(tag) if name == "unknown" else name] = _json_safe(value)
+    return result
+
+
+def _json_safe(value):
+    from PIL import TiffImagePlugin
+    if isinstance(value, TiffImagePlugin.IFDRational):
+        return None if value.denominator == 0 else float(value)
+    if isinstance(value, bytes):
+        try:
+            return value.decode("ascii").rstrip("\x00")
+        except UnicodeDecodeError:
+            return value.hex()
+    if isinstance(value, (tuple, list)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def pyramid_dir(project_path, image_id):
+    return Path(project_path) / "processed" / TILES_DIRNAME / image_id
+
+
+def open_tiff(path):
+    """Parse a TIFF's header and tags without Pillow's decompression bomb check."""
+    from PIL import TiffImagePlugin
+    return TiffImagePlugin.TiffImageFile(path)
+
+
+def needs_tiling(path):
+    """True if path is a TIFF too large to decode in one piece."""
+    with open_tiff(path) as tiff:
+        return tiff.width * tiff.height > TILED_THRESHOLD_PIXELS
+
+
+class TiffBandReader:
+    """Reads a TIFF top to bottom as horizontal bands of 8-bit RGB rows.
+
+    Each strip (or row of tiles) is read from disk on its own and decoded by
+    wrapping it in a single-strip TIFF in memory, so libtiff handles every
+    compression Pillow supports while only one chunk is ever decoded at a
+    time. Uncompressed strips are split further into BAND_ROWS slices.
+    Single-band images deeper than 8 bits (SAR amplitude, DEMs) are scaled
+    linearly from their min/max, which takes an extra pass.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open_tiff(self.path) as tiff:
+            tags = tiff.tag_v2
+            self.mode = tiff.mode
+            self.tag_dict = tiff_tag_dict(tags)
+            self.width, self.height = tiff.size
+            self.endian = tags._endian
+            self.compression = tags.get(259, 1)
+            self.samples = tags.get(277, 1)
+            if tags.get(284, 1) != 1:
+                raise ValueError("Planar TIFFs are not supported for tiled processing")
+            self.bits = tuple(tags.get(258, (1,)))
+            self.tags = {tag: tags.get(tag) for tag in (262, 317, 320, 338, 339, 347, 530)
+                         if tags.get(tag) is not None}
+            if 322 in tags:
+                self.chunk_width, self.chunk_height = tags[322], tags[323]
+                offsets, counts = tags[324], tags[325]
+            else:
+                self.chunk_width = self.width
+                self.chunk_height = min(tags.get(278, self.height), self.height)
+                offsets, counts = tags[273], tags[279]
+            self.offsets, self.counts = tuple(offsets), tuple(counts)
+        self.tiled = self.chunk_width != self.width
+        sample_format = self.tags.get(339, (1,))
+        self.high_bit = self.samples == 1 and (self.bits[0] > 8 or sample_format[0] == 3)
+        row_bytes = math.ceil(self.chunk_width * self.samples * sum(self.bits) / len(self.bits) / 8)
+        self.row_bytes = row_bytes
+        if self.compression != 1 and row_bytes * self.chunk_height > MAX_CHUNK_BYTES:
+            raise ValueError("TIFF strips are too large for tiled processing")
+        self._range = None
+
+    def bands(self):
+        """Yield (top, rows) with rows an (n, width, 3) uint8 array."""
+        if self.high_bit and self._range is None:
+            self._range = self._value_range()
+        for top, rows in self._raw_bands():
+            yield top, self._to_rgb(rows)
+
+    def _raw_bands(self):
+        import numpy as np
+        with open(self.path, "rb") as f:
+            if self.tiled:
+                across = math.ceil(self.width / self.chunk_width)
+                for ty in range(math.ceil(self.height / self.chunk_height)):
+                    top = ty * self.chunk_height
+                    rows = min(self.chunk_height, self.height - top)
+                    band = None
+                    for tx in range(across):
+                        index = ty * across + tx
+                        tile = self._decode(f, self.offsets[index], self.counts[index],
+                                            self.chunk_width, self.chunk_height)
+                        left = tx * self.chunk_width
+                        tile = tile[:rows, :self.width - left]
+                        if band is None:
+                            band = np.empty((rows, self.width) + tile.shape[2:], tile.dtype)
+                        band[:, left:left + tile.shape[1]] = tile
+                    yield top, band
+                return
+            for index, (offset, count) in enumerate(zip(self.offsets, self.counts)):
+                top = index * self.chunk_height
+                rows = min(self.chunk_height, self.height - top)
+                if self.compression != 1:
+                    yield top, self._decode(f, offset, count, self.width, rows)
+                    continue
+                for start in range(0, rows, BAND_ROWS):
+                    n = min(BAND_ROWS, rows - start)
+                    yield top + start, self._decode(
+                        f, offset + start * self.row_bytes, n * self.row_bytes, self.width, n
+                    )
+
+    def _decode(self, f, offset, count, width, height):
+        import numpy as np
+        from PIL import Image
+        f.seek(offset)
+        data = f.read(count)
+        with Image.open(io.BytesIO(self._single_strip_tiff(data, width, height))) as img:
+            if self.high_bit:
+                return np.asarray(img)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            return np.asarray(img)
+
+    def _single_strip_tiff(self, data, width, height):
+        """A minimal TIFF with the source's encoding whose only strip is data."""
+        entries = [
+            (256, _LONG, [width]),
+            (257, _LONG, [height]),
+            (258, _SHORT, list(self.bits)),
+            (259, _SHORT, [self.compression]),
+            (273, _LONG, [0]),  # Patched below once the layout is known
+            (277, _SHORT, [self.samples]),
+            (278, _LONG, [height]),
+            (279, _LONG, [len(data)]),
+            (284, _SHORT, [1]),
+        ]
+        for tag, value in self.tags.items():
+            if tag == 347:
+                entries.append((tag, _UNDEFINED, list(value)))
+            else:
+                entries.append((tag, _SHORT, list(value) if isinstance(value, tuple) else [value]))
+        entries.sort()
+        e = self.endian
+        ifd_size = 2 + 12 * len(entries) + 4
+        extra = bytearray()
+        extra_start = 8 + ifd_size
+        packed = []
+        for tag, kind, values in entries:
+            payload = struct.pack(f"{e}{len(values)}{_TYPE_FORMATS[kind]}", *values)
+            packed.append((tag, kind, len(values), payload))
+            if len(payload) > 4:
+                extra += payload + b"\x00" * (len(payload) % 2)
+        strip_offset = extra_start + len(extra)
+        out = bytearray(b"II" if e == "<" else b"MM")
+        out += struct.pack(f"{e}HL", 42, 8)
+        out += struct.pack(f"{e}H", len(entries))
+        cursor = extra_start
+        for tag, kind, count, payload in packed:
+            if tag == 273:
+                payload = struct.pack(f"{e}L", strip_offset)
+            if len(payload) > 4:
+                out += struct.pack(f"{e}HHLL", tag, kind, count, cursor)
+                cursor += len(payload) + len(payload) % 2
+            else:
+                out += struct.pack(f"{e}HHL", tag, kind, count) + payload.ljust(4, b"\x00")
+        out += struct.pack(f"{e}L", 0)
+        out += extra
+        out += data
+        return bytes(out)
+
+    def _value_range(self):
+        import numpy as np
+        low, high = math.inf, -math.inf
+        for _, rows in self._raw_bands():
+            finite = rows[np.isfinite(rows)] if rows.dtype.kind == "f" else rows
+            if finite.size:
+                low, high = min(low, float(finite.min())), max(high, float(finite.max()))
+        return (low, high) if low <= high else (0.0, 1.0)
+
+    def _to_rgb(self, rows):
+        if not self.high_bit:
+            return rows
+        import numpy as np
+        low, high = self._range
+        scaled = (rows.astype(np.float32) - low) * (255.0 / max(high - low, 1e-12))
+        gray = np.nan_to_num(scaled, nan=0.0).clip(0, 255).astype(np.uint8)
+        return np.repeat(gray[:, :, None], 3, axis=2)
+
+
+def _downsample(rows):
+    """Halve an (h, w, 3) uint8 array by averaging 2x2 blocks, padding odd edges."""
+    import numpy as np
+    h, w = rows.shape[:2]
+    if h % 2 or w % 2:
+        rows = np.pad(rows, ((0, h % 2), (0, w % 2), (0, 0)), mode="edge")
+    total = (rows[0::2, 0::2].astype(np.uint16) + rows[1::2, 0::2] + rows[0::2, 1::2] + rows[1::2, 1::2])
+    return ((total + 2) >> 2).astype(np.uint8)
+
+
+def _level_sizes(width, height, tile_size):
+    sizes = [(width, height)]
+    while max(sizes[-1]) > tile_size:
+        w, h = sizes[-1]
+        sizes.append(((w + 1) // 2, (h + 1) // 2))
+    return sizes
+
+
+class _LevelWriter:
+    """Buffers one tile row of a pyramid level, writes its tiles and feeds the next level."""
+
+    def __init__(self, out_dir, level, width, tile_size, next_level=None, keep=False):
+        import numpy as np
+        self.dir = out_dir / str(level)
+        self.dir.mkdir(parents=True)
+        self.tile_size = tile_size
+        self.next_level = next_level
+        self.buffer = np.empty((tile_size, width, 3), np.uint8)
+        self.filled = 0
+        self.row = 0
+        # The preview level keeps all its rows; it is at most PREVIEW_MAX_EDGE square
+        self.kept = [] if keep else None
+
+    def push(self, rows):
+        while len(rows):
+            take = min(self.tile_size - self.filled, len(rows))
+            self.buffer[self.filled:self.filled + take] = rows[:take]
+            self.filled += take
+            rows = rows[take:]
+            if self.filled == self.tile_size:
+                self._flush()
+
+    def close(self):
+        if self.filled:
+            self._flush()
+        if self.next_level is not None:
+            self.next_level.close()
+
+    def _flush(self):
+        from PIL import Image
+        band = self.buffer[:self.filled]
+        for x in range(0, band.shape[1], self.tile_size):
+            Image.fromarray(band[:, x:x + self.tile_size]).save(
+                self.dir / f"{x // self.tile_size}_{self.row}.jpg", "JPEG", quality=TILE_QUALITY
+            )
+        if self.kept is not None:
+            self.kept.append(band.copy())
+        if self.next_level is not None:
+            self.next_level.push(_downsample(band))
+        self.row += 1
+        self.filled = 0
+
+
+def build_pyramid(source, out_dir, tile_size=TILE_SIZE, should_stop=None):
+    """Write a tile pyramid of a large TIFF to out_dir and return (info, preview image).
+
+    Level 0 is full resolution and each level halves the previous one until
+    the whole image fits in a tile. Tiles are level/x_y.jpg. Memory use is a
+    tile row per level (about two tile rows of the full-resolution width)
+    plus one decoded strip, independent of the image height.
+    """
+    import numpy as np
+    from PIL import Image
+    reader = TiffBandReader(source)
+    sizes = _level_sizes(reader.width, reader.height, tile_size)
+    preview_level = next(
+        level for level, size in enumerate(sizes) if max(size) <= PREVIEW_MAX_EDGE
+    )
+    out_dir = Path(out_dir)
+    writers = []
+    next_level = None
+    for level in reversed(range(len(sizes))):
+        next_level = _LevelWriter(out_dir, level, sizes[level][0], tile_size, next_level,
+                                  keep=level == preview_level)
+        writers.append(next_level)
+    top = next_level
+    preview_writer = writers[len(sizes) - 1 - preview_level]
+    for _, rows in reader.bands():
+        if should_stop and should_stop():
+            raise InterruptedError("Tiling was stopped")
+        top.push(rows)
+    top.close()
+    info = {
+        "width": reader.width,
+        "height": reader.height,
+        "tile_size": tile_size,
+        "format": "jpg",
+        "preview_level": preview_level,
+        "levels": [
+            {"level": level, "width": w, "height": h,
+             "columns": math.ceil(w / tile_size), "rows": math.ceil(h / tile_size)}
+            for level, (w, h) in enumerate(sizes)
+        ],
+        "mode": reader.mode,
+        "tiff_tags": reader.tag_dict,
+    }
+    write_json_atomic(out_dir / PYRAMID_FILENAME, info)
+    preview = Image.fromarray(np.concatenate(preview_writer.kept))
+    return info, preview
+
+
+def process_large_tiff(file, processed_dir):
+    """Tile a large TIFF into processed/tiles/<stem> and write its preview JPG.
+
+    Returns (jpg name, metadata). The pyramid is built in a hidden directory
+    and swapped in afterwards, so a failed run leaves the previous one intact.
+    """
+    processed_dir = Path(processed_dir)
+    jpg_name = f"{file.stem}.jpg"
+    tiles_root = processed_dir / TILES_DIRNAME
+    final_dir = tiles_root / file.stem
+    build_dir = tiles_root / f".{file.stem}.tmp"
+    if build_dir.exists():
+        shutil.rmtree(build_dir)
+    try:
+        info, preview = build_pyramid(file, build_dir)
+        tmp_path = processed_dir / f".{jpg_name}.tmp"
+        preview.save(tmp_path, "JPEG", quality=95)
+        if final_dir.exists():
+            shutil.rmtree(final_dir)
+        os.replace(build_dir, final_dir)
+        os.replace(tmp_path, processed_dir / jpg_name)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    meta = {
+        "original_filename": file.name,
+        "processed_filename": jpg_name,
+        # Annotations are drawn on the preview, so these are its dimensions
+        "width": preview.width,
+        "height": preview.height,
+        "format": "TIFF",
+        "mode": info["mode"],
+        "size_bytes": file.stat().st_size,
+        "tiff_tags": info["tiff_tags"],
+        "tiled": {
+            "path": f"{TILES_DIRNAME}/{file.stem}",
+            "width": info["width"],
+            "height": info["height"],
+            "tile_size": info["tile_size"],
+            "levels": len(info["levels"]),
+            "preview_level": info["preview_level"],
+        },
+    }
+    return jpg_name, meta
+
+
+class TilePyramid:
+    """Read access to an image's tile pyramid for the viewer."""
+
+    def __init__(self, project_path, image_id):
+        if not image_id or Path(image_id).name != image_id or image_id.startswith("."):
+            raise ValueError(f"Invalid image id '{image_id}'")
+        self.dir = pyramid_dir(project_path, image_id)
+        info_path = self.dir / PYRAMID_FILENAME
+        if not info_path.exists():
+            raise FileNotFoundError(f"Image {image_id} has no tile pyramid.")
+        with open(info_path, "r") as f:
+            self.info = json.load(f)
+        self.tile_size = self.info["tile_size"]
+
+    def tile_path(self, level, x, y):
+        self._level(level)
+        path = self.dir / str(level) / f"{x}_{y}.jpg"
+        if not path.exists():
+            raise FileNotFoundError(f"Tile {level}/{x}_{y} does not exist.")
+        return path
+
+    def region(self, level, left, top, width, height):
+        """Compose the region (in level pixels) from the tiles that cover it."""
+        from PIL import Image
+        size = self._level(level)
+        if width <= 0 or height <= 0 or width > MAX_REGION_EDGE or height > MAX_REGION_EDGE:
+            raise ValueError(f"Region sides must be between 1 and {MAX_REGION_EDGE}")
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(size["width"], left + width), min(size["height"], top + height)
+        if right <= left or bottom <= top:
+            raise ValueError("Region lies outside the image")
+        canvas = Image.new("RGB", (right - left, bottom - top))
+        t = self.tile_size
+        for y in range(top // t, (bottom - 1) // t + 1):
+            for x in range(left // t, (right - 1) // t + 1):
+                with Image.open(self.dir / str(level) / f"{x}_{y}.jpg") as tile:
+                    canvas.paste(tile, (x * t - left, y * t - top))
+        return canvas
+
+    def _level(self, level):
+        levels = self.info["levels"]
+        if not 0 <= level < len(levels):
+            raise ValueError(f"Level must be between 0 and {len(levels) - 1}")
+        return levels[level]
@@ -0,0 +1,300 @@
+"""Local binary transport for pixel data, thumbnails, tiles and progress.
+
+HTTP with JSON bodies is fine for control requests, but a viewer pulling
+hundreds of tiles per second pays for a request parse, headers and a new
+response object per tile. This is a second, local-only channel: a Unix
+domain socket (loopback TCP with a token where AF_UNIX is unavailable)
+carrying length-prefixed frames.
+
+Every frame, in both directions, is
+
+    !IQ  header length, payload length
+    header   UTF-8 JSON object
+    payload  raw bytes (may be empty)
+
+Requests are a header {"id": ..., "op": ..., ...params} with no payload.
+Each request gets one or more response frames echoing its "id"; all but
+the last carry "more": true, so streamed responses (tile batches, job
+progress) need no separate terminator. Failures are frames with "error"
+and an HTTP-like "status" (400, 401, 404, 500). A client may pipeline
+requests; each connection answers them in order, so a long-running stream
+such as job_progress belongs on a connection of its own.
+
+File payloads (tiles, thumbnails) go out with sendfile() and decoded pixels
+are sent straight from the image's buffer with scatter/gather writes, so
+payloads are never copied into a frame buffer.
+"""
+import json
+import os
+import secrets
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
+FRAME = struct.Struct("!IQ")
+MAX_HEADER_BYTES = 1024 * 1024
+# Requests never carry large payloads; anything bigger is a protocol error
+MAX_REQUEST_PAYLOAD_BYTES = 16 * 1024 * 1024
+# Unix socket paths are limited to about 100 bytes (104 on macOS)
+_MAX_SOCKET_PATH = 100
+
+
+class TransportError(Exception):
+    """Raised on a malformed frame or a closed connection."""
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if not n:
+            raise TransportError("Connection closed")
+        received += n
+    return buffer
+
+
+def read_frame(sock, max_payload=None):
+    """Read one frame; returns (header dict, payload bytearray)."""
+    header_length, payload_length = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    if header_length > MAX_HEADER_BYTES:
+        raise TransportError(f"Frame header of {header_length} bytes is too large")
+    if max_payload is not None and payload_length > max_payload:
+        raise TransportError(f"Frame payload of {payload_length} bytes is too large")
+    try:
+        header = json.loads(_recv_exact(sock, header_length))
+    except ValueError:
+        raise TransportError("Frame header is not JSON")
+    if not isinstance(header, dict):
+        raise TransportError("Frame header must be a JSON object")
+    payload = _recv_exact(sock, payload_length) if payload_length else bytearray()
+    return header, payload
+
+
+def _send_buffers(sock, buffers):
+    """Write all buffers with as few system calls as possible, without joining them."""
+    buffers = [view.cast("B") for view in map(memoryview, buffers) if view.nbytes]
+    if not hasattr(sock, "sendmsg"):  # Windows
+        for buffer in buffers:
+            sock.sendall(buffer)
+        return
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        while sent:
+            if sent >= len(buffers[0]):
+                sent -= len(buffers.pop(0))
+            else:
+                buffers[0] = buffers[0][sent:]
+                sent = 0
+
+
+def write_frame(sock, header, payload=b""):
+    """Send a frame; payload is any buffer (bytes, memoryview, array) and is not copied."""
+    header_bytes = json.dumps(header).encode("utf-8")
+    payload_length = memoryview(payload).nbytes
+    _send_buffers(sock, [FRAME.pack(len(header_bytes), payload_length), header_bytes, payload])
+
+
+def write_file_frame(sock, header, path):
+    """Send a frame whose payload is the content of path, via sendfile() where supported."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        header_bytes = json.dumps(header).encode("utf-8")
+        _send_buffers(sock, [FRAME.pack(len(header_bytes), size), header_bytes])
+        sock.sendfile(f, 0, size)
+
+
+class Reply:
+    """Sends the response frames of one request, tagging them with its id."""
+
+    def __init__(self, sock, request_id):
+        self.sock = sock
+        self.request_id = request_id
+        self.frames = 0
+
+    def send(self, header=None, payload=b"", more=False):
+        write_frame(self.sock, self._header(header, more), payload)
+
+    def send_file(self, path, header=None, more=False):
+        write_file_frame(self.sock, self._header(header, more), path)
+
+    def error(self, status, message, more=False, **fields):
+        self.send({"error": message, "status": status, **fields}, more=more)
+
+    def _header(self, header, more):
+        self.frames += 1
+        result = {"id": self.request_id, **(header or {})}
+        if more:
+            result["more"] = True
+        return result
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server.transport
+        authenticated = server.token is None
+        sock = self.request
+        while True:
+            try:
+                request, _ = read_frame(sock, MAX_REQUEST_PAYLOAD_BYTES)
+            except (TransportError, OSError):
+                return
+            reply = Reply(sock, request.get("id"))
+            op = request.get("op")
+            try:
+                if op == "hello":
+                    if server.token is not None and not secrets.compare_digest(
+                            str(request.get("token", "")), server.token):
+                        reply.error(401, "Invalid token")
+                        return
+                    authenticated = True
+                    reply.send({"ops": sorted(server.handlers)})
+                    continue
+                if not authenticated:
+                    reply.error(401, "Send hello with the token first")
+                    return
+                handler = server.handlers.get(op)
+                if handler is None:
+                    reply.error(400, f"Unknown op '{op}'")
+                    continue
+                handler(request, reply)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                status = 400 if isinstance(e, ValueError) else 404 if isinstance(e, FileNotFoundError) else 500
+                try:
+                    reply.error(status, str(e))
+                except OSError:
+                    return
+
+
+def default_socket_path():
+    """A per-process socket path in ~/.seekeraug/run, or the temp dir if that is too long."""
+    name = f"transport-{os.getpid()}.sock"
+    path = Path.home() / ".seekeraug" / "run" / name
+    if len(str(path)) > _MAX_SOCKET_PATH:
+        path = Path(tempfile.gettempdir()) / f"seekeraug-{name}"
+    return path
+
+
+class TransportServer:
+    """Serves registered ops over a local socket in background threads.
+
+    Ops are registered like job runners: register(op, handler), where
+    handler(request, reply) answers through reply.send(), reply.send_file()
+    and reply.error(). ValueError and FileNotFoundError raised by a handler
+    become 400 and 404 error frames.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.token = None
+        self.address = None
+        self._server = None
+        self._thread = None
+
+    def register(self, op, handler):
+        self.handlers[op] = handler
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    def start(self, path=None):
+        """Start listening and return connection info for clients.
+
+        Uses a Unix socket at path (default_socket_path()) that only this user
+        can open; where AF_UNIX is unavailable, an ephemeral loopback TCP port
+        that requires hello with the returned token.
+        """
+        if self._server is not None:
+            return self.info(include_token=True)
+        if hasattr(socket, "AF_UNIX"):
+            path = Path(path or default_socket_path())
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                path.unlink()  # Left behind by a process that was killed
+            old_umask = os.umask(0o177)
+            try:
+                self._server = socketserver.ThreadingUnixStreamServer(str(path), _Handler)
+            finally:
+                os.umask(old_umask)
+            self.address = {"family": "unix", "path": str(path)}
+        else:
+            self.token = secrets.token_hex(16)
+            self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+            host, port = self._server.server_address[:2]
+            self.address = {"family": "tcp", "host": host, "port": port}
+        self._server.daemon_threads = True
+        self._server.transport = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="binary-transport", daemon=True
+        )
+        self._thread.start()
+        return self.info(include_token=True)
+
+    def info(self, include_token=False):
+        info = {"enabled": self.running, **(self.address or {})}
+        if include_token and self.token is not None:
+            info["token"] = self.token
+        return info
+
+    def stop(self):
+        server = self._server
+        if server is None:
+            return
+        self._server = None
+        server.shutdown()
+        server.server_close()
+        if self.address and self.address["family"] == "unix":
+            try:
+                os.remove(self.address["path"])
+            except FileNotFoundError:
+                pass
+
+
+class TransportClient:
+    """Blocking client, used by the benchmarks and for scripting."""
+
+    def __init__(self, info):
+        if info["family"] == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(info["path"])
+        else:
+            self.sock = socket.create_connection((info["host"], info["port"]))
+        self._next_id = 0
+        if info.get("token"):
+            self.request("hello", token=info["token"])
+
+    def send(self, op, **params):
+        """Send a request without waiting; returns its id (for pipelining)."""
+        self._next_id += 1
+        write_frame(self.sock, {"id": self._next_id, "op": op, **params})
+        return self._next_id
+
+    def responses(self):
+        """Yield (header, payload) for the oldest outstanding request until its last frame."""
+        while True:
+            header, payload = read_frame(self.sock)
+            yield header, payload
+            if not header.get("more"):
+                return
+
+    def request(self, op, **params):
+        """Send a request and return all its (header, payload) frames."""
+        self.send(op, **params)
+        return list(self.responses())
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
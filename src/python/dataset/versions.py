@@ -0,0 +1,278 @@
+import json
+import shutil
+from pathlib import Path
+
+from dataset.annotation_store import AnnotationStore
+from dataset.database import get_project_db
+from dataset.fileio import link_or_copy
+from dataset.hashing import new_hash
+from dataset.locks import project_lock
+
+SNAPSHOT_KIND = "snapshot"
+# Images whose documents are fetched and rows inserted per round-trip
+SNAPSHOT_BATCH_SIZE = 500
+
+_VERSION_COLUMNS = "id, name, created, kind, path, params, status, image_count, parent_id, message"
+
+
+def _blob_hash(document):
+    """Hash of a document's canonical JSON; equal documents share one version_blobs row."""
+    data = json.dumps(document, sort_keys=True, separators=(",", ":"))
+    digest = new_hash()
+    digest.update(data.encode("utf-8"))
+    return digest.hexdigest(), data
+
+
+def _file_key(stat):
+    # Hardlinked files share an inode, so unchanged images keep their key across snapshots
+    return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class VersionStore:
+    """Dataset versions of a project: augmentation runs and copy-on-write snapshots.
+
+    A snapshot hardlinks every processed image into versions/<name>/images,
+    so it costs directory entries rather than disk space (the processor
+    replaces files instead of overwriting them, which keeps old links
+    intact). Annotation documents and metadata entries go into
+    version_blobs keyed by content hash, so a snapshot only adds the ones
+    that changed. version_files indexes each version's images by file
+    identity and document hashes, so diffs are joins rather than file
+    comparisons.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = Path(project_path)
+        self.processed_dir = self.project_path / "processed"
+        self.versions_dir = self.project_path / "versions"
+        self.metadata_path = self.processed_dir / "metadata.json"
+        self.db = get_project_db(self.project_path)
+        self.lock = project_lock(self.project_path)
+
+    def list(self):
+        with self.lock.read(), self.db.connection() as conn:
+            rows = conn.execute(f"SELECT {_VERSION_COLUMNS} FROM versions ORDER BY id").fetchall()
+        return [self._row_to_version(row) for row in rows]
+
+    def get(self, name):
+        with self.lock.read(), self.db.connection() as conn:
+            row = conn.execute(
+                f"SELECT {_VERSION_COLUMNS} FROM versions WHERE name = ?", (name,)
+            ).fetchone()
+        return self._row_to_version(row) if row else None
+
+    def create_snapshot(self, name, message=None):
+        """Snapshot processed images, annotations and metadata as version name.
+
+        Holds the project write lock so the snapshot is consistent; the work
+        is one hardlink and a few row inserts per image.
+        """
+        if not name or Path(name).name != name or name.startswith("."):
+            raise ValueError(f"Invalid version name '{name}'")
+        out_dir = self.versions_dir / name
+        images_dir = out_dir / "images"
+        metadata = {}
+        if self.metadata_path.exists():
+            with open(self.metadata_path, "r") as f:
+                metadata = json.load(f)
+        annotations = AnnotationStore(self.project_path)
+        created_dir = False
+        try:
+            with self.lock.write(), self.db.connection() as conn:
+                if conn.execute("SELECT 1 FROM versions WHERE name = ?", (name,)).fetchone() \
+                        or out_dir.exists():
+                    raise FileExistsError(f"Version '{name}' already exists.")
+                parent = conn.execute(
+                    "SELECT id FROM versions WHERE kind = ? AND status = 'complete' ORDER BY id DESC LIMIT 1",
+                    (SNAPSHOT_KIND,)
+                ).fetchone()
+                version_id = conn.execute(
+                    """
+                    INSERT INTO versions (name, kind, path, params, status, image_count, parent_id, message)
+                    VALUES (?, ?, ?, NULL, 'incomplete', 0, ?, ?)
+                    """,
+                    (name, SNAPSHOT_KIND, str(Path("versions") / name), parent[0] if parent else None,
+                     message)
+                ).lastrowid
+                rows = conn.execute(
+                    "SELECT id, processed_filename FROM images WHERE processed_filename IS NOT NULL ORDER BY id"
+                ).fetchall()
+                images_dir.mkdir(parents=True)
+                created_dir = True
+                copied = 0
+                for start in range(0, len(rows), SNAPSHOT_BATCH_SIZE):
+                    chunk = rows[start:start + SNAPSHOT_BATCH_SIZE]
+                    documents = annotations.get_many([image_id for image_id, _ in chunk])
+                    entries = []
+                    blobs = []
+                    for image_id, filename in chunk:
+                        source = self.processed_dir / filename
+                        try:
+                            stat = source.stat()
+                        except FileNotFoundError:
+                            continue
+                        if not link_or_copy(source, images_dir / filename):
+                            copied += 1
+                        annotation_hash = metadata_hash = None
+                        if image_id in documents:
+                            annotation_hash, data = _blob_hash(documents[image_id])
+                            blobs.append((annotation_hash, data))
+                        if filename in metadata:
+                            metadata_hash, data = _blob_hash(metadata[filename])
+                            blobs.append((metadata_hash, data))
+                        entries.append((version_id, image_id, filename, _file_key(stat),
+                                        annotation_hash, metadata_hash))
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO version_blobs (hash, data) VALUES (?, ?)", blobs
+                    )
+                    conn.executemany(
+                        """
+                        INSERT INTO version_files
+                            (version_id, image_id, filename, file_key, annotation_hash, metadata_hash)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        entries
+                    )
+                count = conn.execute(
+                    "SELECT COUNT(*) FROM version_files WHERE version_id = ?", (version_id,)
+                ).fetchone()[0]
+                conn.execute(
+                    "UPDATE versions SET status = 'complete', image_count = ?, params = ? WHERE id = ?",
+                    (count, json.dumps({"copied_files": copied}), version_id)
+                )
+                conn.execute(
+                    "INSERT INTO dataset_history (action, filename, original_filename, details) VALUES (?, ?, ?, ?)",
+                    ("snapshot", name, None, json.dumps({"version_id": version_id, "images": count}))
+                )
+                row = conn.execute(
+                    f"SELECT {_VERSION_COLUMNS} FROM versions WHERE id = ?", (version_id,)
+                ).fetchone()
+        except BaseException:
+            # The transaction rolled back; don't leave links behind for a retry to trip on
+            if created_dir:
+                shutil.rmtree(out_dir, ignore_errors=True)
+            raise
+        return self._row_to_version(row)
+
+    def diff(self, from_name, to_name, limit=1000):
+        """Compare two snapshots through version_files.
+
+        Returns counts and up to limit image ids per category: added, removed,
+        image_changed (a different file), annotations_changed and
+        metadata_changed.
+        """
+        with self.lock.read(), self.db.connection() as conn:
+            ids = []
+            for name in (from_name, to_name):
+                row = conn.execute("SELECT id, kind FROM versions WHERE name = ?", (name,)).fetchone()
+                if not row:
+                    raise FileNotFoundError(f"Version '{name}' does not exist.")
+                if row[1] != SNAPSHOT_KIND:
+                    raise ValueError(f"Version '{name}' is not a snapshot.")
+                ids.append(row[0])
+            old_id, new_id = ids
+            queries = {
+                "added": ("""
+                    SELECT b.image_id FROM version_files b
+                    LEFT JOIN version_files a ON a.version_id = ? AND a.image_id = b.image_id
+                    WHERE b.version_id = ? AND a.image_id IS NULL
+                """, (old_id, new_id)),
+                "removed": ("""
+                    SELECT a.image_id FROM version_files a
+                    LEFT JOIN version_files b ON b.version_id = ? AND b.image_id = a.image_id
+                    WHERE a.version_id = ? AND b.image_id IS NULL
+                """, (new_id, old_id)),
+            }
+            for category, column in (("image_changed", "file_key"),
+                                     ("annotations_changed", "annotation_hash"),
+                                     ("metadata_changed", "metadata_hash")):
+                queries[category] = (f"""
+                    SELECT a.image_id FROM version_files a
+                    JOIN version_files b ON b.version_id = ? AND b.image_id = a.image_id
+                    WHERE a.version_id = ? AND a.{column} IS NOT b.{column}
+                """, (new_id, old_id))
+            result = {"from": from_name, "to": to_name, "counts": {}}
+            for category, (sql, params) in queries.items():
+                result["counts"][category] = conn.execute(
+                    f"SELECT COUNT(*) FROM ({sql})", params
+                ).fetchone()[0]
+                result[category] = [
+                    row[0] for row in conn.execute(f"{sql} ORDER BY 1 LIMIT ?", params + (int(limit),))
+                ]
+        return result
+
+    def iter_snapshot(self, name, batch_size=SNAPSHOT_BATCH_SIZE):
+        """Yield (image_id, image path, annotation document, metadata entry) for a snapshot.
+
+        Rows and documents are fetched batch_size at a time, so callers can
+        stream a snapshot of any size.
+        """
+        version = self.get(name)
+        if version is None:
+            raise FileNotFoundError(f"Version '{name}' does not exist.")
+        if version["kind"] != SNAPSHOT_KIND:
+            raise ValueError(f"Version '{name}' is not a snapshot.")
+        images_dir = self.project_path / version["path"] / "images"
+        last_id = ""
+        while True:
+            with self.lock.read(), self.db.connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT f.image_id, f.filename, ann.data, meta.data
+                    FROM version_files f
+                    LEFT JOIN version_blobs ann ON ann.hash = f.annotation_hash
+                    LEFT JOIN version_blobs meta ON meta.hash = f.metadata_hash
+                    WHERE f.version_id = ? AND f.image_id > ?
+                    ORDER BY f.image_id LIMIT ?
+                    """,
+                    (version["id"], last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for image_id, filename, annotation, meta in rows:
+                yield (image_id, images_dir / filename,
+                       json.loads(annotation) if annotation else None,
+                       json.loads(meta) if meta else None)
+            last_id = rows[-1][0]
+
+    def delete(self, name):
+        """Delete a version's directory and index rows, and blobs no other version uses."""
+        with self.lock.write(), self.db.connection() as conn:
+            row = conn.execute("SELECT id, path FROM versions WHERE name = ?", (name,)).fetchone()
+            if not row:
+                raise FileNotFoundError(f"Version '{name}' does not exist.")
+            version_id, path = row
+            conn.execute("DELETE FROM version_files WHERE version_id = ?", (version_id,))
+            conn.execute("UPDATE versions SET parent_id = NULL WHERE parent_id = ?", (version_id,))
+            conn.execute("DELETE FROM versions WHERE id = ?", (version_id,))
+            conn.execute("""
+                DELETE FROM version_blobs WHERE hash NOT IN (
+                    SELECT annotation_hash FROM version_files WHERE annotation_hash IS NOT NULL
+                    UNION
+                    SELECT metadata_hash FROM version_files WHERE metadata_hash IS NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT INTO dataset_history (action, filename, original_filename, details) VALUES (?, ?, ?, ?)",
+                ("delete_version", name, None, json.dumps({"version_id": version_id}))
+            )
+        version_dir = self.project_path / (path or Path("versions") / name)
+        if version_dir.exists():
+            shutil.rmtree(version_dir)
+        return True
+
+    def _row_to_version(self, row):
+        (version_id, name, created, kind, path, params, status, image_count,
+         parent_id, message) = row
+        return {
+            "id": version_id,
+            "name": name,
+            "created": created,
+            "kind": kind,
+            "path": path,
+            "params": json.loads(params) if params else None,
+            "status": status,
+            "image_count": image_count,
+            "parent_id": parent_id,
+            "message": message,
+        }
@@ -0,0 +1,109 @@
+"""Production entry point for the SeekerAug backend.
+
+`python api.py` runs Flask's debug server for development. The Electron app
+launches this module instead: it serves the same app from a multi-threaded
+WSGI server (waitress when installed, otherwise Werkzeug's threaded server)
+and shuts down gracefully on SIGTERM/SIGINT. In-flight requests finish,
+running jobs are stopped at their next checkpoint so they resume on the next
+start, and pooled database connections are closed.
+
+Startup is split so the first request is answered as early as possible: the
+server starts listening right after the app is imported, and the warm-up
+(resuming interrupted jobs, loading Pillow and NumPy) runs in the background.
+Machine-readable lines on stdout let the launcher follow along without
+polling:
+
+    SEEKERAUG_EVENT {"event": "listening", "port": ..., "phases_ms": {...}}
+    SEEKERAUG_EVENT {"event": "transport", "family": "unix", "path": ...}
+    SEEKERAUG_EVENT {"event": "ready", ...GET /ready body...}
+
+The transport event describes the binary channel for pixels, tiles and
+progress (dataset/transport.py); on the TCP fallback it carries the token.
+
+Environment:
+    PORT                     Port to listen on (default 5000).
+    SEEKERAUG_HOST           Interface to bind (default 127.0.0.1).
+    SEEKERAUG_SERVER_THREADS Request worker threads (default 8).
+    SEEKERAUG_TRANSPORT      Set to 0 to disable the binary transport.
+"""
+import json
+import os
+import signal
+import sys
+import threading
+
+DEFAULT_THREADS = 8
+EVENT_PREFIX = "SEEKERAUG_EVENT"
+
+
+def _make_server(app, host, port, threads):
+    """Return (server, serve, stop, drain) for waitress if available, else Werkzeug.
+
+    drain() is called once serve() has returned and blocks until in-flight
+    requests have finished.
+    """
+    try:
+        from waitress.server import create_server
+    except ImportError:
+        from werkzeug.serving import make_server
+        server = make_server(host, port, app, threaded=True)
+        # Non-daemon request threads are joined by server_close()
+        server.daemon_threads = False
+        # serve_forever() runs in the main thread, so shutdown() must come from another
+        stop = lambda: threading.Thread(target=server.shutdown).start()
+        return server, server.serve_forever, stop, server.server_close
+    server = create_server(app, host=host, port=port, threads=threads)
+
+    def stop():
+        server.close()
+        raise SystemExit(0)  # Breaks waitress' accept loop in the main thread
+
+    # Let waitress finish in-flight requests
+    return server, server.run, stop, server.task_dispatcher.shutdown
+
+
+def _emit(event, **fields):
+    print(f"{EVENT_PREFIX} {json.dumps({'event': event, **fields})}", flush=True)
+
+
+def main():
+    from dataset.startup import STARTUP
+    with STARTUP.phase("import"):
+        from api import app, job_manager, transport, WARM_UP_STEPS
+        from dataset.database import close_all
+
+    host = os.environ.get("SEEKERAUG_HOST", "127.0.0.1")
+    port = int(os.environ.get("PORT", 5000))
+    threads = int(os.environ.get("SEEKERAUG_SERVER_THREADS", DEFAULT_THREADS))
+
+    with STARTUP.phase("bind"):
+        server, serve, stop, drain = _make_server(app, host, port, threads)
+
+    def handle_signal(signum, frame):
+        print(f"Received signal {signum}, shutting down", flush=True)
+        stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print(f"Serving on http://{host}:{port} with {type(server).__module__}", flush=True)
+    # The socket is bound, so connections made from here on wait for serve()
+    _emit("listening", port=port, phases_ms=STARTUP.status()["phases_ms"])
+    if os.environ.get("SEEKERAUG_TRANSPORT", "1") != "0":
+        with STARTUP.phase("transport"):
+            _emit("transport", **transport.start())
+    STARTUP.warm_up(WARM_UP_STEPS, on_ready=lambda status: _emit("ready", **status))
+    try:
+        serve()
+    except SystemExit:
+        pass
+    finally:
+        drain()
+        transport.stop()
+        job_manager.shutdown()
+        close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
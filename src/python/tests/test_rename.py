@@ -0,0 +1,28 @@
+"""Renamed images keep being served: rename only changes the recorded filename."""
+from PIL import Image
+
+from dataset.image_ops import ImageOps
+from dataset.importer import DatasetImporter
+from dataset.project_manager import ProjectManager
+from dataset.thumbnails import get_thumbnail_cache
+
+
+def _import_one(tmp_path):
+    ProjectManager(base_dir=tmp_path / "projects").create_project("p")
+    project_path = tmp_path / "projects" / "p"
+    source = tmp_path / "photo.png"
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(source)
+    result = DatasetImporter(project_path).import_images([str(source)])
+    return project_path, result["imported"][0]["id"]
+
+
+def test_thumbnail_after_rename(tmp_path):
+    project_path, image_id = _import_one(tmp_path)
+    cache = get_thumbnail_cache(project_path)
+    assert cache.get(image_id, 128, timeout=10).exists()
+
+    ImageOps(project_path).rename_image(image_id, "renamed.png")
+
+    path = cache.get(image_id, 128, timeout=10)
+    with Image.open(path) as thumbnail:
+        assert max(thumbnail.size) <= 128
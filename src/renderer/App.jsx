@@ -3,7 +3,7 @@ import WelcomePage from "./WelcomePage.jsx";
 import ProjectDashboard from "./ProjectDashboard.jsx";
 import ImageGrid from "./ImageGrid.jsx";
 import { loadAndApplyTheme } from "./themeLoader.js";
-import { listProjects, createProject, deleteProject, importProjectImages, listProjectImages, listRefinedImages, renameProjectImage, deleteProjectImage } from "./projectApi";
+import { listProjects, createProject, deleteProject, importProjectImages, listProjectImages, listRefinedImages, renameProjectImage, deleteProjectImages } from "./projectApi";
 import CommandPalette from "./CommandPalette.jsx";
 
 function CommandBar({ onOpenPalette, onCloseProject, showClose }) {
@@ -409,6 +409,8 @@ function App() {
   useEffect(() => {
     async function fetchProjects() {
       try {
+        // The backend is spawned alongside the window; wait until it is listening
+        await window.seekeraug?.waitForBackend?.();
         const list = await listProjects();
         setProjects(list);
       } catch (err) {
@@ -734,16 +736,18 @@ function App() {
   async function handleDeleteImages(imageIds) {
     if (!currentProject) return;
     try {
-      // Support batch delete by calling API for each image
-      for (const id of imageIds) {
-        await deleteProjectImage(currentProject.name, id);
-      }
+      // One request and one transaction for the whole selection
+      const { results = [], failed = 0 } = await deleteProjectImages(currentProject.name, imageIds);
       // Refresh image list
       const result = await listProjectImages(currentProject.name);
       setProjectImages(prev => ({
         ...prev,
         [currentProject.name]: result.images || []
       }));
+      if (failed) {
+        const errors = results.filter(r => r.status !== "success").map(r => r.error);
+        alert(`Failed to delete ${failed} image(s): ${errors.slice(0, 3).join("; ")}`);
+      }
     } catch (err) {
       alert("Failed to delete image(s): " + (err.message || err));
     }
@@ -22,6 +22,39 @@ async function handleResponse(res, operation) {
   return data;
 }
 
+// Last response per list request, keyed by URL and body. The browser cache
+// revalidates GET lists by itself; POST lists send If-None-Match here and
+// reuse the cached body when the backend answers 304 (nothing changed).
+const listCache = new Map();
+const LIST_CACHE_SIZE = 32;
+
+async function postList(path, body, operation) {
+  const key = `${path} ${JSON.stringify(body)}`;
+  const cached = listCache.get(key);
+  const headers = { 'Content-Type': 'application/json' };
+  if (cached) headers['If-None-Match'] = cached.etag;
+  const res = await fetch(`${API_BASE}${path}`, {
+    method: 'POST',
+    headers,
+    body: JSON.stringify(body),
+  });
+  if (res.status === 304 && cached) {
+    return cached.data;
+  }
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.error || `Failed to ${operation}`);
+  }
+  const data = await res.json();
+  const etag = res.headers.get('ETag');
+  listCache.delete(key);
+  if (etag) {
+    listCache.set(key, { etag, data });
+    if (listCache.size > LIST_CACHE_SIZE) listCache.delete(listCache.keys().next().value);
+  }
+  return data;
+}
+
 
 export async function listProjects({ archived = null, limit = null, sortBy = 'last_accessed', sortDesc = true } = {}) {
   const params = new URLSearchParams();
@@ -111,9 +144,33 @@ export async function openProjectLocation(name) {
   return true;
 }
 
-export async function importProjectImages(projectName, files) {
+// Poll a background job until it finishes; onProgress receives the job status
+export async function waitForJob(jobId, { onProgress = null, intervalMs = 500 } = {}) {
+  for (;;) {
+    const res = await fetch(`${API_BASE}/jobs/${encodeURIComponent(jobId)}`);
+    const data = await handleResponse(res, 'get job status');
+    const job = data.job;
+    if (onProgress) onProgress(job);
+    if (job.state === 'completed') return job;
+    if (job.state === 'failed' || job.state === 'cancelled' || job.state === 'interrupted') {
+      throw new Error(job.error || `Job ${job.state}`);
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+}
+
+export async function cancelJob(jobId) {
+  const res = await fetch(`${API_BASE}/jobs/${encodeURIComponent(jobId)}/cancel`, {
+    method: 'POST',
+  });
+  const data = await handleResponse(res, 'cancel job');
+  return data.job;
+}
+
+export async function importProjectImages(projectName, files, { onProgress = null } = {}) {
   const formData = new FormData();
   formData.append('project_name', projectName);
+  formData.append('background', 'true');
   for (const file of files) {
     formData.append('files[]', file);
   }
@@ -125,34 +182,18 @@ export async function importProjectImages(projectName, files) {
     const err = await res.json().catch(() => ({}));
     throw new Error(err.error || 'Failed to import images');
   }
-  return res.json();
+  const data = await res.json();
+  const job = await waitForJob(data.job.id, { onProgress });
+  return { status: "success", ...job.result };
 }
 
 export async function listProjectImages(projectName) {
-  const res = await fetch(`${API_BASE}/dataset/list`, {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ project_name: projectName }),
-  });
-  if (!res.ok) {
-    const err = await res.json().catch(() => ({}));
-    throw new Error(err.error || 'Failed to list images');
-  }
-  return res.json();
+  return postList('/dataset/list', { project_name: projectName }, 'list images');
 }
 
 // List refined images in a project
 export async function listRefinedImages(projectName) {
-  const res = await fetch(`${API_BASE}/dataset/refined/list`, {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ project_name: projectName }),
-  });
-  if (!res.ok) {
-    const err = await res.json().catch(() => ({}));
-    throw new Error(err.error || 'Failed to list refined images');
-  }
-  return res.json();
+  return postList('/dataset/refined/list', { project_name: projectName }, 'list refined images');
 }
 
 // Rename an image in a project
@@ -184,16 +225,44 @@ export async function deleteProjectImage(projectName, imageId) {
   return true;
 }
 
+// Delete many images in one request; resolves to per-image results
+export async function deleteProjectImages(projectName, imageIds) {
+  const res = await fetch(`${API_BASE}/image/batch/delete`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      project_name: projectName,
+      image_ids: imageIds
+    }),
+  });
+  return handleResponse(res, 'delete images');
+}
+
+// Rename many images in one request; items are { image_id, new_filename }
+export async function renameProjectImages(projectName, items) {
+  const res = await fetch(`${API_BASE}/image/batch/rename`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      project_name: projectName,
+      items
+    }),
+  });
+  return handleResponse(res, 'rename images');
+}
+
 // Process raw images to the refined dataset
-export async function intakeToRefined(projectName) {
+export async function intakeToRefined(projectName, { onProgress = null } = {}) {
   const res = await fetch(`${API_BASE}/dataset/process`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
-      project_name: projectName
+      project_name: projectName,
+      background: true
     }),
   });
-  await handleResponse(res, 'process images to refined dataset');
+  const data = await handleResponse(res, 'process images to refined dataset');
+  await waitForJob(data.job.id, { onProgress });
   return true;
 }
 